@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import AudioMemory
+from .models import AudioMemory, TranscriptionJob, TranscriptSegment, AudioUploadSession
 # Register your models here.
 
-admin.site.register(AudioMemory)
\ No newline at end of file
+admin.site.register(AudioMemory)
+admin.site.register(TranscriptionJob)
+admin.site.register(TranscriptSegment)
+admin.site.register(AudioUploadSession)
@@ -1,136 +1,895 @@
+import hashlib
+import io
+import json
 import os
 import re
-import nltk
 import time
+import wave
+import numpy as np
 from functools import lru_cache
-from nltk.sentiment import SentimentIntensityAnalyzer
-from transformers import pipeline, AutoTokenizer, logging
+from django.conf import settings
+from backend.model_artifacts import MissingArtifact, artifact_fingerprint, artifact_path, artifacts_offline
+from backend.model_registry import get_registry
+from .sentence_cache import cached_results
+from backend.thread_budget import (
+    configure_torch_threads, engine_max_jobs, engine_share_threads, engine_slot, engine_threads
+)
 
-# Suppress warnings
-logging.set_verbosity_error()
+# The ML stacks (transformers, nltk, faster_whisper, ...) are imported inside
+# the functions that use them, so importing this module stays cheap for
+# URL loading, management commands and Celery beat
 
-# Global variables to store models
-_whisper_model = None
-_vader_analyzer = None
-_distilbert_analyzer = None
-_tokenizer = None
+# Loaded models live in the model registry (backend/model_registry.py),
+# which may evict them when memory runs short or they sit idle
 
-# NLTK setup - only download data when needed
+# Whisper expects 16 kHz mono input
+SAMPLE_RATE = 16000
+
+# Transcription tiers from best quality to fastest, see select_transcription_tier()
+DEFAULT_WHISPER_TIERS = [
+    {"model": "small", "beam_size": 5},
+    {"model": "base", "beam_size": 2},
+    {"model": "tiny", "beam_size": 1},
+]
+
+DISTILBERT_MODEL = "distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+NER_MODEL = "dbmdz/bert-large-cased-finetuned-conll03-english"
+
+# NLTK setup - use the fetched lexicon, only download it when it's missing
 def setup_nltk():
+    import nltk
+    nltk_dir = artifact_path('nltk-vader_lexicon')
+    if nltk_dir and nltk_dir not in nltk.data.path:
+        nltk.data.path.insert(0, nltk_dir)
     try:
-        nltk.download('vader_lexicon', quiet=True)
-        nltk.download('punkt', quiet=True)
-    except Exception as e:
-        print(f"Warning: Failed to download NLTK resources: {e}")
+        nltk.data.find('sentiment/vader_lexicon.zip')
+    except LookupError:
+        try:
+            nltk.download('vader_lexicon', quiet=True)
+        except Exception as e:
+            print(f"Warning: Failed to download NLTK resources: {e}")
 
 # Lazy loading functions for models
+def _load_vader():
+    from nltk.sentiment import SentimentIntensityAnalyzer
+    print("🔧 Initializing VADER sentiment analyzer...")
+    setup_nltk()
+    analyzer = SentimentIntensityAnalyzer()
+    print("✅ VADER analyzer initialized")
+    return analyzer
+
 def get_vader_analyzer():
-    global _vader_analyzer
-    if _vader_analyzer is None:
-        print("🔧 Initializing VADER sentiment analyzer...")
-        setup_nltk()
-        _vader_analyzer = SentimentIntensityAnalyzer()
-        print("✅ VADER analyzer initialized")
-    return _vader_analyzer
+    return get_registry().get('vader', _load_vader)
+
+def _load_distilbert():
+    from transformers import pipeline, AutoTokenizer, logging
+    # Suppress warnings
+    logging.set_verbosity_error()
+    print("🔧 Initializing DistilBERT model...")
+    start_time = time.time()
+    configure_torch_threads()
+    # Local copy from fetch_models if there is one, the hub otherwise
+    source = artifact_path('distilbert-sst2') or DISTILBERT_MODEL
+    analyzer = pipeline("sentiment-analysis", model=source, tokenizer=source)
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    load_time = time.time() - start_time
+    print(f"✅ DistilBERT model initialized in {load_time:.2f} seconds")
+    return analyzer, tokenizer
 
 def get_distilbert():
-    global _distilbert_analyzer, _tokenizer
-    if _distilbert_analyzer is None:
-        print("🔧 Initializing DistilBERT model...")
-        start_time = time.time()
-        _distilbert_analyzer = pipeline(
-            "sentiment-analysis",
-            model="distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+    """The DistilBERT sentiment pipeline and its tokenizer, as a tuple"""
+    return get_registry().get('distilbert', _load_distilbert)
+
+# Written by `python manage.py export_distilbert_onnx` into the
+# distilbert-sst2-onnx artifact, next to the tokenizer and config
+DISTILBERT_ONNX_FILE = "model.int8.onnx"
+
+class SentimentModel:
+    """
+    The DistilBERT sentiment classifier over already tokenized input ids,
+    run by torch (TorchSentimentModel) or onnxruntime (OnnxSentimentModel)
+    """
+    def __init__(self, tokenizer, label2id):
+        self.tokenizer = tokenizer
+        self.positive_index = label2id.get('POSITIVE', 1)
+
+    def logits(self, input_ids, attention_mask):
+        raise NotImplementedError
+
+    def positive_probabilities(self, batch):
+        """POSITIVE probability of each list of input ids in batch, padded together"""
+        longest = max(len(ids) for ids in batch)
+        input_ids = np.full((len(batch), longest), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(batch), longest), dtype=np.int64)
+        for row, ids in enumerate(batch):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        logits = self.logits(input_ids, attention_mask)
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return (exp[:, self.positive_index] / exp.sum(axis=-1)).tolist()
+
+class TorchSentimentModel(SentimentModel):
+    def __init__(self, analyzer, tokenizer):
+        super().__init__(tokenizer, analyzer.model.config.label2id)
+        self.model = analyzer.model
+
+    def logits(self, input_ids, attention_mask):
+        import torch
+        with torch.inference_mode():
+            return self.model(
+                input_ids=torch.from_numpy(input_ids), attention_mask=torch.from_numpy(attention_mask)
+            ).logits.float().numpy()
+
+class OnnxSentimentModel(SentimentModel):
+    def __init__(self, session, tokenizer, label2id):
+        super().__init__(tokenizer, label2id)
+        self.session = session
+
+    def logits(self, input_ids, attention_mask):
+        return self.session.run(['logits'], {'input_ids': input_ids, 'attention_mask': attention_mask})[0]
+
+def _load_distilbert_onnx():
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError("AUDIO_SENTIMENT_BACKEND = 'onnx' needs onnxruntime (pip install onnxruntime)")
+    from transformers import AutoConfig, AutoTokenizer
+    print("🔧 Initializing DistilBERT model (ONNX int8)...")
+    start_time = time.time()
+    path = artifact_path('distilbert-sst2-onnx')
+    if path is None:
+        raise MissingArtifact("No ONNX DistilBERT model, run `python manage.py export_distilbert_onnx`")
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = engine_threads('distilbert')
+    options.inter_op_num_threads = 1
+    session = onnxruntime.InferenceSession(
+        os.path.join(path, DISTILBERT_ONNX_FILE), options, providers=['CPUExecutionProvider']
+    )
+    model = OnnxSentimentModel(
+        session, AutoTokenizer.from_pretrained(path), AutoConfig.from_pretrained(path).label2id
+    )
+    print(f"✅ DistilBERT ONNX model initialized in {time.time() - start_time:.2f} seconds")
+    return model
+
+def sentiment_backend():
+    """'torch' (the transformers pipeline) or 'onnx' (int8 onnxruntime), from AUDIO_SENTIMENT_BACKEND"""
+    return getattr(settings, 'AUDIO_SENTIMENT_BACKEND', 'torch')
+
+def sentiment_model_name():
+    """Name of the configured DistilBERT model in the model registry"""
+    return 'distilbert-onnx' if sentiment_backend() == 'onnx' else 'distilbert'
+
+def get_sentiment_model():
+    """The DistilBERT SentimentModel of the configured backend"""
+    if sentiment_backend() == 'onnx':
+        return get_registry().get('distilbert-onnx', _load_distilbert_onnx)
+    return TorchSentimentModel(*get_distilbert())
+
+def _load_ner():
+    from transformers import pipeline, logging
+    logging.set_verbosity_error()
+    print("🔧 Initializing NER model...")
+    start_time = time.time()
+    configure_torch_threads()
+    source = artifact_path('bert-ner-conll03') or NER_MODEL
+    ner = pipeline("ner", model=source, tokenizer=source, aggregation_strategy="simple")
+    print(f"✅ NER model initialized in {time.time() - start_time:.2f} seconds")
+    return ner
+
+def get_ner():
+    """The NER pipeline (entity groups), used by the NLP inference server"""
+    return get_registry().get('ner', _load_ner)
+
+@lru_cache(maxsize=None)
+def get_inference_client():
+    """
+    Client for the NLP inference server (run_inference_server) when
+    NLP_INFERENCE_URL is set, None to run the models in this process
+    """
+    address = getattr(settings, 'NLP_INFERENCE_URL', '')
+    if not address:
+        return None
+    from nlp_inference.client import InferenceClient
+    return InferenceClient(address, timeout=getattr(settings, 'NLP_INFERENCE_TIMEOUT', 30))
+
+def distilbert_sentiment(phrase):
+    """
+    DistilBERT's {'label', 'score'} for phrase, from the inference server when
+    one is configured, falling back to the in-process model if it's down
+    """
+    client = get_inference_client()
+    if client is not None:
+        from nlp_inference.client import InferenceUnavailable
+        try:
+            return client.sentiment([phrase])[0]
+        except InferenceUnavailable as e:
+            print(f"⚠️ {str(e)}, running DistilBERT in this process")
+
+    return distilbert_window_sentiment([phrase])[0]
+
+# DistilBERT reads at most this many tokens (special tokens included), longer
+# texts are scored in sentence-aligned windows of up to this size
+DISTILBERT_MAX_TOKENS = 512
+SENTENCE_END = re.compile(r'[.!?]+["\')\]]*(?=\s|$)')
+
+def sentence_windows(text, tokenizer, max_tokens=DISTILBERT_MAX_TOKENS):
+    """
+    Tokenize text once and pack whole sentences into windows of at most
+    max_tokens ids, [CLS] and [SEP] included. A sentence longer than a window
+    is split across windows. Returns the windows' input ids.
+    """
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+    # Room left once [CLS] and [SEP] are added
+    budget = max_tokens - 2
+    sentence_ends = [match.end() for match in SENTENCE_END.finditer(text)]
+
+    # Cut the token ids into sentences by the character offset of each token
+    sentences = []
+    sentence = []
+    boundary = 0
+    for token_id, (start, _) in zip(encoding['input_ids'], encoding['offset_mapping']):
+        while boundary < len(sentence_ends) and start >= sentence_ends[boundary]:
+            if sentence:
+                sentences.append(sentence)
+                sentence = []
+            boundary += 1
+        sentence.append(token_id)
+    if sentence:
+        sentences.append(sentence)
+
+    windows = []
+    window = []
+    for sentence in sentences:
+        for piece_start in range(0, len(sentence), budget):
+            piece = sentence[piece_start:piece_start + budget]
+            if window and len(window) + len(piece) > budget:
+                windows.append(window)
+                window = []
+            window = window + piece
+    if window or not windows:
+        windows.append(window)
+
+    return [[tokenizer.cls_token_id] + window + [tokenizer.sep_token_id] for window in windows]
+
+def aggregate_window_scores(window_lengths, positive_probabilities):
+    """
+    One {'label', 'score'} from the windows of a text, averaging each
+    window's POSITIVE probability weighted by its number of tokens
+    """
+    total = sum(window_lengths) or 1
+    positive = sum(
+        length * probability for length, probability in zip(window_lengths, positive_probabilities)
+    ) / total
+    if positive >= 0.5:
+        return {'label': 'POSITIVE', 'score': positive, 'windows': len(window_lengths)}
+    return {'label': 'NEGATIVE', 'score': 1 - positive, 'windows': len(window_lengths)}
+
+# Bump when a cached sentiment result would come out differently, like a
+# change to how DistilBERT windows are scored. Model files changing is
+# covered by their artifact fingerprint (see sentiment_cache_kind)
+SENTIMENT_REVISION = 1
+
+def sentiment_cache_kind(model, artifact):
+    """
+    Sentence cache namespace of a sentiment model's results. Results are
+    kept without expiry, so the namespace changes with SENTIMENT_REVISION
+    and the model's files and results of an older model are never read back.
+    """
+    return f"{model}:{SENTIMENT_REVISION}:{artifact_fingerprint(artifact) or 'hub'}"
+
+def distilbert_window_sentiment(texts, batch_size=None, cache=True):
+    """
+    DistilBERT sentiment of whole texts, however long: each text is split
+    into sentence-aligned windows (sentence_windows), all windows of all
+    texts go through the model in length-sorted batches and the window
+    scores are aggregated back per text (aggregate_window_scores). Texts
+    scored before come from the sentence cache unless cache is False.
+    """
+    if cache:
+        artifact = 'distilbert-sst2-onnx' if sentiment_backend() == 'onnx' else 'distilbert-sst2'
+        return cached_results(
+            sentiment_cache_kind(f"distilbert-{sentiment_backend()}", artifact), texts,
+            lambda missing: distilbert_window_sentiment(missing, batch_size, cache=False)
         )
-        _tokenizer = AutoTokenizer.from_pretrained("distilbert/distilbert-base-uncased-finetuned-sst-2-english")
-        load_time = time.time() - start_time
-        print(f"✅ DistilBERT model initialized in {load_time:.2f} seconds")
-    return _distilbert_analyzer, _tokenizer
-
-def get_whisper_model():
-    global _whisper_model
-    if _whisper_model is None:
-        print(f"🎤 Loading WhisperModel for transcription...")
-        start_loading = time.time()
-        
-        # Try both implementations with clear error handling
-        whisper_impl = None
-        error_messages = []
+
+    model = get_sentiment_model()
+    batch_size = batch_size or getattr(settings, 'AUDIO_SENTIMENT_BATCH_SIZE', 16)
+
+    windows = []  # (index of the text, input ids)
+    for index, text in enumerate(texts):
+        windows.extend((index, ids) for ids in sentence_windows(text, model.tokenizer))
+
+    # Sorted by length so each batch is padded as little as possible
+    order = sorted(range(len(windows)), key=lambda i: len(windows[i][1]))
+    probabilities = [0.0] * len(windows)
+    with engine_slot('distilbert'):
+        for batch_start in range(0, len(order), batch_size):
+            batch = order[batch_start:batch_start + batch_size]
+            scores = model.positive_probabilities([windows[i][1] for i in batch])
+            for i, probability in zip(batch, scores):
+                probabilities[i] = probability
+
+    text_windows = [[] for _ in texts]
+    for i, (index, _) in enumerate(windows):
+        text_windows[index].append(i)
+    return [
+        aggregate_window_scores([len(windows[i][1]) for i in members], [probabilities[i] for i in members])
+        for members in text_windows
+    ]
+
+def load_whisper_model(model_size="small", impl="faster_whisper", compute_type="int8", cpu_threads=0, num_workers=1):
+    """
+    Load a new whisper model with one specific implementation, without any
+    caching or fallback. compute_type and num_workers (concurrent transcribe
+    calls on one model) only apply to faster_whisper.
+    """
+    if impl == "faster_whisper":
+        # Import here to avoid loading at startup
+        from faster_whisper import WhisperModel
+        model = WhisperModel(
+            artifact_path(f"whisper-{model_size}") or model_size, device="cpu", compute_type=compute_type,
+            cpu_threads=cpu_threads, num_workers=num_workers
+        )
+    elif impl == "whisper":
+        # openai-whisper downloads its own checkpoints, fetch_models can't pin them
+        if artifacts_offline():
+            raise MissingArtifact(
+                "The openai-whisper fallback downloads its models, it can't run with MODEL_ARTIFACTS_OFFLINE"
+            )
+        import whisper
+        if cpu_threads:
+            import torch
+            torch.set_num_threads(cpu_threads)
+        model = whisper.load_model(model_size)
+    else:
+        raise ValueError(f"Unknown whisper implementation: {impl}")
+    
+    model._whisper_impl = impl
+    return model
+
+def _load_whisper(model_size, cpu_threads):
+    print(f"🎤 Loading WhisperModel '{model_size}' for transcription...")
+    start_loading = time.time()
+    model = None
+    
+    # Try both implementations with clear error handling
+    error_messages = []
+    
+    # First try faster_whisper
+    try:
+        model = load_whisper_model(
+            model_size, "faster_whisper", cpu_threads=cpu_threads, num_workers=engine_max_jobs('whisper')
+        )
+        load_time = time.time() - start_loading
+        print(f"✅ faster-whisper model loaded in {load_time:.2f} seconds")
+    except MissingArtifact:
+        # Offline without the model fetched, the fallback would need the network too
+        raise
+    except Exception as e:
+        error_messages.append(f"faster-whisper error: {str(e)}")
         
-        # First try faster_whisper
+    # If that failed, try regular whisper - it's slower, so never go above "base"
+    if model is None:
         try:
-            # Import here to avoid loading at startup
-            from faster_whisper import WhisperModel
-            whisper_impl = "faster_whisper"
-            _whisper_model = WhisperModel("small", device="cpu", compute_type="int8")
+            model = load_whisper_model(
+                "base" if model_size == "small" else model_size, "whisper", cpu_threads=cpu_threads
+            )
             load_time = time.time() - start_loading
-            print(f"✅ faster-whisper model loaded in {load_time:.2f} seconds")
+            print(f"✅ Regular whisper model loaded in {load_time:.2f} seconds")
         except Exception as e:
-            error_messages.append(f"faster-whisper error: {str(e)}")
-            
-        # If that failed, try regular whisper
-        if _whisper_model is None:
-            try:
-                import whisper
-                whisper_impl = "whisper"
-                _whisper_model = whisper.load_model("base")
-                load_time = time.time() - start_loading
-                print(f"✅ Regular whisper model loaded in {load_time:.2f} seconds")
-            except Exception as e:
-                error_messages.append(f"regular whisper error: {str(e)}")
+            error_messages.append(f"regular whisper error: {str(e)}")
+    
+    # If both failed, raise an error with details
+    if model is None:
+        error_details = "\n".join(error_messages)
+        print(f"❌ Failed to load any whisper implementation:\n{error_details}")
+        raise ImportError(f"No whisper implementation available:\n{error_details}")
+    
+    return model
+
+def get_whisper_model(model_size="small", cpu_threads=0, pinned=False):
+    """
+    Return the whisper model of the given size, loading it if the registry
+    doesn't hold it (yet or anymore).
+    cpu_threads=0 uses the whisper share of the CPU thread budget. A pinned
+    model is never evicted, for processes that only exist to transcribe.
+    """
+    cpu_threads = cpu_threads or engine_threads('whisper')
+    return get_registry().get(
+        f"whisper-{model_size}", lambda: _load_whisper(model_size, cpu_threads), pinned=pinned
+    )
+
+def whisper_model(model_size="small", cpu_threads=0):
+    """Like get_whisper_model(), as a context manager keeping the model loaded while it runs"""
+    cpu_threads = cpu_threads or engine_threads('whisper')
+    return get_registry().use(f"whisper-{model_size}", lambda: _load_whisper(model_size, cpu_threads))
+
+def select_transcription_tier(duration, queue_depth):
+    """
+    Pick the model size and beam size for a job. The deeper the queue, the
+    faster (and less accurate) the tier; long clips drop one more tier while
+    anything else is waiting. Returns one of the AUDIO_WHISPER_TIERS dicts.
+    """
+    tiers = getattr(settings, 'AUDIO_WHISPER_TIERS', DEFAULT_WHISPER_TIERS)
+    thresholds = getattr(settings, 'AUDIO_TIER_QUEUE_THRESHOLDS', [4, 12])
+    long_clip = getattr(settings, 'AUDIO_TIER_LONG_CLIP_SECONDS', 1200)
+    
+    level = sum(1 for threshold in thresholds if queue_depth >= threshold)
+    if duration is not None and duration >= long_clip and queue_depth > 0:
+        level += 1
+    return tiers[min(level, len(tiers) - 1)]
+
+def whisper_language(code):
+    """
+    Map a stored language code (e.g. "en", "en-US", "EN") to the code whisper
+    expects, or None if whisper doesn't know it and has to detect it instead.
+    """
+    if not code:
+        return None
+    code = code.strip().lower().replace("_", "-").split("-")[0]
+    try:
+        from faster_whisper.tokenizer import _LANGUAGE_CODES
+    except ImportError:
+        return code or None
+    return code if code in _LANGUAGE_CODES else None
+
+def _iter_whisper(model, audio, beam_size=5, **options):
+    """
+    Run a single whisper pass over a file path or a 16 kHz float32 array and
+    yield {"start", "end", "text", "avg_logprob"} dicts (times in seconds) as
+    they are decoded. Extra options are passed through to transcribe().
+    """
+    # Determine which whisper implementation we're using by checking module name
+    model_type = type(model).__module__
+    
+    if 'whisper' in model_type and 'faster_whisper' not in model_type:
+        # Regular whisper
+        result = model.transcribe(audio, beam_size=beam_size, **options)
+        for seg in result["segments"]:
+            yield {
+                "start": seg["start"], "end": seg["end"],
+                "text": seg["text"], "avg_logprob": seg.get("avg_logprob")
+            }
+        return
+    
+    # Faster whisper - segments is a generator, decoding happens while iterating
+    segments, _ = model.transcribe(audio, beam_size=beam_size, **options)
+    for seg in segments:
+        yield {"start": seg.start, "end": seg.end, "text": seg.text, "avg_logprob": seg.avg_logprob}
+
+def _run_whisper(model, audio, beam_size=5, **options):
+    """Like _iter_whisper() but returns the whole list of segments"""
+    return list(_iter_whisper(model, audio, beam_size=beam_size, **options))
+
+# Chunked transcription - long recordings are split at silences and the chunks
+# are transcribed in parallel on a pool of processes, each holding its own model.
+_transcription_pool = None
+_chunk_worker_threads = 0
+
+def _init_chunk_worker(cpu_threads):
+    global _chunk_worker_threads
+    _chunk_worker_threads = cpu_threads
+
+def _transcribe_chunk(audio, offset, model_size, beam_size, language=None):
+    """Transcribe one chunk inside a pool process and shift segments by its offset"""
+    with whisper_model(model_size, cpu_threads=_chunk_worker_threads) as model:
+        segments = _run_whisper(model, audio, beam_size=beam_size, language=language)
+    for seg in segments:
+        seg["start"] += offset
+        seg["end"] += offset
+    return segments
+
+def get_transcription_pool():
+    global _transcription_pool
+    if _transcription_pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
         
-        # If both failed, raise an error with details
-        if _whisper_model is None:
-            error_details = "\n".join(error_messages)
-            print(f"❌ Failed to load any whisper implementation:\n{error_details}")
-            raise ImportError(f"No whisper implementation available:\n{error_details}")
-            
-        # Store the implementation type
-        if _whisper_model is not None:
-            _whisper_model._whisper_impl = whisper_impl
-            
-    return _whisper_model
+        # The chunk workers share Whisper's part of the thread budget so they
+        # don't oversubscribe the CPU the other engines were given
+        whisper_threads = engine_share_threads('whisper')
+        processes = getattr(settings, 'AUDIO_TRANSCRIPTION_PROCESSES', None) or whisper_threads
+        threads_per_process = max(1, whisper_threads // processes)
+        print(f"🔧 Starting transcription pool: {processes} processes x {threads_per_process} threads")
+        
+        # Spawn instead of fork - the parent is a threaded Django process
+        _transcription_pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_chunk_worker,
+            initargs=(threads_per_process,)
+        )
+    return _transcription_pool
+
+def load_audio(file_path):
+    """Decode any supported container to a 16 kHz mono float32 array"""
+    # Normalized artifacts are already 16 kHz mono PCM - just read the samples
+    if isinstance(file_path, str) and file_path.endswith('.wav'):
+        try:
+            with wave.open(file_path, 'rb') as wav:
+                if (wav.getframerate(), wav.getnchannels(), wav.getsampwidth()) == (SAMPLE_RATE, 1, 2):
+                    frames = wav.readframes(wav.getnframes())
+                    return np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768.0
+        except wave.Error:
+            pass
+    
+    try:
+        from faster_whisper.audio import decode_audio
+        return decode_audio(file_path, sampling_rate=SAMPLE_RATE)
+    except ImportError:
+        import whisper
+        return whisper.load_audio(file_path, sr=SAMPLE_RATE)
+
+def pcm_wav_bytes(audio):
+    """Encode a 16 kHz float32 array as a 16-bit mono WAV file"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((np.clip(audio, -1, 1) * 32767).astype('<i2').tobytes())
+    return buffer.getvalue()
+
+def frame_levels_db(audio, frame_seconds=0.03):
+    """RMS level in dBFS of each whole frame_seconds frame of the audio"""
+    frame = int(SAMPLE_RATE * frame_seconds)
+    num_frames = len(audio) // frame
+    if num_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    
+    frames = audio[:num_frames * frame].reshape(num_frames, frame)
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+def has_speech(audio, threshold_db=-40.0, min_speech_seconds=0.3, frame_seconds=0.03):
+    """
+    Cheap energy gate run before Whisper is loaded: True if at least
+    min_speech_seconds worth of frames are louder than threshold_db.
+    Silent uploads and steady low room noise come out False.
+    """
+    level_db = frame_levels_db(audio, frame_seconds)
+    voiced_seconds = np.count_nonzero(level_db > threshold_db) * frame_seconds
+    return bool(voiced_seconds >= min_speech_seconds)
+
+def trim_silence(audio, threshold_db=-45.0, frame_seconds=0.03, pad_seconds=0.25):
+    """
+    Cut leading and trailing silence by frame RMS level. Returns the trimmed
+    audio and the number of samples cut from the start. Audio with no frame
+    above the threshold is returned unchanged.
+    """
+    frame = int(SAMPLE_RATE * frame_seconds)
+    level_db = frame_levels_db(audio, frame_seconds)
+    if len(level_db) == 0:
+        return audio, 0
+    
+    voiced = np.flatnonzero(level_db > threshold_db)
+    if len(voiced) == 0:
+        return audio, 0
+    
+    pad = int(SAMPLE_RATE * pad_seconds)
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(audio), (voiced[-1] + 1) * frame + pad)
+    return audio[start:end], start
+
+def normalize_audio(file_path, output_path):
+    """
+    Decode an upload once to 16 kHz mono 16-bit PCM with the silence at both
+    ends trimmed and write it to output_path as WAV.
+    Returns (offset, duration) in seconds - offset is how much was cut from
+    the start, to map timestamps back onto the original recording.
+    """
+    start_time = time.time()
+    audio = load_audio(file_path)
+    threshold_db = getattr(settings, 'AUDIO_TRIM_THRESHOLD_DB', -45.0)
+    trimmed, start = trim_silence(audio, threshold_db=threshold_db)
+    
+    with open(output_path, 'wb') as f:
+        f.write(pcm_wav_bytes(trimmed))
+    
+    print(
+        f"🔊 Normalized {len(audio) / SAMPLE_RATE:.1f}s to {len(trimmed) / SAMPLE_RATE:.1f}s "
+        f"of 16 kHz mono PCM in {time.time() - start_time:.2f} seconds"
+    )
+    return start / SAMPLE_RATE, len(trimmed) / SAMPLE_RATE
+
+def split_on_silence(audio, target_seconds=120, max_seconds=300):
+    """
+    Split audio into chunks of roughly target_seconds, cutting only in the
+    silent gaps between speech regions. Returns a list of (start, end) sample
+    indices in order. Long silences between chunks are dropped.
+    """
+    try:
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        speech = get_speech_timestamps(
+            audio,
+            vad_options=VadOptions(min_silence_duration_ms=500, speech_pad_ms=200)
+        )
+    except ImportError:
+        # No VAD available - treat the whole file as speech and cut on a fixed grid
+        speech = [{"start": 0, "end": len(audio)}]
+    
+    target = int(target_seconds * SAMPLE_RATE)
+    max_len = int(max_seconds * SAMPLE_RATE)
+    
+    chunks = []
+    chunk_start = None
+    chunk_end = None
+    for region in speech:
+        if chunk_start is None:
+            chunk_start, chunk_end = region["start"], region["end"]
+        elif region["end"] - chunk_start > target:
+            # Close the current chunk in the silence before this region
+            chunks.append((chunk_start, chunk_end))
+            chunk_start, chunk_end = region["start"], region["end"]
+        else:
+            chunk_end = region["end"]
+        
+        # A single region longer than max_len has no silence to cut at
+        while chunk_end - chunk_start > max_len:
+            chunks.append((chunk_start, chunk_start + max_len))
+            chunk_start += max_len
+    
+    if chunk_start is not None and chunk_end > chunk_start:
+        chunks.append((chunk_start, chunk_end))
+    
+    return chunks
+
+def transcribe_audio_chunked(file_path, model_size="small", beam_size=5, on_segments=None, language=None):
+    """
+    Transcribe a long recording in parallel chunks, returns ordered segments.
+    on_segments is called with each chunk's segments, in order, as they finish.
+    """
+    audio = load_audio(file_path)
+    target_seconds = getattr(settings, 'AUDIO_CHUNK_TARGET_SECONDS', 120)
+    chunks = split_on_silence(audio, target_seconds=target_seconds, max_seconds=target_seconds * 2)
+    print(f"🎤 Split {len(audio) / SAMPLE_RATE:.1f}s of audio into {len(chunks)} chunks")
+    
+    pool = get_transcription_pool()
+    futures = [
+        pool.submit(_transcribe_chunk, audio[start:end], start / SAMPLE_RATE, model_size, beam_size, language)
+        for start, end in chunks
+    ]
+    
+    # Collect in submission order so the text is stitched back in sequence
+    segments = []
+    for future in futures:
+        chunk_segments = future.result()
+        if on_segments is not None:
+            on_segments(chunk_segments)
+        segments.extend(chunk_segments)
+    return segments
+
+WHISPER_TIME_PRECISION = 0.02
+
+def split_timestamped_tokens(tokens, timestamp_begin, duration):
+    """
+    Split the tokens whisper decoded for a window into (start, end, text
+    tokens) segments at its timestamp tokens (ids from timestamp_begin on).
+    Times are seconds into the window; text after the last timestamp runs to
+    the end of the window.
+    """
+    segments = []
+    start = None
+    last_time = 0.0
+    text_tokens = []
+    for token in tokens:
+        if token < timestamp_begin:
+            text_tokens.append(token)
+            continue
+        last_time = (token - timestamp_begin) * WHISPER_TIME_PRECISION
+        if start is None or not text_tokens:
+            # Opening timestamp, or the first of a closing/opening pair
+            start = last_time
+        else:
+            segments.append((start, last_time, text_tokens))
+            start, text_tokens = None, []
+    if text_tokens:
+        segments.append((last_time if start is None else start, duration, text_tokens))
+    return segments
+
+def needs_fallback(text, avg_logprob, compression_ratio_threshold=2.4, log_prob_threshold=-1.0):
+    """Whisper's rule for a decode to be retried at higher temperatures: repetitive or unlikely"""
+    from faster_whisper.transcribe import get_compression_ratio
+    return (
+        (bool(text.strip()) and get_compression_ratio(text) > compression_ratio_threshold)
+        or avg_logprob < log_prob_threshold
+    )
+
+def transcribe_batch(file_paths, model_size="small", beam_size=5, batch_size=8, languages=None):
+    """
+    Transcribe several files together. Every file is cut at silences into
+    windows of at most 30 seconds and the windows of all files are encoded
+    and decoded in batches, so CTranslate2 runs its matrix kernels on a full
+    batch instead of one window at a time. Returns one segment list per file,
+    in the order of file_paths.
+    languages optionally holds a language code (or None) per file; language
+    detection only runs for windows of files without one.
+    Segments come from whisper's timestamp tokens like in the single-file
+    path. Windows whose batched decode is repetitive or unlikely are decoded
+    again on their own, with the usual temperature fallback.
+    """
+    languages = list(languages) if languages else [None] * len(file_paths)
+    with whisper_model(model_size) as model:
+        return _transcribe_batch(model, file_paths, model_size, beam_size, batch_size, languages)
+
+def _transcribe_batch(model, file_paths, model_size, beam_size, batch_size, languages):
+    if getattr(model, '_whisper_impl', None) != "faster_whisper":
+        # Batched decoding needs the CTranslate2 model, transcribe one by one
+        return [
+            transcribe_audio_segments(
+                path, chunked=False, model_size=model_size, beam_size=beam_size, language=language
+            )
+            for path, language in zip(file_paths, languages)
+        ]
+    
+    from faster_whisper.audio import pad_or_trim
+    from faster_whisper.tokenizer import Tokenizer
+    
+    # (file index, offset in seconds, duration in seconds, samples)
+    windows = []
+    for index, path in enumerate(file_paths):
+        audio = load_audio(path)
+        for start, end in split_on_silence(audio, target_seconds=25, max_seconds=30):
+            windows.append((index, start / SAMPLE_RATE, (end - start) / SAMPLE_RATE, audio[start:end]))
+    print(f"🎤 Batched transcription: {len(file_paths)} files, {len(windows)} windows, batch size {batch_size}")
+    
+    multilingual = model.model.is_multilingual
+    tokenizer = Tokenizer(
+        model.hf_tokenizer, multilingual,
+        task="transcribe", language="en" if multilingual else None
+    )
+    prompt = model.get_prompt(tokenizer, [], without_timestamps=False)
+    
+    results = [[] for _ in file_paths]
+    fallback_windows = []
+    with engine_slot('whisper'):
+        for batch_start in range(0, len(windows), batch_size):
+            batch = windows[batch_start:batch_start + batch_size]
+            features = np.stack([pad_or_trim(model.feature_extractor(window[3])) for window in batch])
+            encoder_output = model.encode(features)
+        
+            prompts = [list(prompt) for _ in batch]
+            if multilingual:
+                # Each window gets its file's language token, detected only when
+                # the file has no language hint
+                language_index = prompt.index(tokenizer.language)
+                window_languages = [languages[window[0]] for window in batch]
+                if None in window_languages:
+                    detected = model.model.detect_language(encoder_output)
+                    window_languages = [
+                        language or detected[i][0][0][2:-2]
+                        for i, language in enumerate(window_languages)
+                    ]
+                for i, language in enumerate(window_languages):
+                    prompts[i][language_index] = tokenizer.tokenizer.token_to_id(f"<|{language}|>")
+        
+            outputs = model.model.generate(
+                encoder_output,
+                prompts,
+                beam_size=beam_size,
+                max_length=model.max_length,
+                suppress_blank=True,
+                suppress_tokens=[-1],
+                return_scores=True,
+                return_no_speech_prob=True,
+            )
+        
+            for window, output in zip(batch, outputs):
+                index, offset, duration, _ = window
+                tokens = output.sequences_ids[0]
+                avg_logprob = output.scores[0] * len(tokens) / (len(tokens) + 1)
+                # Same rule whisper uses to drop windows without speech
+                if output.no_speech_prob > 0.6 and avg_logprob < -1.0:
+                    continue
+                if needs_fallback(tokenizer.decode(tokens), avg_logprob):
+                    fallback_windows.append(window)
+                    continue
+                for start, end, text_tokens in split_timestamped_tokens(tokens, tokenizer.timestamp_begin, duration):
+                    results[index].append({
+                        "start": offset + start,
+                        "end": offset + min(end, duration),
+                        "text": tokenizer.decode(text_tokens),
+                        "avg_logprob": avg_logprob,
+                    })
+        
+        if fallback_windows:
+            print(f"🎤 Decoding {len(fallback_windows)} windows again with temperature fallback")
+        for index, offset, _, samples in fallback_windows:
+            for seg in _run_whisper(model, samples, beam_size=beam_size, language=languages[index]):
+                seg["start"] += offset
+                seg["end"] += offset
+                results[index].append(seg)
+    
+    for segments in results:
+        segments.sort(key=lambda seg: seg["start"])
+    return results
+
+def transcribe_stream_window(audio, beam_size=1, initial_prompt=None, language=None):
+    """
+    Transcribe the rolling buffer of a live stream. Uses a cheap decode and
+    doesn't carry context between windows - the caller passes the tail of
+    the confirmed text as the prompt instead.
+    """
+    with whisper_model() as model, engine_slot('whisper'):
+        return _run_whisper(
+            model, audio, beam_size=beam_size,
+            initial_prompt=initial_prompt,
+            language=language,
+            condition_on_previous_text=False
+        )
+
+def get_audio_duration(file_path):
+    """Duration in seconds, or None if the container can't be probed"""
+    try:
+        import av
+        with av.open(file_path) as container:
+            if container.duration:
+                return container.duration / 1000000
+    except Exception:
+        pass
+    return None
+
+def transcribe_audio_segments(file_path, chunked=None, model_size="small", beam_size=5, on_segments=None,
+                              language=None):
+    """
+    Transcribe audio and return segments with their start/end offsets.
+    chunked=None picks the chunked parallel mode automatically for long files.
+    on_segments, if given, is called with lists of new segments while the
+    transcription is still running. language skips whisper's language
+    detection pass, None detects it.
+    """
+    if chunked is None:
+        min_duration = getattr(settings, 'AUDIO_CHUNKED_MIN_DURATION', 300)
+        duration = get_audio_duration(file_path)
+        chunked = (
+            getattr(settings, 'AUDIO_CHUNKED_TRANSCRIPTION', True)
+            and duration is not None
+            and duration >= min_duration
+        )
+    
+    if chunked:
+        print("🎤 Using chunked parallel transcription")
+        # The chunk pool already spreads one job over every core
+        with engine_slot('whisper'):
+            return transcribe_audio_chunked(
+                file_path, model_size=model_size, beam_size=beam_size, on_segments=on_segments,
+                language=language
+            )
+    
+    # Lazy load the model, it stays loaded until the transcription is done
+    with whisper_model(model_size) as model:
+        print(f"🎤 Using model type: {type(model).__module__} ({model_size}, beam {beam_size}, language {language or 'auto'})")
+        segments = []
+        with engine_slot('whisper'):
+            for seg in _iter_whisper(model, load_audio(file_path), beam_size=beam_size, language=language):
+                if on_segments is not None:
+                    on_segments([seg])
+                segments.append(seg)
+    return segments
 
 # Transcribe audio using Faster-Whisper or regular Whisper
-def transcribe_audio(file_path):
+def transcribe_audio(file_path, chunked=None, model_size="small", beam_size=5, on_segments=None, language=None):
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Audio file not found: {file_path}")
         
     print(f"🎤 Starting transcription for: {os.path.basename(file_path)}")
     print(f"🎤 File size: {os.path.getsize(file_path)/1024/1024:.2f} MB")
     
-    # Lazy load the model
-    model = get_whisper_model()
-    
     transcribe_start = time.time()
-    text = ""
     
     try:
-        # Determine which whisper implementation we're using by checking module name
-        model_type = type(model).__module__
-        print(f"🎤 Using model type: {model_type}")
+        segments = transcribe_audio_segments(
+            file_path, chunked=chunked, model_size=model_size, beam_size=beam_size,
+            on_segments=on_segments, language=language
+        )
         
-        if 'whisper' in model_type and 'faster_whisper' not in model_type:
-            # Regular whisper
-            print("🎤 Using regular whisper transcription")
-            result = model.transcribe(file_path)
-            text = result["text"]
-        else:
-            # Faster whisper
-            print("🎤 Using faster-whisper transcription")
-            segments, _ = model.transcribe(file_path, beam_size=5)
-            
-            print("🎤 Processing segments...")
-            text_segments = []
-            for i, seg in enumerate(segments):
-                text_segments.append(seg.text)
-                if i < 3:  # Print first few segments to show progress
-                    print(f"🎤 Segment {i+1}: {seg.text}")
+        print("🎤 Processing segments...")
+        for i, seg in enumerate(segments[:3]):  # Print first few segments to show progress
+            print(f"🎤 Segment {i+1}: {seg['text']}")
+        if len(segments) > 3:
+            print(f"🎤 ... and {len(segments) - 3} more segments")
             
-            if len(text_segments) > 3:
-                print(f"🎤 ... and {len(text_segments) - 3} more segments")
-                
-            text = " ".join(text_segments)
+        text = " ".join(seg["text"].strip() for seg in segments)
         
         transcribe_time = time.time() - transcribe_start
         print(f"✅ Transcription completed in {transcribe_time:.2f} seconds")
@@ -141,8 +900,6 @@ def transcribe_audio(file_path):
     except Exception as e:
         transcribe_time = time.time() - transcribe_start
         print(f"❌ Transcription failed after {transcribe_time:.2f} seconds: {str(e)}")
-        import traceback
-        print(f"❌ Traceback: {traceback.format_exc()}")
         
         # Import traceback here to avoid circular imports
         import traceback
@@ -156,25 +913,15 @@ def analyze_phrase_detailed(phrase):
     print(f"😀 Starting detailed sentiment analysis...")
     print(f"😀 Text length: {len(phrase)} characters")
     
-    # Lazy load models
-    vader_analyzer = get_vader_analyzer()
-    distilbert_analyzer, tokenizer = get_distilbert()
-    
-    # Truncate if needed
-    tokens = tokenizer.encode(phrase, truncation=False)
-    if len(tokens) > 512:
-        print(f"⚠️ Text too long ({len(tokens)} tokens), truncating to 512 tokens")
-        phrase = tokenizer.decode(tokens[:512], skip_special_tokens=True)
-    
     print(f"😀 Running VADER sentiment analysis...")
     vader_start = time.time()
-    vader_scores = vader_analyzer.polarity_scores(phrase)
+    vader_scores = vader_text_scores(phrase)
     vader_time = time.time() - vader_start
     print(f"✅ VADER analysis completed in {vader_time:.2f} seconds")
     
     print(f"😀 Running DistilBERT sentiment analysis...")
     distilbert_start = time.time()
-    distilbert_result = distilbert_analyzer(phrase, truncation=True)[0]
+    distilbert_result = distilbert_sentiment(phrase)
     distilbert_time = time.time() - distilbert_start
     print(f"✅ DistilBERT analysis completed in {distilbert_time:.2f} seconds")
 
@@ -182,7 +929,10 @@ def analyze_phrase_detailed(phrase):
     
     print(f"📊 Sentiment: {sentiment}")
     print(f"📊 VADER compound score: {vader_scores['compound']:.4f}")
-    print(f"📊 DistilBERT: {distilbert_result['label']} ({distilbert_result['score']:.4f})")
+    print(
+        f"📊 DistilBERT: {distilbert_result['label']} ({distilbert_result['score']:.4f}, "
+        f"{distilbert_result.get('windows', 1)} windows)"
+    )
 
     return {
         "text": phrase,
@@ -192,11 +942,21 @@ def analyze_phrase_detailed(phrase):
         "distilbert_score": distilbert_result['score']
     }
 
+def vader_polarity_scores(texts):
+    """VADER polarity scores of each text, from the sentence cache when scored before"""
+    def compute(missing):
+        vader_analyzer = get_vader_analyzer()
+        return [vader_analyzer.polarity_scores(text) for text in missing]
+    return cached_results(sentiment_cache_kind('vader', 'nltk-vader_lexicon'), texts, compute)
+
+def vader_text_scores(text):
+    """VADER scores of the whole text, the text is only scored the first time it's seen"""
+    return vader_polarity_scores([text])[0]
+
 # Simple version that returns just the compound score (for backward compatibility)
 def analyze_phrase(phrase):
     print(f"😀 Starting sentiment analysis...")
-    vader_analyzer = get_vader_analyzer()
-    vader_scores = vader_analyzer.polarity_scores(phrase)
+    vader_scores = vader_text_scores(phrase)
     vader_compound = vader_scores['compound']
     print(f"📊 Final sentiment score (VADER compound): {vader_compound:.4f}")
     return vader_compound
@@ -211,18 +971,132 @@ def get_sentiment_label(score):
         return "Neutral"
 
 # Advanced analysis functions from the second file
-def find_memory_references(text):
+
+# Keywords of the text heuristics below, matched case-insensitively as whole
+# words or phrases (like re.search(r'\b' + keyword + r'\b', text.lower()))
+MEMORY_INDICATORS = [
+    "remember", "recall", "memory", "memories", "forget", "forgot", 
+    "forgotten", "reminded", "reminds", "reminiscent", "lost",
+    "missing", "missed", "gone", "passed away", "died", "death"
+]
+
+ROUTINE_INDICATORS = [
+    "breakfast", "lunch", "dinner", "meal", "eating", "sleeping", "sleep",
+    "waking up", "wake up", "shower", "bath", "medication", "medicine",
+    "exercise", "walk", "walking", "running", "jogging", "working",
+    "studying", "reading", "watching", "listening", "cook", "cooking",
+    "cleaning", "laundry", "shopping", "commute", "commuting", "driving",
+    "travel", "traveling", "routine", "habit", "schedule", "appointment"
+]
+
+TIME_INDICATORS = [
+    "today", "yesterday", "tomorrow", "now", "later", "soon", "earlier",
+    "morning", "afternoon", "evening", "night", "midnight", "noon",
+    "last night", "last week", "last month", "last year", "next week",
+    "next month", "next year", "day", "week", "month", "year",
+    "january", "february", "march", "april", "may", "june", "july",
+    "august", "september", "october", "november", "december",
+    "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+    "right now", "currently", "moment", "instant", "immediately"
+]
+
+# Specific times like "3:00" and dates like "2023-04-27", kept as written
+TIME_PATTERN = re.compile(r'\d{1,2}:\d{2}')
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4}')
+
+LOCATION_INDICATORS = [
+    "home", "house", "apartment", "room", "bedroom", "bathroom", "kitchen",
+    "living room", "office", "work", "school", "college", "university",
+    "hospital", "clinic", "doctor", "store", "shop", "restaurant", "cafe",
+    "park", "garden", "street", "road", "avenue", "boulevard", "highway",
+    "city", "town", "village", "country", "state", "province", "region",
+    "continent", "world", "planet", "space", "universe", "here", "there",
+    # Major cities and countries
+    "new york", "london", "paris", "tokyo", "berlin", "rome", "madrid",
+    "moscow", "beijing", "delhi", "mumbai", "sydney", "melbourne",
+    "usa", "uk", "france", "germany", "japan", "china", "india", "australia"
+]
+
+SEVERITY_INDICATORS = [
+    "very", "extremely", "incredibly", "really", "quite", "totally",
+    "absolutely", "completely", "utterly", "terribly", "awful", "horrible",
+    "severe", "serious", "critical", "emergency", "urgent", "desperate",
+    "hopeless", "helpless", "alone", "lonely", "isolated", "abandoned",
+    "scared", "frightened", "terrified", "panic", "anxiety", "depression",
+    "sad", "unhappy", "miserable", "suicidal", "die", "death", "kill",
+    "harm", "hurt", "pain", "suffering", "agony", "distress", "crisis"
+]
+
+# Severity indicators that also put the full text in the result as context
+SEVERE_INDICATORS = ["suicidal", "die", "death", "kill", "harm"]
+
+# Concerns raised when any of their keywords is in the text, in this order
+CONCERN_KEYWORDS = {
+    "Potential suicidal ideation": ["suicid", "kill myself", "end my life", "take my life"],
+    "Feelings of loneliness or isolation": ["lonely", "alone", "isolated", "no friends", "nobody cares"],
+    "Potential mental health concerns": ["depress", "anxiety", "anxious", "panic", "fear", "scared", "terrified"],
+    "Physical health concerns": ["hurt", "pain", "ache", "sick", "ill", "disease", "condition", "symptom"],
+    "Negative feelings about memory": ["lost", "died", "passed away", "death", "funeral"],
+    "Memory-related concerns": ["forgot", "forget", "don't remember", "can't recall", "memory problem"],
+    "Difficulties with eating or appetite": ["eat", "food", "appetite", "hungry", "meal"],
+    "Sleep issues": ["sleep", "insomnia", "tired", "exhausted", "fatigue"],
+}
+
+# Only raised when the sentiment is also negative
+NEGATIVE_SENTIMENT_CONCERNS = {"Difficulties with eating or appetite", "Sleep issues"}
+
+WORD = re.compile(r'\w+')
+is_word_char = re.compile(r'\w').match
+
+class LexiconMatcher:
+    """
+    Finds all of a set of keywords in one pass over the text.
+
+    Every keyword starts and ends with a word character, so a whole-word
+    match can only start where a word of the text starts. Keywords are
+    indexed by their first word and only those are tried at each word,
+    which finds exactly what a whole-word regex search per keyword would,
+    overlapping matches ("memory" in "memory problem") included.
+    """
+    def __init__(self, keywords):
+        self._by_first_word = {}
+        for keyword in set(keywords):
+            if not (is_word_char(keyword[0]) and is_word_char(keyword[-1])):
+                raise ValueError(f"Keyword must start and end with a word character: {keyword!r}")
+            self._by_first_word.setdefault(WORD.match(keyword).group(), []).append(keyword)
+
+    def scan(self, text):
+        """The set of keywords found in text, ignoring case"""
+        lowered = text.lower()
+        found = set()
+        for word in WORD.finditer(lowered):
+            for keyword in self._by_first_word.get(word.group(), ()):
+                end = word.start() + len(keyword)
+                if (
+                    keyword not in found
+                    and lowered.startswith(keyword, word.start())
+                    and (end == len(lowered) or not is_word_char(lowered[end]))
+                ):
+                    found.add(keyword)
+        return found
+
+# Compiled once for every keyword of every heuristic
+LEXICON = LexiconMatcher(
+    MEMORY_INDICATORS + ROUTINE_INDICATORS + TIME_INDICATORS + LOCATION_INDICATORS + SEVERITY_INDICATORS
+    + [keyword for keywords in CONCERN_KEYWORDS.values() for keyword in keywords]
+)
+
+def scan_lexicon(text):
+    """
+    Keywords of all the heuristics found in text. Pass the result as hits to
+    the find_* functions to scan a text once for all of them.
+    """
+    return LEXICON.scan(text)
+
+def find_memory_references(text, hits=None):
     """Identify potential memory references in text"""
-    memory_indicators = [
-        "remember", "recall", "memory", "memories", "forget", "forgot", 
-        "forgotten", "reminded", "reminds", "reminiscent", "lost",
-        "missing", "missed", "gone", "passed away", "died", "death"
-    ]
-    
-    found_indicators = []
-    for indicator in memory_indicators:
-        if re.search(r'\b' + re.escape(indicator) + r'\b', text.lower()):
-            found_indicators.append(indicator)
+    hits = scan_lexicon(text) if hits is None else hits
+    found_indicators = [indicator for indicator in MEMORY_INDICATORS if indicator in hits]
     
     # If we found indicators, also include the full text as context
     if found_indicators:
@@ -230,106 +1104,45 @@ def find_memory_references(text):
         
     return ", ".join(found_indicators) if found_indicators else None
 
-def find_routine_references(text):
+def find_routine_references(text, hits=None):
     """Identify potential routine references in text"""
-    routine_indicators = [
-        "breakfast", "lunch", "dinner", "meal", "eating", "sleeping", "sleep",
-        "waking up", "wake up", "shower", "bath", "medication", "medicine",
-        "exercise", "walk", "walking", "running", "jogging", "working",
-        "studying", "reading", "watching", "listening", "cook", "cooking",
-        "cleaning", "laundry", "shopping", "commute", "commuting", "driving",
-        "travel", "traveling", "routine", "habit", "schedule", "appointment"
-    ]
-    
-    found_indicators = []
-    for indicator in routine_indicators:
-        if re.search(r'\b' + re.escape(indicator) + r'\b', text.lower()):
-            found_indicators.append(indicator)
+    hits = scan_lexicon(text) if hits is None else hits
+    found_indicators = [indicator for indicator in ROUTINE_INDICATORS if indicator in hits]
             
     return ", ".join(found_indicators) if found_indicators else None
 
-def find_time_indicators(text):
+def find_time_indicators(text, hits=None):
     """Identify time references in text"""
-    time_indicators = [
-        "today", "yesterday", "tomorrow", "now", "later", "soon", "earlier",
-        "morning", "afternoon", "evening", "night", "midnight", "noon",
-        "last night", "last week", "last month", "last year", "next week",
-        "next month", "next year", "day", "week", "month", "year",
-        "january", "february", "march", "april", "may", "june", "july",
-        "august", "september", "october", "november", "december",
-        "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
-        "right now", "currently", "moment", "instant", "immediately"
-    ]
-    
-    found_indicators = []
-    for indicator in time_indicators:
-        if re.search(r'\b' + re.escape(indicator) + r'\b', text.lower()):
-            found_indicators.append(indicator)
+    hits = scan_lexicon(text) if hits is None else hits
+    found_indicators = [indicator for indicator in TIME_INDICATORS if indicator in hits]
             
     # Also try to find specific times like "3:00" or dates like "2023-04-27"
-    time_pattern = r'\d{1,2}:\d{2}'
-    date_pattern = r'\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{2,4}'
-    
-    time_matches = re.findall(time_pattern, text)
-    date_matches = re.findall(date_pattern, text)
-    
-    found_indicators.extend(time_matches)
-    found_indicators.extend(date_matches)
+    found_indicators.extend(TIME_PATTERN.findall(text))
+    found_indicators.extend(DATE_PATTERN.findall(text))
             
     return ", ".join(found_indicators) if found_indicators else None
 
-def find_location_indicators(text):
+def find_location_indicators(text, hits=None):
     """Identify location references in text"""
-    location_indicators = [
-        "home", "house", "apartment", "room", "bedroom", "bathroom", "kitchen",
-        "living room", "office", "work", "school", "college", "university",
-        "hospital", "clinic", "doctor", "store", "shop", "restaurant", "cafe",
-        "park", "garden", "street", "road", "avenue", "boulevard", "highway",
-        "city", "town", "village", "country", "state", "province", "region",
-        "continent", "world", "planet", "space", "universe", "here", "there"
-    ]
-    
-    # Major cities and countries to look for
-    cities_countries = [
-        "new york", "london", "paris", "tokyo", "berlin", "rome", "madrid",
-        "moscow", "beijing", "delhi", "mumbai", "sydney", "melbourne",
-        "usa", "uk", "france", "germany", "japan", "china", "india", "australia"
-    ]
-    
-    location_indicators.extend(cities_countries)
-    
-    found_indicators = []
-    for indicator in location_indicators:
-        if re.search(r'\b' + re.escape(indicator) + r'\b', text.lower()):
-            found_indicators.append(indicator)
+    hits = scan_lexicon(text) if hits is None else hits
+    found_indicators = [indicator for indicator in LOCATION_INDICATORS if indicator in hits]
             
     return ", ".join(found_indicators) if found_indicators else None
 
-def find_severity_indicators(text):
+def find_severity_indicators(text, hits=None):
     """Identify intensity/severity indicators in text"""
-    severity_indicators = [
-        "very", "extremely", "incredibly", "really", "quite", "totally",
-        "absolutely", "completely", "utterly", "terribly", "awful", "horrible",
-        "severe", "serious", "critical", "emergency", "urgent", "desperate",
-        "hopeless", "helpless", "alone", "lonely", "isolated", "abandoned",
-        "scared", "frightened", "terrified", "panic", "anxiety", "depression",
-        "sad", "unhappy", "miserable", "suicidal", "die", "death", "kill",
-        "harm", "hurt", "pain", "suffering", "agony", "distress", "crisis"
-    ]
-    
-    found_indicators = []
-    for indicator in severity_indicators:
-        if re.search(r'\b' + re.escape(indicator) + r'\b', text.lower()):
-            found_indicators.append(indicator)
+    hits = scan_lexicon(text) if hits is None else hits
+    found_indicators = [indicator for indicator in SEVERITY_INDICATORS if indicator in hits]
     
     # If we found severe indicators, also include the full text as context
-    if any(indicator in ["suicidal", "die", "death", "kill", "harm"] for indicator in found_indicators):
+    if any(indicator in SEVERE_INDICATORS for indicator in found_indicators):
         found_indicators.append(text)
             
     return ", ".join(found_indicators) if found_indicators else None
 
-def identify_potential_concerns(text, sentiment_score):
+def identify_potential_concerns(text, sentiment_score, hits=None):
     """Identify potential concerns based on content and sentiment"""
+    hits = scan_lexicon(text) if hits is None else hits
     concerns = []
     
     # Check for extreme negative sentiment
@@ -337,32 +1150,31 @@ def identify_potential_concerns(text, sentiment_score):
         concerns.append("Highly negative emotional state")
     
     # Check for specific keywords indicating various concerns
-    if re.search(r'\b(suicid|kill myself|end my life|take my life)\b', text.lower()):
-        concerns.append("Potential suicidal ideation")
-    
-    if re.search(r'\b(lonely|alone|isolated|no friends|nobody cares)\b', text.lower()):
-        concerns.append("Feelings of loneliness or isolation")
-    
-    if re.search(r'\b(depress|anxiety|anxious|panic|fear|scared|terrified)\b', text.lower()):
-        concerns.append("Potential mental health concerns")
-    
-    if re.search(r'\b(hurt|pain|ache|sick|ill|disease|condition|symptom)\b', text.lower()):
-        concerns.append("Physical health concerns")
-    
-    if re.search(r'\b(lost|died|passed away|death|funeral)\b', text.lower()):
-        concerns.append("Negative feelings about memory")
-        
-    if re.search(r'\b(forgot|forget|don\'t remember|can\'t recall|memory problem)\b', text.lower()):
-        concerns.append("Memory-related concerns")
-    
-    if re.search(r'\b(eat|food|appetite|hungry|meal)\b', text.lower()) and sentiment_score < -0.1:
-        concerns.append("Difficulties with eating or appetite")
-    
-    if re.search(r'\b(sleep|insomnia|tired|exhausted|fatigue)\b', text.lower()) and sentiment_score < -0.1:
-        concerns.append("Sleep issues")
+    for concern, keywords in CONCERN_KEYWORDS.items():
+        if concern in NEGATIVE_SENTIMENT_CONCERNS and not sentiment_score < -0.1:
+            continue
+        if any(keyword in hits for keyword in keywords):
+            concerns.append(concern)
     
     return ", ".join(concerns) if concerns else None
 
+# Bump when the analysis changes in a way the keyword lists don't show, like
+# how the sentiment score is computed. analyzer_version() adds a fingerprint
+# of the keyword lists and patterns, so editing those makes every stored
+# analysis stale (see `python manage.py reanalyze_audio`)
+ANALYZER_REVISION = 1
+
+@lru_cache(maxsize=None)
+def analyzer_version():
+    """Version of the text analysis, stamped on each AudioMemory it analyzes"""
+    lexicon = [
+        MEMORY_INDICATORS, ROUTINE_INDICATORS, TIME_INDICATORS, LOCATION_INDICATORS,
+        SEVERITY_INDICATORS, SEVERE_INDICATORS, CONCERN_KEYWORDS, sorted(NEGATIVE_SENTIMENT_CONCERNS),
+        TIME_PATTERN.pattern, DATE_PATTERN.pattern, SENTENCE_END.pattern,
+    ]
+    fingerprint = hashlib.sha1(json.dumps(lexicon, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return f"{ANALYZER_REVISION}-{fingerprint}"
+
 def analyze_text_comprehensive(text):
     """
     Perform comprehensive text analysis returning all metrics
@@ -373,13 +1185,14 @@ def analyze_text_comprehensive(text):
     # Get sentiment label
     sentiment_label = get_sentiment_label(sentiment_score)
     
-    # Get additional analysis
-    memory_references = find_memory_references(text)
-    routine_references = find_routine_references(text)
-    time_indicators = find_time_indicators(text)
-    location_indicators = find_location_indicators(text)
-    severity_indicators = find_severity_indicators(text)
-    potential_concerns = identify_potential_concerns(text, sentiment_score)
+    # Get additional analysis, all from one scan of the text
+    hits = scan_lexicon(text)
+    memory_references = find_memory_references(text, hits)
+    routine_references = find_routine_references(text, hits)
+    time_indicators = find_time_indicators(text, hits)
+    location_indicators = find_location_indicators(text, hits)
+    severity_indicators = find_severity_indicators(text, hits)
+    potential_concerns = identify_potential_concerns(text, sentiment_score, hits)
     
     result = {
         'sentiment_score': sentiment_score,
@@ -0,0 +1,86 @@
+"""
+Transcription benchmark helpers, used by the benchmark_transcription
+management command.
+
+Every configuration runs in its own fresh process so model loading time and
+peak RSS are measured for that configuration alone.
+"""
+import difflib
+import re
+import resource
+import time
+
+
+def benchmark_config(config, file_paths):
+    """
+    Load the model described by config and transcribe every file once.
+    Runs inside the child process, returns a JSON serializable dict.
+    """
+    from .audio_processing import SAMPLE_RATE, load_audio, load_whisper_model, _run_whisper
+
+    start_loading = time.time()
+    model = load_whisper_model(
+        config['model'], config['impl'],
+        compute_type=config['compute_type'], cpu_threads=config['threads']
+    )
+    load_time = time.time() - start_loading
+
+    files = []
+    for file_path in file_paths:
+        audio = load_audio(file_path)
+        duration = len(audio) / SAMPLE_RATE
+
+        start_time = time.time()
+        segments = _run_whisper(model, audio, beam_size=config['beam_size'])
+        wall_time = time.time() - start_time
+
+        files.append({
+            'file': file_path,
+            'duration': round(duration, 3),
+            'wall_time': round(wall_time, 3),
+            'rtf': round(wall_time / duration, 4) if duration else None,
+            'text': " ".join(seg['text'].strip() for seg in segments).strip(),
+        })
+
+    total_wall = sum(f['wall_time'] for f in files)
+    total_audio = sum(f['duration'] for f in files)
+    return {
+        'config': config,
+        'load_time': round(load_time, 3),
+        'wall_time': round(total_wall, 3),
+        'audio_seconds': round(total_audio, 3),
+        'rtf': round(total_wall / total_audio, 4) if total_audio else None,
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'files': files,
+    }
+
+
+def words(text):
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def word_agreement(reference, hypothesis):
+    """Share of matching words between two transcripts (0.0 - 1.0), via difflib"""
+    reference_words, hypothesis_words = words(reference), words(hypothesis)
+    if not reference_words and not hypothesis_words:
+        return 1.0
+    matcher = difflib.SequenceMatcher(None, reference_words, hypothesis_words, autojunk=False)
+    return round(matcher.ratio(), 4)
+
+
+def add_agreement(results, reference_index=0):
+    """Score every result's transcripts against the reference configuration"""
+    reference = results[reference_index]
+    reference_texts = {f['file']: f['text'] for f in reference.get('files', [])}
+
+    for result in results:
+        if 'error' in result:
+            continue
+        scores = []
+        for f in result['files']:
+            if f['file'] in reference_texts:
+                f['agreement'] = word_agreement(reference_texts[f['file']], f['text'])
+                scores.append(f['agreement'])
+        result['agreement'] = round(sum(scores) / len(scores), 4) if scores else None
+    return results
@@ -0,0 +1,456 @@
+import asyncio
+import io
+import json
+import tempfile
+import threading
+import time
+import wave
+from collections import deque
+import numpy as np
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.apps import apps
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from .audio_processing import SAMPLE_RATE, whisper_language
+
+
+class RollingAudio:
+    """
+    16 kHz samples of a live stream from window start on. Positions are
+    absolute sample indices since the stream started; audio before the
+    window is dropped once it has been transcribed.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.start = 0  # Absolute index of the first sample held
+        self.total = 0  # Samples received so far
+        self._lock = threading.Lock()
+
+    def append(self, samples):
+        if len(samples):
+            with self._lock:
+                self.chunks.append(samples)
+                self.total += len(samples)
+
+    def since(self, position):
+        """The samples from absolute index position up to now"""
+        with self._lock:
+            audio = np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.float32)
+            self.chunks = [audio] if len(audio) else []
+            return audio[max(0, position - self.start):]
+
+    def drop_before(self, position):
+        with self._lock:
+            audio = np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.float32)
+            cut = min(len(audio), max(0, position - self.start))
+            self.chunks = [audio[cut:]] if len(audio) > cut else []
+            self.start += cut
+
+
+class LinearResampler:
+    """Resamples consecutive chunks of a stream to 16 kHz as if they were one array"""
+    def __init__(self, sample_rate):
+        self.step = sample_rate / SAMPLE_RATE
+        self.position = 0.0  # Of the next output sample, relative to the last input sample kept
+        self.last = None
+
+    def __call__(self, samples):
+        if self.step == 1:
+            return samples
+        if self.last is not None:
+            samples = np.concatenate(([self.last], samples))
+        if len(samples) == 0:
+            return samples
+        positions = np.arange(self.position, len(samples) - 1 + 1e-9, self.step)
+        resampled = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+        next_position = positions[-1] + self.step if len(positions) else self.position
+        self.position = next_position - (len(samples) - 1)
+        self.last = samples[-1]
+        return resampled
+
+
+class StreamPipe(io.RawIOBase):
+    """
+    Read end of a container that is still arriving: reads block until more
+    bytes are written or finish() is called, so PyAV can demux it as it comes
+    """
+    def __init__(self):
+        super().__init__()
+        self._chunks = deque()
+        self._finished = False
+        self._ready = threading.Condition()
+
+    def write_bytes(self, data):
+        with self._ready:
+            self._chunks.append(bytes(data))
+            self._ready.notify()
+
+    def finish(self):
+        with self._ready:
+            self._finished = True
+            self._ready.notify()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, buffer):
+        with self._ready:
+            while not self._chunks and not self._finished:
+                self._ready.wait()
+            if not self._chunks:
+                return 0
+            data = self._chunks.popleft()
+            size = min(len(buffer), len(data))
+            buffer[:size] = data[:size]
+            if size < len(data):
+                self._chunks.appendleft(data[size:])
+            return size
+
+
+class AudioStreamConsumer(AsyncWebsocketConsumer):
+    """
+    Live transcription while the user is still speaking.
+
+    Protocol:
+      -> {"type": "start", "encoding": "pcm_s16le" | "opus", "sample_rate": 16000,
+          "container": "ogg" | "webm", "language": "en" (optional, defaults to the profile language)}
+      -> binary frames of audio
+      <- {"type": "partial", ...} for the text that may still change
+      <- {"type": "final", "segments": [...]} once segments are confirmed
+      -> {"type": "stop"}
+      <- {"type": "completed", "id": ..., ...} after the AudioMemory is saved
+
+    PCM frames are little-endian 16-bit mono. Opus frames are the bytes of an
+    Ogg/WebM stream as produced by the recorder, decoded as they arrive on a
+    thread of their own. Only the not yet confirmed audio is kept in memory,
+    the recording itself is spooled to a temporary file for the AudioMemory.
+
+    Each stream holds a slot of the processing executor while it's open, so
+    live transcription counts against the same capacity as uploads.
+    """
+
+    @database_sync_to_async
+    def get_user(self, firebase_uid):
+        try:
+            UserProfile = apps.get_model('users', 'UserProfile')
+            return UserProfile.objects.filter(firebase_uid=firebase_uid).first()
+        except Exception as e:
+            print(f"Error in get_user: {str(e)}")
+            return None
+
+    async def connect(self):
+        # Extract token from the query string in URL
+        query_params = self.scope['query_string'].decode()
+        firebase_uid = None
+
+        for param in query_params.split('&'):
+            if param.startswith('token='):
+                firebase_uid = param.split('=')[1]
+                break
+
+        if not firebase_uid:
+            print("No valid Bearer token found in URL query string")
+            await self.close(code=4001)
+            return
+
+        user = await self.get_user(firebase_uid)
+        if not user:
+            print(f"User not found for UID: {firebase_uid}")
+            await self.close(code=4002)
+            return
+
+        self.user = user
+        self.encoding = 'pcm_s16le'
+        self.sample_rate = SAMPLE_RATE
+        self.container = 'ogg'
+        self.language = None
+        self.started = False
+        self.finished = False
+
+        # The recording as received, for the saved AudioMemory
+        self.recording = None
+        self.wav_writer = None
+        self.odd_byte = b''
+        # Unconfirmed 16 kHz audio, window_start is where it begins
+        self.audio = RollingAudio()
+        self.resampler = None
+        self.opus_pipe = None
+        self.opus_decoder = None
+        self.window_start = 0
+        self.decoded_until = 0
+        self.final_segments = []
+        self.decode_task = None
+
+        self.step_samples = int(getattr(settings, 'AUDIO_STREAM_STEP_SECONDS', 1.0) * SAMPLE_RATE)
+        self.commit_seconds = getattr(settings, 'AUDIO_STREAM_COMMIT_SECONDS', 8)
+        self.max_window_seconds = getattr(settings, 'AUDIO_STREAM_MAX_WINDOW_SECONDS', 25)
+
+        await self.accept()
+
+        # Admitted like an upload by the configured backend, the 'thread'
+        # backend holds a slot of its executor for the whole stream
+        from .dispatch import reserve_processing_slot
+        from .executor import ProcessingQueueFull
+        try:
+            reserve_processing_slot()
+            self.slot_reserved = True
+        except ProcessingQueueFull as e:
+            print(f"🚦 Processing queue is full, turned a stream away for {e.retry_after}s")
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Too many recordings are being processed, try again later',
+                'retry_after': e.retry_after
+            }))
+            await self.close(code=4029)
+            return
+
+        print(f"🎙️ Audio stream connected for {self.user.name}")
+
+        await self.send(text_data=json.dumps({
+            'type': 'connection_established',
+            'message': f'Connected as {self.user.name}'
+        }))
+
+    async def disconnect(self, close_code):
+        print(f"🎙️ Audio stream disconnected with code: {close_code}")
+        try:
+            # Don't lose a recording because the socket dropped before "stop"
+            if getattr(self, 'started', False) and not self.finished and self.recording is not None:
+                try:
+                    await self.finish(notify=False)
+                except Exception as e:
+                    print(f"❌ Could not save interrupted stream: {str(e)}")
+        finally:
+            if getattr(self, 'opus_pipe', None) is not None:
+                self.opus_pipe.finish()
+            if getattr(self, 'recording', None) is not None:
+                self.recording.close()
+            if getattr(self, 'slot_reserved', False):
+                from .dispatch import release_processing_slot
+                release_processing_slot()
+                self.slot_reserved = False
+
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            if text_data:
+                data = json.loads(text_data)
+                message_type = data.get('type', '')
+
+                if message_type == 'ping':
+                    await self.send(text_data=json.dumps({
+                        'type': 'pong',
+                        'timestamp': data.get('timestamp')
+                    }))
+                elif message_type == 'start':
+                    self.encoding = data.get('encoding', 'pcm_s16le')
+                    self.sample_rate = int(data.get('sample_rate', SAMPLE_RATE))
+                    self.container = data.get('container', 'ogg')
+                    self.language = data.get('language') or None
+                    self.started = True
+                    await self.send(text_data=json.dumps({'type': 'started'}))
+                elif message_type == 'stop':
+                    await self.finish()
+                else:
+                    await self.send(text_data=json.dumps({
+                        'type': 'error',
+                        'message': f'Unknown message type: {message_type}'
+                    }))
+
+            elif bytes_data:
+                if self.finished or not getattr(self, 'slot_reserved', False):
+                    return
+                self.started = True
+                self.add_audio(bytes_data)
+
+                # Decode in the background so frames keep flowing in meanwhile
+                if self.decode_task is None or self.decode_task.done():
+                    if self.available_samples() - self.decoded_until >= self.step_samples:
+                        self.decode_task = asyncio.create_task(self.transcribe_window())
+
+        except json.JSONDecodeError:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid JSON format'
+            }))
+        except Exception as e:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': f'Error processing message: {str(e)}'
+            }))
+
+    def open_recording(self):
+        self.recording = tempfile.TemporaryFile()
+        if self.encoding == 'pcm_s16le':
+            self.wav_writer = wave.open(self.recording, 'wb')
+            self.wav_writer.setnchannels(1)
+            self.wav_writer.setsampwidth(2)
+            self.wav_writer.setframerate(self.sample_rate)
+            self.resampler = LinearResampler(self.sample_rate)
+        else:
+            self.opus_pipe = StreamPipe()
+            self.opus_decoder = threading.Thread(target=self.decode_opus, name='stream-decoder', daemon=True)
+            self.opus_decoder.start()
+
+    def add_audio(self, frame):
+        if self.recording is None:
+            self.open_recording()
+
+        if self.encoding != 'pcm_s16le':
+            self.recording.write(frame)
+            self.opus_pipe.write_bytes(frame)
+            return
+
+        # Keep an odd trailing byte for the next frame
+        data = self.odd_byte + frame
+        usable = len(data) - len(data) % 2
+        self.odd_byte = data[usable:]
+        if usable:
+            self.wav_writer.writeframes(data[:usable])
+            samples = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32) / 32768.0
+            self.audio.append(self.resampler(samples))
+
+    def decode_opus(self):
+        """Decoder thread: demux and decode the container as its bytes arrive"""
+        import av
+        try:
+            container = av.open(self.opus_pipe, format='matroska' if self.container == 'webm' else 'ogg')
+            resampler = av.AudioResampler(format='flt', layout='mono', rate=SAMPLE_RATE)
+            for frame in container.decode(audio=0):
+                for resampled in resampler.resample(frame):
+                    self.audio.append(resampled.to_ndarray().reshape(-1))
+            for resampled in resampler.resample(None):
+                self.audio.append(resampled.to_ndarray().reshape(-1))
+        except Exception as e:
+            print(f"⚠️ Warning: Stream decoding stopped: {str(e)}")
+
+    def end_of_audio(self):
+        """Wait until everything received has been decoded"""
+        if self.opus_pipe is not None:
+            self.opus_pipe.finish()
+            self.opus_decoder.join()
+
+    def available_samples(self):
+        """Number of 16 kHz samples received so far"""
+        return self.audio.total
+
+    def confirmed_prompt(self):
+        """Tail of the confirmed text, used as context for the next window"""
+        text = " ".join(seg['text'].strip() for seg in self.final_segments)
+        return text[-200:] or None
+
+    async def transcribe_window(self, final=False):
+        from .audio_processing import transcribe_stream_window
+
+        self.decoded_until = self.available_samples()
+        window = self.audio.since(self.window_start)
+        if len(window) == 0:
+            return
+
+        offset = self.window_start / SAMPLE_RATE
+        window_seconds = len(window) / SAMPLE_RATE
+
+        segments = await sync_to_async(transcribe_stream_window, thread_sensitive=False)(
+            window,
+            beam_size=5 if final else 1,
+            initial_prompt=self.confirmed_prompt(),
+            language=whisper_language(self.language or self.user.language)
+        )
+        for seg in segments:
+            seg['start'] += offset
+            seg['end'] += offset
+
+        # Everything but the last segment is stable once the window is long
+        # enough, the last one may still grow with the next frames
+        if final or window_seconds >= self.max_window_seconds:
+            confirmed, pending = segments, []
+            self.window_start = self.window_start + len(window)
+        elif window_seconds >= self.commit_seconds and len(segments) > 1:
+            confirmed, pending = segments[:-1], segments[-1:]
+            self.window_start = int(pending[0]['start'] * SAMPLE_RATE)
+        else:
+            confirmed, pending = [], segments
+        self.audio.drop_before(self.window_start)
+
+        if confirmed:
+            self.final_segments.extend(confirmed)
+            await self.send(text_data=json.dumps({
+                'type': 'final',
+                'segments': confirmed
+            }))
+        if pending:
+            await self.send(text_data=json.dumps({
+                'type': 'partial',
+                'start': pending[0]['start'],
+                'text': " ".join(seg['text'].strip() for seg in pending)
+            }))
+
+    async def finish(self, notify=True):
+        """Transcribe what's left, save the AudioMemory and run the analysis"""
+        if self.finished:
+            return
+        self.finished = True
+
+        if self.decode_task is not None:
+            await self.decode_task
+        if self.recording is None:
+            self.open_recording()
+        await sync_to_async(self.end_of_audio, thread_sensitive=False)()
+        await self.transcribe_window(final=True)
+
+        text = " ".join(seg['text'].strip() for seg in self.final_segments).strip()
+        # The analysis is CPU bound, keep it off the thread the ORM calls of
+        # every consumer share
+        audio_memory = await sync_to_async(self.save_memory, thread_sensitive=False)(text)
+
+        if notify:
+            await self.send(text_data=json.dumps({
+                'type': 'completed',
+                'id': audio_memory.id,
+                'transcription': audio_memory.transcription,
+                'score': audio_memory.score,
+                'sentiment_label': audio_memory.sentiment_label,
+                'processing_error': audio_memory.processing_error
+            }))
+
+    def save_memory(self, text):
+        from django.db import close_old_connections
+        close_old_connections()
+        try:
+            return self._save_memory(text)
+        finally:
+            # Runs on a pool thread, don't leave its connection behind
+            close_old_connections()
+
+    def _save_memory(self, text):
+        from django.core.files import File
+        from .models import AudioMemory
+        from .pipeline import SegmentWriter, run_text_analysis
+
+        if self.wav_writer is not None:
+            # Writes the final frame count into the WAV header
+            self.wav_writer.close()
+        extension = 'wav' if self.encoding == 'pcm_s16le' else self.container
+        self.recording.seek(0)
+
+        audio_memory = AudioMemory(user=self.user, language=self.language, processing_complete=False)
+        audio_memory.audio_file.save(
+            f"stream_{int(time.time() * 1000)}.{extension}",
+            File(self.recording),
+            save=False
+        )
+        audio_memory.transcription = text or "[No speech detected]"
+        audio_memory.save()
+
+        segment_writer = SegmentWriter(audio_memory)
+        segment_writer(self.final_segments)
+        segment_writer.flush()
+
+        run_text_analysis(audio_memory, audio_memory.transcription)
+        audio_memory.processing_complete = True
+        audio_memory.save()
+        print(f"✅ Streamed audio saved as #{audio_memory.id}")
+        return audio_memory
@@ -0,0 +1,73 @@
+from .models import AudioMemory, TranscriptSegment
+
+# Everything the pipeline produces for an upload, copied on a duplicate
+RESULT_FIELDS = [
+    'transcription', 'score', 'sentiment_label', 'memory_references',
+    'routine_references', 'time_indicators', 'location_indicators',
+    'severity_indicators', 'potential_concerns', 'transcription_tier',
+    'analyzer_version',
+]
+
+
+def find_in_flight_duplicate(user, content_hash):
+    """The same user's identical upload that is still being processed (a client retry)"""
+    if not content_hash:
+        return None
+    return AudioMemory.objects.filter(
+        user=user, content_hash=content_hash, processing_complete=False
+    ).order_by('-id').first()
+
+
+def find_processed_duplicate(user, content_hash, language=None):
+    """
+    The user's most recent successfully processed upload with the same
+    content and language. Other users' uploads never match: their files live
+    under their own path and their results aren't this user's to see.
+    """
+    if not content_hash:
+        return None
+    return AudioMemory.objects.filter(
+        user=user,
+        content_hash=content_hash,
+        language=language,
+        processing_complete=True,
+        processing_error__isnull=True,
+        transcription__isnull=False,
+    ).order_by('-id').first()
+
+
+def create_from_duplicate(user, source):
+    """
+    Create a completed AudioMemory for user that reuses the stored file and
+    the transcription and analysis results of source.
+    """
+    audio_memory = AudioMemory(
+        user=user,
+        content_hash=source.content_hash,
+        language=source.language,
+        processing_complete=True,
+    )
+    # Point at the already stored file instead of saving a second copy
+    audio_memory.audio_file.name = source.audio_file.name
+    audio_memory.normalized_file.name = source.normalized_file.name
+    audio_memory.normalized_offset = source.normalized_offset
+    for field in RESULT_FIELDS:
+        setattr(audio_memory, field, getattr(source, field))
+    audio_memory.save()
+    
+    TranscriptSegment.objects.bulk_create([
+        TranscriptSegment(
+            audio_memory=audio_memory, index=segment.index, start=segment.start,
+            end=segment.end, text=segment.text, confidence=segment.confidence,
+            score=segment.score
+        )
+        for segment in source.segments.all()
+    ])
+    return audio_memory
+
+
+def file_is_shared(audio_memory):
+    """Whether another AudioMemory still points at this row's file"""
+    return AudioMemory.objects.filter(
+        audio_file=audio_memory.audio_file.name
+    ).exclude(id=audio_memory.id).exists()
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta
+
+
+def dispatch_audio_processing(audio_memory_id, reserved=False):
+    """
+    Hand an uploaded AudioMemory to the configured processing backend.
+    reserved says the upload holds a slot from reserve_processing_slot().
+
+    'thread'  - process on the bounded executor inside the web process
+    'workers' - queue a TranscriptionJob for the resident worker processes
+                (see the run_transcription_workers management command)
+    'celery'  - send the transcribe -> analyze -> persist task chain to the
+                Celery queues (see tasks.py)
+    """
+    backend = getattr(settings, 'AUDIO_PROCESSING_BACKEND', 'thread')
+
+    if backend == 'workers':
+        from .models import TranscriptionJob
+        TranscriptionJob.objects.update_or_create(
+            audio_memory_id=audio_memory_id,
+            defaults={
+                'status': TranscriptionJob.STATUS_QUEUED,
+                'worker': None,
+                'claimed_at': None,
+                'finished_at': None,
+                'created_at': timezone.now(),
+            }
+        )
+        print(f"📥 Audio #{audio_memory_id} queued for the transcription workers")
+        return
+
+    if backend == 'celery':
+        from .tasks import audio_processing_chain
+        audio_processing_chain(audio_memory_id).apply_async()
+        print(f"📥 Audio #{audio_memory_id} sent to the Celery audio queues")
+        return
+
+    # Import here so the web process only loads the pipeline when it runs it
+    from .executor import get_executor
+    from .pipeline import process_audio_in_background
+    get_executor().submit(process_audio_in_background, audio_memory_id, reserved=reserved)
+
+
+def reserve_processing_slot():
+    """
+    Admission control before an upload is saved: takes a slot in the bounded
+    executor of the 'thread' backend, raises ProcessingQueueFull when it's
+    full. The 'workers' and 'celery' backends queue outside the web process
+    and admit everything.
+    """
+    if getattr(settings, 'AUDIO_PROCESSING_BACKEND', 'thread') == 'thread':
+        from .executor import get_executor
+        get_executor().reserve()
+
+
+def release_processing_slot():
+    """Give back the slot of an upload that won't be dispatched after all"""
+    if getattr(settings, 'AUDIO_PROCESSING_BACKEND', 'thread') == 'thread':
+        from .executor import get_executor
+        get_executor().release()
+
+
+def pending_job_count(exclude_id=None):
+    """
+    Number of other uploads waiting for or in processing by the configured
+    backend, used as the queue depth. exclude_id is the upload asking.
+    """
+    backend = getattr(settings, 'AUDIO_PROCESSING_BACKEND', 'thread')
+
+    if backend == 'workers':
+        from .models import TranscriptionJob
+        queryset = TranscriptionJob.objects.filter(
+            status__in=[TranscriptionJob.STATUS_QUEUED, TranscriptionJob.STATUS_RUNNING]
+        )
+        if exclude_id is not None:
+            queryset = queryset.exclude(audio_memory_id=exclude_id)
+        return queryset.count()
+
+    if backend == 'thread':
+        # This process's executor is the queue, the asking upload is one of its jobs
+        from .executor import get_executor
+        pending = get_executor().stats()['pending']
+        return max(0, pending - 1) if exclude_id is not None else pending
+
+    # The broker's queues aren't cheap to measure: count recent unfinished
+    # uploads, leaving out rows orphaned long ago
+    from .models import AudioMemory
+    since = timezone.now() - timedelta(seconds=getattr(settings, 'AUDIO_QUEUE_DEPTH_WINDOW', 7200))
+    queryset = AudioMemory.objects.filter(processing_complete=False, timestamp__gte=since)
+    if exclude_id is not None:
+        queryset = queryset.exclude(id=exclude_id)
+    return queryset.count()
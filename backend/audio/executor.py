@@ -0,0 +1,133 @@
+"""
+Bounded in-process executor for the 'thread' processing backend.
+
+A fixed number of worker threads (AUDIO_EXECUTOR_WORKERS) run the uploads,
+and at most AUDIO_EXECUTOR_QUEUE_SIZE more wait for them. Uploads are
+admitted with reserve() before anything is saved: when every slot is taken
+it raises ProcessingQueueFull, whose retry_after estimates how long the
+queue ahead takes to drain from an exponential moving average of the
+observed processing times.
+"""
+import math
+import queue
+import threading
+import time
+import traceback
+from django.conf import settings
+
+
+class ProcessingQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Processing queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    def __init__(self, workers, queue_size, initial_duration=60.0, max_retry_after=600, smoothing=0.2):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.max_retry_after = max_retry_after
+        self.smoothing = smoothing
+        # Seconds per job, starts from a guess until jobs have been timed
+        self.average_duration = float(initial_duration)
+        # Reserved, queued and running jobs, the queue itself is unbounded
+        # because capacity is enforced here, at admission
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    @property
+    def capacity(self):
+        return self.workers + self.queue_size
+
+    def retry_after(self):
+        """Seconds until the jobs now waiting have been processed, at the observed rate"""
+        with self._lock:
+            waiting = max(1, self.pending - self.workers + 1)
+            seconds = waiting * self.average_duration / self.workers
+        return min(self.max_retry_after, max(1, math.ceil(seconds)))
+
+    def reserve(self):
+        """Take a slot for a job about to be submitted, raises ProcessingQueueFull if there is none"""
+        with self._lock:
+            if self.pending < self.capacity:
+                self.pending += 1
+                return
+            self.rejected += 1
+        raise ProcessingQueueFull(self.retry_after())
+
+    def release(self):
+        """Give back a reserved slot that won't be submitted"""
+        with self._lock:
+            self.pending = max(0, self.pending - 1)
+
+    def submit(self, fn, *args, reserved=False):
+        """
+        Queue fn(*args). Without a reservation the job is taken even over
+        capacity, it has already been accepted by then.
+        """
+        if not reserved:
+            with self._lock:
+                self.pending += 1
+        self._start_workers()
+        self._jobs.put((fn, args))
+
+    def _start_workers(self):
+        with self._lock:
+            # Started on first use so forked server processes get their own
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(
+                    target=self._work, name=f"audio-executor-{len(self._threads)}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        from django.db import close_old_connections
+        while True:
+            fn, args = self._jobs.get()
+            close_old_connections()
+            start_time = time.time()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"❌ Executor job failed: {str(e)}")
+                print(f"❌ Traceback: {traceback.format_exc()}")
+            finally:
+                duration = time.time() - start_time
+                close_old_connections()
+                with self._lock:
+                    self.pending = max(0, self.pending - 1)
+                    self.completed += 1
+                    self.average_duration += self.smoothing * (duration - self.average_duration)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'pending': self.pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'average_duration': round(self.average_duration, 2),
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = BoundedExecutor(
+                getattr(settings, 'AUDIO_EXECUTOR_WORKERS', 2),
+                getattr(settings, 'AUDIO_EXECUTOR_QUEUE_SIZE', 20),
+                initial_duration=getattr(settings, 'AUDIO_EXECUTOR_INITIAL_DURATION', 60),
+                max_retry_after=getattr(settings, 'AUDIO_EXECUTOR_MAX_RETRY_AFTER', 600),
+            )
+    return _executor
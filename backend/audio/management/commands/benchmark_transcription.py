@@ -0,0 +1,117 @@
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from audio.benchmark import add_agreement, benchmark_config
+
+AUDIO_EXTENSIONS = ('.ogg', '.wav', '.mp3', '.m4a', '.webm', '.flac')
+
+
+def csv_list(value, cast=str):
+    return [cast(item.strip()) for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark transcription over a local audio corpus for every combination of "
+        "implementation, compute type, beam size and thread count. The first "
+        "configuration is the reference the word agreement of the others is measured against."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus',
+            default=str(settings.BASE_DIR.parent / 'sentiment_analysis_project' / 'audio'),
+            help="Directory of audio files to transcribe"
+        )
+        parser.add_argument('--model', default='small', help="Whisper model size")
+        parser.add_argument('--impls', default='faster_whisper,whisper',
+                            help="Comma separated implementations: faster_whisper, whisper")
+        parser.add_argument('--compute-types', default='float32,int8',
+                            help="Comma separated faster_whisper compute types")
+        parser.add_argument('--beam-sizes', default='5,1', help="Comma separated beam sizes")
+        parser.add_argument('--threads', default='0',
+                            help="Comma separated CPU thread counts, 0 lets the engine decide")
+        parser.add_argument('--output', default=None,
+                            help="Where to write the JSON results (default: transcription_benchmark_<time>.json)")
+
+    def handle(self, *args, **options):
+        corpus = options['corpus']
+        if not os.path.isdir(corpus):
+            raise CommandError(f"Corpus directory not found: {corpus}")
+        file_paths = sorted(
+            os.path.join(corpus, name) for name in os.listdir(corpus)
+            if name.lower().endswith(AUDIO_EXTENSIONS)
+        )
+        if not file_paths:
+            raise CommandError(f"No audio files in {corpus}")
+
+        configs = []
+        for impl in csv_list(options['impls']):
+            # The original whisper package has no int8 CPU mode
+            compute_types = csv_list(options['compute_types']) if impl == 'faster_whisper' else ['float32']
+            for compute_type, beam_size, threads in itertools.product(
+                compute_types, csv_list(options['beam_sizes'], int), csv_list(options['threads'], int)
+            ):
+                configs.append({
+                    'impl': impl,
+                    'model': options['model'],
+                    'compute_type': compute_type,
+                    'beam_size': beam_size,
+                    'threads': threads,
+                })
+
+        self.stdout.write(f"📊 Benchmarking {len(configs)} configurations on {len(file_paths)} files")
+
+        # A fresh process per configuration keeps load time and peak RSS separate
+        ctx = multiprocessing.get_context('spawn')
+        results = []
+        for config in configs:
+            name = "{impl}/{model}/{compute_type}/beam{beam_size}/threads{threads}".format(**config)
+            try:
+                with ctx.Pool(1) as pool:
+                    result = pool.apply(benchmark_config, (config, file_paths))
+                self.stdout.write(
+                    f"✅ {name}: {result['wall_time']:.2f}s for {result['audio_seconds']:.1f}s of audio, "
+                    f"RTF {result['rtf']}, peak RSS {result['peak_rss_mb']} MB"
+                )
+            except Exception as e:
+                result = {'config': config, 'error': f"{type(e).__name__}: {str(e)}"}
+                self.stdout.write(f"❌ {name}: {result['error']}")
+            results.append(result)
+
+        successful = [result for result in results if 'error' not in result]
+        if successful:
+            add_agreement(results, reference_index=results.index(successful[0]))
+            for result in successful:
+                self.stdout.write(f"🔤 {result['config']} word agreement: {result['agreement']}")
+
+        report = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': self.git_commit(),
+            'machine': {
+                'platform': platform.platform(),
+                'python': platform.python_version(),
+                'cpu_count': os.cpu_count(),
+            },
+            'corpus': file_paths,
+            'results': results,
+        }
+
+        output = options['output'] or f"transcription_benchmark_{time.strftime('%Y%m%d-%H%M%S')}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(f"💾 Results saved to {output}")
+
+    def git_commit(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+            ).decode().strip()
+        except Exception:
+            return None
@@ -0,0 +1,85 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from audio.audio_processing import DISTILBERT_MODEL, DISTILBERT_ONNX_FILE
+from backend.model_artifacts import artifact_path, artifacts_dir, hash_files, load_manifest, save_manifest
+
+ARTIFACT_NAME = 'distilbert-sst2-onnx'
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the DistilBERT sentiment model to ONNX and quantize it to int8, for "
+        "AUDIO_SENTIMENT_BACKEND = 'onnx'"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--opset', type=int, default=17, help="ONNX opset to export with")
+        parser.add_argument('--keep-fp32', action='store_true',
+                            help="Keep the unquantized model.onnx next to the int8 one")
+
+    def handle(self, *args, **options):
+        try:
+            import torch
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        except ImportError as e:
+            raise CommandError(f"Exporting needs torch, transformers and onnxruntime: {str(e)}")
+
+        # Export from the pinned copy when fetch_models has fetched one
+        source = artifact_path('distilbert-sst2') or DISTILBERT_MODEL
+        output_dir = os.path.join(artifacts_dir(), ARTIFACT_NAME)
+        os.makedirs(output_dir, exist_ok=True)
+        fp32_path = os.path.join(output_dir, 'model.onnx')
+        int8_path = os.path.join(output_dir, DISTILBERT_ONNX_FILE)
+
+        self.stdout.write(f"📤 Exporting {source} to ONNX (opset {options['opset']})...")
+        start_time = time.time()
+        model = AutoModelForSequenceClassification.from_pretrained(source).eval()
+        tokenizer = AutoTokenizer.from_pretrained(source)
+        example = tokenizer(["An example sentence to trace the model with."], return_tensors='pt')
+        export_options = dict(
+            input_names=['input_ids', 'attention_mask'],
+            output_names=['logits'],
+            dynamic_axes={
+                'input_ids': {0: 'batch', 1: 'sequence'},
+                'attention_mask': {0: 'batch', 1: 'sequence'},
+                'logits': {0: 'batch'},
+            },
+            opset_version=options['opset'],
+        )
+        with torch.no_grad():
+            try:
+                # Newer torch defaults to the dynamo exporter, which ignores dynamic_axes
+                torch.onnx.export(
+                    model, (example['input_ids'], example['attention_mask']), fp32_path,
+                    dynamo=False, **export_options
+                )
+            except TypeError:
+                torch.onnx.export(
+                    model, (example['input_ids'], example['attention_mask']), fp32_path, **export_options
+                )
+
+        self.stdout.write("🗜️ Quantizing the weights to int8...")
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        tokenizer.save_pretrained(output_dir)
+        model.config.save_pretrained(output_dir)
+        fp32_size = os.path.getsize(fp32_path)
+        if not options['keep_fp32']:
+            os.remove(fp32_path)
+
+        manifest = load_manifest(reload=True)
+        manifest['artifacts'][ARTIFACT_NAME] = {
+            'source': 'export',
+            'exported_from': 'distilbert-sst2',
+            'revision': manifest['artifacts'].get('distilbert-sst2', {}).get('revision'),
+            'path': ARTIFACT_NAME,
+            'files': hash_files(output_dir),
+        }
+        save_manifest(manifest)
+
+        self.stdout.write(
+            f"✅ {int8_path}: {os.path.getsize(int8_path) / 1024 / 1024:.0f} MB "
+            f"(fp32 {fp32_size / 1024 / 1024:.0f} MB) in {time.time() - start_time:.1f}s"
+        )
+        self.stdout.write("   Set AUDIO_SENTIMENT_BACKEND = 'onnx' to use it")
@@ -0,0 +1,93 @@
+import multiprocessing
+import time
+from django.core.management.base import BaseCommand, CommandError
+from backend.model_artifacts import (
+    artifact_specs, artifacts_dir, fetch_artifact, load_manifest, measure_cold_start, save_manifest,
+    verify_artifact
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Download every model and lexicon into MODEL_ARTIFACTS_DIR, pin their revisions and "
+        "file hashes in manifest.json and measure how long each takes to load from disk"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', default=None, help="Comma separated artifact names to fetch")
+        parser.add_argument('--update', action='store_true',
+                            help="Move pinned artifacts to the latest revision instead of the pinned one")
+        parser.add_argument('--verify', action='store_true',
+                            help="Only check the fetched files against the manifest, download nothing")
+        parser.add_argument('--no-measure', action='store_true', help="Skip the cold start measurement")
+
+    def handle(self, *args, **options):
+        specs = artifact_specs()
+        names = [name.strip() for name in options['only'].split(',')] if options['only'] else list(specs)
+        unknown = [name for name in names if name not in specs]
+        if unknown:
+            raise CommandError(f"Unknown artifacts: {', '.join(unknown)} (choose from {', '.join(specs)})")
+
+        manifest = load_manifest(reload=True)
+
+        if options['verify']:
+            self.verify(manifest, names)
+            return
+
+        for name in names:
+            pinned = manifest['artifacts'].get(name, {}).get('revision')
+            revision = None if options['update'] else pinned
+            self.stdout.write(f"📥 Fetching {name}" + (f" at {revision}" if revision else ""))
+            start_time = time.time()
+            try:
+                entry = fetch_artifact(name, specs[name], revision=revision)
+            except Exception as e:
+                raise CommandError(f"Failed to fetch {name}: {str(e)}")
+            manifest['artifacts'][name] = entry
+            save_manifest(manifest)
+            self.stdout.write(
+                f"✅ {name}: {len(entry['files'])} files, revision {entry['revision']} "
+                f"({time.time() - start_time:.1f}s)"
+            )
+
+        manifest['fetched_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        save_manifest(manifest)
+        self.stdout.write(f"💾 Manifest written to {artifacts_dir()}")
+
+        if not options['no_measure']:
+            manifest['cold_start'] = {
+                'measured_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'seconds': self.measure(names),
+            }
+            save_manifest(manifest)
+
+    def measure(self, names):
+        """Load each artifact in a fresh process, so import and read time count too"""
+        ctx = multiprocessing.get_context('spawn')
+        seconds = {}
+        for name in names:
+            with ctx.Pool(1) as pool:
+                try:
+                    seconds[name] = pool.apply(measure_cold_start, (name,))
+                except Exception as e:
+                    self.stdout.write(f"⚠️ Could not load {name}: {str(e)}")
+                    continue
+            self.stdout.write(f"⏱️ Cold start {name}: {seconds[name]:.2f}s")
+        return seconds
+
+    def verify(self, manifest, names):
+        failed = False
+        for name in names:
+            entry = manifest['artifacts'].get(name)
+            if entry is None:
+                self.stdout.write(f"❌ {name}: not fetched")
+                failed = True
+                continue
+            mismatched = verify_artifact(entry)
+            if mismatched:
+                self.stdout.write(f"❌ {name}: {len(mismatched)} files missing or changed: {', '.join(mismatched)}")
+                failed = True
+            else:
+                self.stdout.write(f"✅ {name}: {len(entry['files'])} files match revision {entry['revision']}")
+        if failed:
+            raise CommandError("Model artifacts don't match the manifest, run fetch_models again")
@@ -0,0 +1,82 @@
+import multiprocessing
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from audio.audio_processing import analyzer_version
+from audio.reanalysis import (
+    analyze_row, clear_checkpoint, init_worker, load_checkpoint, save_checkpoint, stale_batches,
+    stale_memories, write_results
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-run the text analysis on processed memories analyzed by an older analyzer version, "
+        "resuming where an interrupted run stopped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=getattr(settings, 'AUDIO_REANALYZE_BATCH_SIZE', 200),
+            help="Rows read, analyzed and written back at a time"
+        )
+        parser.add_argument(
+            '--workers', type=int, default=getattr(settings, 'AUDIO_REANALYZE_WORKERS', 2),
+            help="Analysis worker processes"
+        )
+        parser.add_argument(
+            '--rate', type=float, default=getattr(settings, 'AUDIO_REANALYZE_RATE', 50),
+            help="Most rows per second to re-analyze (0 = as fast as possible)"
+        )
+        parser.add_argument('--restart', action='store_true', help="Ignore the checkpoint of an interrupted run")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the stale rows")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        num_workers = max(1, options['workers'])
+        rate = options['rate']
+
+        after_id = 0 if options['restart'] else load_checkpoint()
+        if after_id:
+            self.stdout.write(f"⏩ Resuming after audio #{after_id}")
+
+        total = stale_memories().filter(id__gt=after_id).count()
+        self.stdout.write(f"🔍 {total} memories need re-analysis for analyzer version {analyzer_version()}")
+        if options['dry_run'] or not total:
+            return
+
+        stats = {'analyzed': 0, 'written': 0, 'failed': 0}
+        start_time = time.time()
+        # Spawned workers only analyze text, the database is read and written here
+        ctx = multiprocessing.get_context('spawn')
+        with ctx.Pool(num_workers, initializer=init_worker) as pool:
+            for batch in stale_batches(batch_size, after_id):
+                batch_start = time.time()
+                results = pool.map(analyze_row, batch, chunksize=max(1, len(batch) // (num_workers * 4)))
+                written = write_results(batch, results)
+
+                failures = [(audio_memory_id, error) for audio_memory_id, _, error in results if error]
+                for audio_memory_id, error in failures:
+                    self.stdout.write(f"⚠️ Audio #{audio_memory_id} failed: {error}")
+
+                stats['analyzed'] += len(batch)
+                stats['written'] += written
+                stats['failed'] += len(failures)
+                after_id = batch[-1][0]
+                save_checkpoint(after_id, stats)
+
+                elapsed = time.time() - start_time
+                self.stdout.write(
+                    f"🔁 {stats['analyzed']}/{total} analyzed, {stats['written']} written, "
+                    f"{stats['failed']} failed ({stats['analyzed'] / elapsed:.1f} rows/s), up to audio #{after_id}"
+                )
+
+                # Stay under the rate so live processing keeps the CPU and database
+                if rate > 0:
+                    time.sleep(max(0.0, len(batch) / rate - (time.time() - batch_start)))
+
+        clear_checkpoint()
+        self.stdout.write(
+            f"✅ Re-analysis done: {stats['written']} rows updated, {stats['failed']} failed "
+            f"in {time.time() - start_time:.1f}s"
+        )
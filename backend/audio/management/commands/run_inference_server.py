@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from nlp_inference.server import create_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the sentiment and NER models from one process over localhost HTTP or a Unix socket, "
+        "batching concurrent requests"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--bind', default=getattr(settings, 'NLP_INFERENCE_BIND', '127.0.0.1:8765'),
+            help="host:port or unix:/path/to.sock"
+        )
+        parser.add_argument(
+            '--tasks', default=','.join(getattr(settings, 'NLP_INFERENCE_TASKS', ['sentiment', 'ner'])),
+            help="Comma separated tasks to serve"
+        )
+        parser.add_argument(
+            '--max-batch-size', type=int, default=getattr(settings, 'NLP_INFERENCE_MAX_BATCH', 32),
+            help="Most texts run through a model at once"
+        )
+        parser.add_argument(
+            '--max-batch-tokens', type=int, default=getattr(settings, 'NLP_INFERENCE_MAX_BATCH_TOKENS', 8192),
+            help="Most (estimated) tokens in a batch once padded to its longest text"
+        )
+        parser.add_argument(
+            '--max-wait-ms', type=float, default=getattr(settings, 'NLP_INFERENCE_MAX_WAIT_MS', 10),
+            help="How long the first text of a batch waits for others to join it"
+        )
+        parser.add_argument(
+            '--threads', type=int, default=None,
+            help="torch threads (defaults to the whole CPU_THREAD_BUDGET_TOTAL)"
+        )
+
+    def handle(self, *args, **options):
+        # This process only runs these models, so they get the whole thread
+        # budget instead of DistilBERT's share of it
+        settings.CPU_THREAD_BUDGET = dict(
+            getattr(settings, 'CPU_THREAD_BUDGET', {}), distilbert={'share': 1.0, 'max_jobs': 1}
+        )
+        if options['threads']:
+            settings.CPU_THREAD_BUDGET_TOTAL = options['threads']
+
+        tasks = [task.strip() for task in options['tasks'].split(',') if task.strip()]
+        try:
+            server = create_server(
+                options['bind'], tasks,
+                max_batch_size=options['max_batch_size'],
+                max_batch_tokens=options['max_batch_tokens'],
+                max_wait=options['max_wait_ms'] / 1000,
+                request_timeout=getattr(settings, 'NLP_INFERENCE_TIMEOUT', 30),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"🚀 NLP inference server ({', '.join(tasks)}) listening on {options['bind']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write("👋 NLP inference server stopped")
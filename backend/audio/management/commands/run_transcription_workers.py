@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from audio.transcription_worker import requeue_stale_jobs, requeue_worker_jobs, worker_main
+
+
+class Command(BaseCommand):
+    help = "Run a pool of resident transcription workers that process queued audio jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=getattr(settings, 'AUDIO_TRANSCRIPTION_WORKERS', 2),
+            help="Number of worker processes, each holding its own Whisper model"
+        )
+        parser.add_argument(
+            '--poll-interval', type=float,
+            default=getattr(settings, 'AUDIO_WORKER_POLL_INTERVAL', 1.0),
+            help="Seconds an idle worker waits before checking the queue again"
+        )
+        parser.add_argument(
+            '--shutdown-timeout', type=float,
+            default=getattr(settings, 'AUDIO_WORKER_SHUTDOWN_TIMEOUT', 30),
+            help="Seconds workers get to finish their current job when stopping, "
+                 "the jobs of workers still running after that are requeued"
+        )
+
+    def handle(self, *args, **options):
+        num_workers = options['workers']
+        poll_interval = options['poll_interval']
+
+        stale_timeout = getattr(settings, 'AUDIO_JOB_STALE_TIMEOUT', 300)
+        sweep_interval = getattr(settings, 'AUDIO_JOB_SWEEP_INTERVAL', 60)
+
+        # Jobs left running by a previous shutdown or a crashed host are picked up again
+        requeue_stale_jobs(stale_timeout)
+        last_sweep = time.time()
+
+        # Give each worker an equal part of the machine's thread budget,
+        # spawned workers read it from the environment when settings load
+        if not os.environ.get('CPU_THREAD_BUDGET_TOTAL'):
+            os.environ['CPU_THREAD_BUDGET_TOTAL'] = str(max(1, (os.cpu_count() or 1) // max(1, num_workers)))
+
+        # Spawn so each worker starts from a clean interpreter
+        ctx = multiprocessing.get_context('spawn')
+        workers = {}
+
+        # Names are unique across hosts and runs, jobs are requeued by worker name
+        name_prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+        def start_worker(index):
+            name = f"{name_prefix}-worker-{index}"
+            process = ctx.Process(target=worker_main, args=(name, poll_interval), name=name)
+            process.start()
+            workers[index] = process
+            self.stdout.write(f"🚀 Started {name} (pid {process.pid})")
+
+        for index in range(num_workers):
+            start_worker(index)
+
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        # Supervise: restart any worker that dies until we're asked to stop
+        while not stopping:
+            for index, process in list(workers.items()):
+                if not process.is_alive():
+                    self.stdout.write(f"⚠️ {process.name} exited with code {process.exitcode}, restarting")
+                    close_old_connections()
+                    requeue_worker_jobs(process.name)
+                    start_worker(index)
+            # Catch jobs of workers that died on other hosts
+            if time.time() - last_sweep >= sweep_interval:
+                close_old_connections()
+                requeue_stale_jobs(stale_timeout)
+                last_sweep = time.time()
+            time.sleep(1)
+
+        # SIGTERM asks each worker to finish its current job and exit
+        self.stdout.write("🛑 Stopping transcription workers...")
+        for process in workers.values():
+            process.terminate()
+        deadline = time.time() + options['shutdown_timeout']
+        for process in workers.values():
+            process.join(max(0.0, deadline - time.time()))
+
+        close_old_connections()
+        for process in workers.values():
+            if process.is_alive():
+                self.stdout.write(f"⚠️ {process.name} did not finish in time, killing it")
+                process.kill()
+                process.join()
+            requeue_worker_jobs(process.name)
@@ -0,0 +1,137 @@
+import os
+import signal
+import socket
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from backend.prefork import PRELOADERS, memory_usage, preload_models
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the ASGI application with several daphne workers forked from a parent "
+        "that has already loaded the models, so the weights are shared copy-on-write"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'PREFORK_WORKERS', 2))
+        parser.add_argument('--bind', default='0.0.0.0', help="Address to listen on")
+        parser.add_argument('--port', type=int, default=8000)
+        parser.add_argument(
+            '--models', default=','.join(getattr(settings, 'PREFORK_PRELOAD_MODELS', list(PRELOADERS))),
+            help=f"Comma separated models to load before forking: {', '.join(PRELOADERS)}"
+        )
+        parser.add_argument(
+            '--report-interval', type=float, default=getattr(settings, 'PREFORK_MEMORY_REPORT_INTERVAL', 60),
+            help="Seconds between memory reports, 0 to disable"
+        )
+
+    def handle(self, *args, **options):
+        if not hasattr(os, 'fork'):
+            raise CommandError("serve_preforked needs os.fork()")
+
+        # Everything the workers import or load from here on is shared
+        from backend.asgi import application
+        models = [name.strip() for name in options['models'].split(',') if name.strip()]
+        try:
+            preload_models(models)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # One listening socket, inherited by every worker
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((options['bind'], options['port']))
+        sock.listen(128)
+        sock.set_inheritable(True)
+        self.stdout.write(f"🌐 Listening on {options['bind']}:{options['port']}")
+
+        # Don't hand the parent's database connections to the children
+        from django.db import connections
+        connections.close_all()
+
+        workers = {}
+
+        def start_worker(index):
+            pid = os.fork()
+            if pid == 0:
+                self.run_worker(application, sock)
+                os._exit(0)
+            workers[pid] = index
+            self.stdout.write(f"🚀 Started worker-{index} (pid {pid})")
+
+        for index in range(options['workers']):
+            start_worker(index)
+
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        report_interval = options['report_interval']
+        last_report = time.time()
+
+        # Supervise: fork a fresh worker from the preloaded parent when one dies
+        while not stopping:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid and pid in workers:
+                index = workers.pop(pid)
+                self.stdout.write(f"⚠️ worker-{index} (pid {pid}) exited with status {status}, restarting")
+                start_worker(index)
+
+            if report_interval and time.time() - last_report >= report_interval:
+                self.report_memory(workers)
+                last_report = time.time()
+            time.sleep(1)
+
+        self.stdout.write("🛑 Stopping workers...")
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in workers:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+
+    def run_worker(self, application, sock):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+        # The daphne app installed the twisted reactor in the parent, and its
+        # epoll instance is shared by every forked worker. Give this worker
+        # a reactor (and event loop) of its own
+        import asyncio
+        import sys
+        import daphne.server
+        from twisted.internet import asyncioreactor
+        del sys.modules['twisted.internet.reactor']
+        asyncioreactor.install(asyncio.new_event_loop())
+        from twisted.internet import reactor
+        daphne.server.reactor = reactor
+
+        daphne.server.Server(
+            application=application,
+            endpoints=[f"fd:fileno={sock.fileno()}"],
+        ).run()
+
+    def report_memory(self, workers):
+        """Print how much memory each process holds privately vs. shares with the others"""
+        rows = [('parent', os.getpid())] + [(f"worker-{index}", pid) for pid, index in sorted(workers.items())]
+        for name, pid in rows:
+            usage = memory_usage(pid)
+            if usage is None:
+                continue
+            self.stdout.write(
+                f"🧠 {name} (pid {pid}): RSS {usage['rss']} MB = private {usage['private']} MB "
+                f"+ shared {usage['shared']} MB, PSS {usage['pss']} MB"
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-17 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0009_audiomemory_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiomemory',
+            name='transcription_tier',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-17 07:32
+
+import audio.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0010_audiomemory_transcription_tier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiomemory',
+            name='normalized_file',
+            field=models.FileField(blank=True, null=True, upload_to=audio.models.user_audio_path),
+        ),
+        migrations.AddField(
+            model_name='audiomemory',
+            name='normalized_offset',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
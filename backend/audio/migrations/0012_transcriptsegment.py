@@ -0,0 +1,31 @@
+# Generated by Django 4.2.20 on 2026-10-17 07:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0011_audiomemory_normalized_file_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('start', models.FloatField()),
+                ('end', models.FloatField()),
+                ('text', models.TextField()),
+                ('confidence', models.FloatField(blank=True, null=True)),
+                ('score', models.FloatField(blank=True, null=True)),
+                ('audio_memory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segments', to='audio.audiomemory')),
+            ],
+            options={
+                'ordering': ['audio_memory', 'index'],
+                'unique_together': {('audio_memory', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-17 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0012_transcriptsegment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiomemory',
+            name='language',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-17 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio', '0014_audiouploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiomemory',
+            name='analyzer_version',
+            field=models.CharField(blank=True, db_index=True, max_length=40, null=True),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.conf import settings
 from users.models import UserProfile
@@ -9,9 +10,13 @@ def user_audio_path(instance, filename):
 class AudioMemory(models.Model):
     user = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
     audio_file = models.FileField(upload_to=user_audio_path)
+    # Decoded 16 kHz mono PCM with silence trimmed, stored next to the original
+    normalized_file = models.FileField(upload_to=user_audio_path, blank=True, null=True)
+    normalized_offset = models.FloatField(null=True, blank=True)  # Seconds trimmed from the start
     transcription = models.TextField(blank=True, null=True)
     score = models.FloatField(null=True, blank=True)  # Sentiment score
     timestamp = models.DateTimeField(auto_now_add=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # SHA-256 of the upload
 
     # NEW FIELDS BELOW
     sentiment_label = models.CharField(max_length=50, blank=True, null=True)
@@ -25,6 +30,78 @@ class AudioMemory(models.Model):
     # Processing status
     processing_complete = models.BooleanField(default=False)
     processing_error = models.TextField(blank=True, null=True)
+    transcription_tier = models.CharField(max_length=50, blank=True, null=True)  # e.g. "small/beam5"
+    language = models.CharField(max_length=10, blank=True, null=True)  # Overrides the user's language for this upload
+    analyzer_version = models.CharField(max_length=40, blank=True, null=True, db_index=True)  # analyzer_version() of the stored analysis
 
     def __str__(self):
-        return f"Audio Memory {self.id} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"Audio Memory {self.id} - {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+class TranscriptionJob(models.Model):
+    """Queue entry for the resident transcription workers"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    audio_memory = models.OneToOneField(AudioMemory, on_delete=models.CASCADE, related_name='transcription_job')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, db_index=True)
+    worker = models.CharField(max_length=100, blank=True, null=True)  # Worker that claimed the job
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Last sign of life from the worker running it
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Transcription Job {self.id} - Audio {self.audio_memory_id} ({self.status})"
+
+class TranscriptSegment(models.Model):
+    """One decoded segment of an AudioMemory's transcription"""
+    audio_memory = models.ForeignKey(AudioMemory, on_delete=models.CASCADE, related_name='segments')
+    index = models.PositiveIntegerField()  # Position within the transcription
+    start = models.FloatField()  # Seconds from the start of the original upload
+    end = models.FloatField()
+    text = models.TextField()
+    confidence = models.FloatField(null=True, blank=True)  # exp(avg_logprob) of the segment's tokens
+    score = models.FloatField(null=True, blank=True)  # Sentiment score of this segment alone
+
+    class Meta:
+        ordering = ['audio_memory', 'index']
+        unique_together = ('audio_memory', 'index')
+
+    def __str__(self):
+        return f"Segment {self.index} of Audio {self.audio_memory_id} ({self.start:.1f}-{self.end:.1f}s)"
+
+class AudioUploadSession(models.Model):
+    """
+    A resumable upload in progress. Chunks are appended to a part file on
+    disk until received reaches size, then the session is finalized into an
+    AudioMemory.
+    """
+    STATUS_OPEN = 'open'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Open'),
+        (STATUS_COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, null=True)
+    language = models.CharField(max_length=10, blank=True, null=True)
+    size = models.BigIntegerField()  # Total bytes announced by the client
+    received = models.BigIntegerField(default=0)  # Bytes written so far
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    audio_memory = models.ForeignKey(AudioMemory, on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload {self.id} - {self.filename} ({self.received}/{self.size} bytes, {self.status})"
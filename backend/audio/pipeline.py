@@ -0,0 +1,411 @@
+from django.conf import settings
+from .audio_processing import (
+    transcribe_audio, analyze_text_comprehensive, get_audio_duration, select_transcription_tier,
+    normalize_audio, transcribe_batch, load_audio, has_speech, whisper_language, analyzer_version
+)
+from .dispatch import pending_job_count
+import math
+import os
+import time
+import traceback
+
+# AudioMemory fields written by the text analysis
+ANALYSIS_FIELDS = [
+    'score', 'sentiment_label', 'memory_references', 'routine_references', 'time_indicators',
+    'location_indicators', 'severity_indicators', 'potential_concerns', 'analyzer_version',
+]
+
+def analysis_fields(text):
+    """Values of ANALYSIS_FIELDS for a transcription, touches no database row"""
+    analysis_results = analyze_text_comprehensive(text)
+    return {
+        'score': round(analysis_results['sentiment_score'], 4),
+        'sentiment_label': analysis_results['sentiment_label'],
+        'memory_references': analysis_results['memory_references'],
+        'routine_references': analysis_results['routine_references'],
+        'time_indicators': analysis_results['time_indicators'],
+        'location_indicators': analysis_results['location_indicators'],
+        'severity_indicators': analysis_results['severity_indicators'],
+        'potential_concerns': analysis_results['potential_concerns'],
+        'analyzer_version': analyzer_version(),
+    }
+
+def run_text_analysis(audio_memory, text):
+    """
+    Run the comprehensive text analysis on a transcription and store the
+    results on the audio memory (not saved). Analysis errors are recorded in
+    processing_error rather than raised.
+    """
+    # Comprehensive analysis begins
+    print("\n" + "-"*40)
+    print("🔍 STARTING COMPREHENSIVE TEXT ANALYSIS...")
+    print("-"*40)
+    start_time = time.time()
+    
+    try:
+        # Get comprehensive analysis
+        results = analysis_fields(text)
+        
+        analysis_time = time.time() - start_time
+        print(f"⏱️ Analysis completed in {analysis_time:.2f} seconds")
+        
+        # Store all analysis results
+        for field, value in results.items():
+            setattr(audio_memory, field, value)
+        
+        # Print analysis results
+        print(f"📊 Sentiment score: {audio_memory.score}")
+        print(f"🏷️ Sentiment label: {audio_memory.sentiment_label}")
+        print(f"🧠 Memory references: {audio_memory.memory_references}")
+        print(f"⏰ Routine references: {audio_memory.routine_references}")
+        print(f"📅 Time indicators: {audio_memory.time_indicators}")
+        print(f"📍 Location indicators: {audio_memory.location_indicators}")
+        print(f"⚠️ Severity indicators: {audio_memory.severity_indicators}")
+        print(f"🚨 Potential concerns: {audio_memory.potential_concerns}")
+        
+        score_segments(audio_memory)
+        
+    except Exception as e:
+        error_msg = f"Analysis failed: {str(e)}"
+        print(f"❌ {error_msg}")
+        print(f"❌ Traceback: {traceback.format_exc()}")
+        
+        # If there's already an error, append to it
+        if audio_memory.processing_error:
+            audio_memory.processing_error += f"; {error_msg}"
+        else:
+            audio_memory.processing_error = error_msg
+
+
+class SegmentWriter:
+    """
+    Collects transcript segments as they are decoded and writes them as
+    TranscriptSegment rows with bulk_create, batch_size rows at a time.
+    Segments left over from an earlier run of the same upload are replaced.
+    offset (seconds) is added so start/end point into the original upload.
+    """
+    def __init__(self, audio_memory, offset=0.0, batch_size=None):
+        from .models import TranscriptSegment  # Import here to avoid circular imports
+        self.model = TranscriptSegment
+        self.audio_memory = audio_memory
+        self.offset = offset or 0.0
+        self.batch_size = batch_size or getattr(settings, 'AUDIO_SEGMENT_WRITE_BATCH', 50)
+        self.pending = []
+        self.count = 0
+        self.model.objects.filter(audio_memory=audio_memory).delete()
+    
+    def __call__(self, segments):
+        for seg in segments:
+            avg_logprob = seg.get("avg_logprob")
+            self.pending.append(self.model(
+                audio_memory=self.audio_memory,
+                index=self.count,
+                start=round(seg["start"] + self.offset, 3),
+                end=round(seg["end"] + self.offset, 3),
+                text=seg["text"].strip(),
+                confidence=round(math.exp(avg_logprob), 4) if avg_logprob is not None else None
+            ))
+            self.count += 1
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if self.pending:
+            self.model.objects.bulk_create(self.pending)
+            self.pending = []
+
+
+def score_segments(audio_memory):
+    """
+    Score the sentiment of each transcript segment that has no score yet, so
+    re-running the analysis only touches new or changed segments.
+    """
+    from .audio_processing import vader_polarity_scores
+    
+    segments = list(audio_memory.segments.filter(score__isnull=True))
+    if not segments:
+        return
+    # Repeated phrases come from the sentence cache
+    scores = vader_polarity_scores([segment.text for segment in segments])
+    for segment, segment_scores in zip(segments, scores):
+        segment.score = round(segment_scores['compound'], 4)
+    audio_memory.segments.model.objects.bulk_update(segments, ['score'])
+    print(f"🧩 Scored {len(segments)} transcript segments")
+
+
+def prepare_normalized_audio(audio_memory):
+    """
+    Decode the upload once into the normalized 16 kHz mono PCM artifact and
+    return its path. Later runs (retries, re-analysis) reuse the artifact
+    instead of decoding the original container again.
+    """
+    if audio_memory.normalized_file and os.path.exists(audio_memory.normalized_file.path):
+        print(f"♻️ Using cached normalized audio: {audio_memory.normalized_file.name}")
+        return audio_memory.normalized_file.path
+    
+    storage = audio_memory.audio_file.storage
+    name = f"{audio_memory.audio_file.name}.norm.wav"
+    offset, duration = normalize_audio(audio_memory.audio_file.path, storage.path(name))
+    
+    audio_memory.normalized_file.name = name
+    audio_memory.normalized_offset = offset
+    audio_memory.save(update_fields=['normalized_file', 'normalized_offset'])
+    return storage.path(name)
+
+
+def transcription_language(audio_memory):
+    """
+    Language hint for whisper: the upload's own language if one was given,
+    otherwise the user's profile language. None means detect it.
+    """
+    return whisper_language(audio_memory.language or audio_memory.user.language)
+
+
+def is_silent_audio(audio_path):
+    """
+    Energy pre-check on the decoded audio so silent recordings never load or
+    run Whisper. Decoding problems count as "not silent" and are left to the
+    transcription step to report.
+    """
+    try:
+        audio = load_audio(audio_path)
+    except Exception as e:
+        print(f"⚠️ Warning: Silence check skipped: {str(e)}")
+        return False
+    return not has_speech(
+        audio,
+        threshold_db=getattr(settings, 'AUDIO_SPEECH_GATE_DB', -40.0),
+        min_speech_seconds=getattr(settings, 'AUDIO_SPEECH_MIN_SECONDS', 0.3)
+    )
+
+
+def complete_as_silent(audio_memory):
+    """Mark a recording without speech as processed, skipping transcription and analysis"""
+    audio_memory.transcription = "[No speech detected]"
+    audio_memory.score = 0.0
+    audio_memory.sentiment_label = "Neutral"
+    audio_memory.transcription_tier = "silence"
+    audio_memory.processing_complete = True
+    audio_memory.save()
+    audio_memory.segments.all().delete()
+    print(f"🔇 Audio #{audio_memory.id} is silent, skipped transcription")
+
+
+def check_audio_file(audio_memory):
+    """Make sure the uploaded file is there and readable, returns its path"""
+    # File path info
+    audio_path = audio_memory.audio_file.path
+    print(f"📁 Audio file path: {audio_path}")
+    
+    # Verify file exists and is readable
+    if not os.path.exists(audio_path):
+        raise FileNotFoundError(f"Audio file does not exist at {audio_path}")
+        
+    if not os.access(audio_path, os.R_OK):
+        raise PermissionError(f"Cannot read audio file at {audio_path}")
+        
+    # Check file size
+    file_size = os.path.getsize(audio_path)
+    print(f"📊 File size: {file_size / 1024 / 1024:.2f} MB")
+    
+    if file_size == 0:
+        raise ValueError("Audio file is empty (0 bytes)")
+    
+    return audio_path
+
+
+def transcribe_upload(audio_memory):
+    """
+    Transcribe an uploaded audio memory: check the file, normalize it, skip
+    silent recordings and write the transcript segments. Stores the
+    transcription and tier on the audio memory (not saved) and returns the
+    text, or None for a silent recording, which is already completed.
+    """
+    audio_path = check_audio_file(audio_memory)
+
+    # Transcription begins
+    print("\n" + "-"*40)
+    print("🎤 STARTING TRANSCRIPTION PROCESS...")
+    print("-"*40)
+    start_time = time.time()
+
+    # Decode once to the normalized artifact, fall back to the original
+    # file if the container can't be decoded here
+    segment_offset = 0.0
+    try:
+        audio_path = prepare_normalized_audio(audio_memory)
+        segment_offset = audio_memory.normalized_offset
+    except Exception as e:
+        print(f"⚠️ Warning: Audio normalization failed, using original file: {str(e)}")
+
+    if is_silent_audio(audio_path):
+        complete_as_silent(audio_memory)
+        return None
+
+    # Trade accuracy for speed when the queue is backing up
+    duration = get_audio_duration(audio_path)
+    queue_depth = pending_job_count(exclude_id=audio_memory.id)
+    tier = select_transcription_tier(duration, queue_depth)
+    audio_memory.transcription_tier = f"{tier['model']}/beam{tier['beam_size']}"
+    print(f"🎚️ Queue depth {queue_depth}, duration {duration}s -> tier {audio_memory.transcription_tier}")
+
+    language = transcription_language(audio_memory)
+
+    text = None
+    try:
+        # Segments are written as rows while the transcription runs
+        segment_writer = SegmentWriter(audio_memory, offset=segment_offset)
+        text = transcribe_audio(
+            audio_path, model_size=tier['model'], beam_size=tier['beam_size'],
+            on_segments=segment_writer, language=language
+        )
+        segment_writer.flush()
+
+        if not text or text.strip() == "":
+            print("⚠️ Warning: Transcription returned empty text")
+            text = "[No speech detected]"
+
+        transcription_time = time.time() - start_time
+        print(f"⏱️ Transcription completed in {transcription_time:.2f} seconds")
+        print(f"📝 Transcription result:\n{text}")
+
+        # Store the transcription
+        audio_memory.transcription = text
+        print("💾 Transcription saved to model")
+
+    except Exception as e:
+        error_msg = f"Transcription failed: {str(e)}"
+        print(f"❌ {error_msg}")
+        print(f"❌ Traceback: {traceback.format_exc()}")
+
+        # Save error but continue with analysis if we can
+        audio_memory.processing_error = error_msg
+        audio_memory.save()
+
+        # If we can't continue, re-raise
+        if not text:
+            raise
+
+    return text
+
+
+def process_audio_in_background(audio_memory_id):
+    """
+    Transcribe and analyse an uploaded audio file and save the results.
+    Runs in a background thread or in a transcription worker process.
+    """
+    from .models import AudioMemory  # Import here to avoid circular imports
+    
+    try:
+        # Get the audio memory object
+        audio_memory = AudioMemory.objects.get(id=audio_memory_id)
+        
+        print("\n" + "="*50)
+        print(f"🎵 STARTING BACKGROUND PROCESSING FOR AUDIO #{audio_memory_id} 🎵")
+        print("="*50)
+        
+        text = transcribe_upload(audio_memory)
+        if text is None:
+            return
+        
+        run_text_analysis(audio_memory, text)
+        
+        # Update processing status - mark as complete even if we had partial errors
+        audio_memory.processing_complete = True
+        
+        # Save changes
+        print("💾 Saving final data to database...")
+        audio_memory.save()
+        
+        print("\n" + "="*50)
+        print(f"✅ AUDIO #{audio_memory_id} PROCESSED SUCCESSFULLY ✅")
+        print("="*50 + "\n")
+        
+    except Exception as e:
+        print(f"❌ ERROR PROCESSING AUDIO #{audio_memory_id}: {str(e)}")
+        print(f"❌ Error type: {type(e).__name__}")
+        print(f"❌ Traceback: {traceback.format_exc()}")
+        
+        # Try to update the status in the database
+        try:
+            audio_memory = AudioMemory.objects.get(id=audio_memory_id)
+            audio_memory.processing_error = f"{type(e).__name__}: {str(e)}"
+            audio_memory.processing_complete = True  # Mark as complete even with error
+            audio_memory.save()
+            print("💾 Error status saved to database")
+        except Exception as db_error:
+            print(f"❌ Could not update error status in database: {str(db_error)}")
+
+
+def process_audio_batch(audio_memory_ids):
+    """
+    Process several queued uploads with one batched transcription pass, then
+    analyse and save each of them. Uploads that fail before transcription are
+    marked with their error; if the batched pass itself fails every upload
+    falls back to process_audio_in_background().
+    """
+    from .models import AudioMemory  # Import here to avoid circular imports
+    
+    print("\n" + "="*50)
+    print(f"🎵 STARTING BATCH PROCESSING FOR AUDIO {list(audio_memory_ids)} 🎵")
+    print("="*50)
+    
+    memories, paths = [], []
+    for audio_memory_id in audio_memory_ids:
+        try:
+            audio_memory = AudioMemory.objects.get(id=audio_memory_id)
+            check_audio_file(audio_memory)
+            audio_path = prepare_normalized_audio(audio_memory)
+            if is_silent_audio(audio_path):
+                complete_as_silent(audio_memory)
+                continue
+            paths.append(audio_path)
+            memories.append(audio_memory)
+        except Exception as e:
+            print(f"❌ ERROR PREPARING AUDIO #{audio_memory_id}: {str(e)}")
+            AudioMemory.objects.filter(id=audio_memory_id).update(
+                processing_error=f"{type(e).__name__}: {str(e)}",
+                processing_complete=True
+            )
+    
+    if not memories:
+        return
+    
+    # One tier for the whole batch, sized for its longest clip
+    durations = [get_audio_duration(path) or 0 for path in paths]
+    queue_depth = pending_job_count() - len(memories)
+    tier = select_transcription_tier(max(durations), queue_depth)
+    tier_name = f"{tier['model']}/beam{tier['beam_size']}"
+    print(f"🎚️ Queue depth {queue_depth} -> tier {tier_name}")
+    
+    start_time = time.time()
+    try:
+        batch_segments = transcribe_batch(
+            paths, model_size=tier['model'], beam_size=tier['beam_size'],
+            batch_size=getattr(settings, 'AUDIO_BATCH_SIZE', 8),
+            languages=[transcription_language(audio_memory) for audio_memory in memories]
+        )
+    except Exception as e:
+        print(f"❌ Batched transcription failed, processing one by one: {str(e)}")
+        print(f"❌ Traceback: {traceback.format_exc()}")
+        for audio_memory in memories:
+            process_audio_in_background(audio_memory.id)
+        return
+    print(f"⏱️ Batched transcription completed in {time.time() - start_time:.2f} seconds")
+    
+    for audio_memory, segments in zip(memories, batch_segments):
+        text = " ".join(seg["text"].strip() for seg in segments).strip()
+        if not text:
+            print(f"⚠️ Warning: No speech detected in audio #{audio_memory.id}")
+            text = "[No speech detected]"
+        
+        segment_writer = SegmentWriter(audio_memory, offset=audio_memory.normalized_offset)
+        segment_writer(segments)
+        segment_writer.flush()
+        
+        audio_memory.transcription = text
+        audio_memory.transcription_tier = tier_name
+        run_text_analysis(audio_memory, text)
+        audio_memory.processing_complete = True
+        audio_memory.save()
+        print(f"✅ AUDIO #{audio_memory.id} PROCESSED IN BATCH")
@@ -0,0 +1,118 @@
+"""
+Bulk re-analysis of stored transcriptions (see the reanalyze_audio command).
+
+Rows whose analyzer_version isn't the current analyzer_version() are read in
+id order, analyzed in a process pool from their stored transcription (no
+audio is decoded again) and written back with bulk_update.
+"""
+import contextlib
+import io
+import json
+import os
+
+# Module-level imports stay free of Django: spawned pool workers import this
+# module to unpickle analyze_row before init_worker has set Django up
+
+
+def stale_memories():
+    """Processed memories analyzed by another version of the analysis (or never stamped)"""
+    from .audio_processing import analyzer_version
+    from .models import AudioMemory
+    return (
+        AudioMemory.objects
+        .filter(processing_complete=True, transcription__isnull=False)
+        # Silent uploads were never analyzed, there is nothing to redo
+        .exclude(transcription_tier='silence')
+        .exclude(analyzer_version=analyzer_version())
+    )
+
+
+def stale_batches(batch_size, after_id=0):
+    """(id, transcription) lists of stale rows with ids above after_id, in id order"""
+    while True:
+        batch = list(
+            stale_memories().filter(id__gt=after_id).order_by('id')
+            .values_list('id', 'transcription')[:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        after_id = batch[-1][0]
+
+
+def init_worker():
+    """Pool initializer, spawned workers start without Django"""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+
+def analyze_row(row):
+    """
+    Analysis field values of one (id, transcription) row, run in a pool
+    worker. Returns (id, fields, error) with fields None on failure.
+    """
+    from .pipeline import analysis_fields
+    audio_memory_id, transcription = row
+    try:
+        # The analysis prints every step, thousands of rows would drown the progress
+        with contextlib.redirect_stdout(io.StringIO()):
+            return audio_memory_id, analysis_fields(transcription), None
+    except Exception as e:
+        return audio_memory_id, None, str(e)
+
+
+def write_results(batch, results):
+    """
+    bulk_update the analyzed rows, skipping any whose transcription changed
+    while they were being analyzed (live processing wins). Returns the
+    number of rows written.
+    """
+    from .models import AudioMemory
+    from .pipeline import ANALYSIS_FIELDS
+    transcriptions = dict(batch)
+    current = dict(
+        AudioMemory.objects.filter(id__in=transcriptions).values_list('id', 'transcription')
+    )
+    updated = []
+    for audio_memory_id, fields, error in results:
+        if fields is None or current.get(audio_memory_id) != transcriptions[audio_memory_id]:
+            continue
+        updated.append(AudioMemory(id=audio_memory_id, **fields))
+    AudioMemory.objects.bulk_update(updated, ANALYSIS_FIELDS)
+    return len(updated)
+
+
+def checkpoint_path():
+    from django.conf import settings
+    return str(getattr(
+        settings, 'AUDIO_REANALYZE_CHECKPOINT', os.path.join(settings.BASE_DIR, 'reanalyze_checkpoint.json')
+    ))
+
+
+def load_checkpoint():
+    """Last id done by an interrupted run for the current analyzer version, 0 to start over"""
+    from .audio_processing import analyzer_version
+    try:
+        with open(checkpoint_path()) as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return 0
+    if checkpoint.get('analyzer_version') != analyzer_version():
+        return 0
+    return checkpoint.get('last_id', 0)
+
+
+def save_checkpoint(last_id, stats):
+    from .audio_processing import analyzer_version
+    path = checkpoint_path()
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'analyzer_version': analyzer_version(), 'last_id': last_id, **stats}, f)
+    os.replace(path + '.tmp', path)
+
+
+def clear_checkpoint():
+    try:
+        os.remove(checkpoint_path())
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,140 @@
+"""
+Sentence-level cache of sentiment results.
+
+Patients repeat the same phrases all the time, so VADER and DistilBERT
+results are cached per scored text (a transcript segment, or a whole short
+transcript), keyed by the model with its version and a hash of the
+normalized text, in a bounded LRU in each process (AUDIO_SENTENCE_CACHE_SIZE
+entries). With AUDIO_SENTENCE_CACHE_PERSIST naming one of the Django
+CACHES, misses are looked up there too and new results written back, so
+they survive restarts and are shared between workers.
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from django.conf import settings
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sentence(text):
+    # Only whitespace: VADER reads case and punctuation ("GREAT!!" > "great")
+    return WHITESPACE.sub(' ', text).strip()
+
+
+def sentence_key(kind, text):
+    """Cache key of text's result from the model kind (see audio_processing.sentiment_cache_kind)"""
+    digest = hashlib.sha1(normalize_sentence(text).encode('utf-8')).hexdigest()
+    return f"sentence:{kind}:{digest}"
+
+
+class SentenceCache:
+    def __init__(self, max_entries, persist_alias=None):
+        self.max_entries = max_entries
+        self.persist_alias = persist_alias
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'persistent_hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _persistent(self):
+        if not self.persist_alias:
+            return None
+        from django.core.cache import caches
+        return caches[self.persist_alias]
+
+    def get_many(self, keys):
+        """The cached results of keys, as a dict of the keys that were found"""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+
+        missing = [key for key in keys if key not in found]
+        persistent = self._persistent()
+        from_persistent = {}
+        if missing and persistent is not None:
+            try:
+                from_persistent = persistent.get_many(missing)
+            except Exception as e:
+                print(f"⚠️ Sentence cache '{self.persist_alias}' unavailable: {str(e)}")
+            self._remember(from_persistent)
+            found.update(from_persistent)
+
+        with self._lock:
+            self._counters['hits'] += len(found)
+            self._counters['persistent_hits'] += len(from_persistent)
+            self._counters['misses'] += len(set(keys)) - len(found)
+        return found
+
+    def set_many(self, results):
+        self._remember(results)
+        persistent = self._persistent()
+        if results and persistent is not None:
+            try:
+                persistent.set_many(results, timeout=None)
+            except Exception as e:
+                print(f"⚠️ Sentence cache '{self.persist_alias}' unavailable: {str(e)}")
+
+    def _remember(self, results):
+        with self._lock:
+            for key, value in results.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return dict(
+                self._counters,
+                entries=len(self._entries),
+                max_entries=self.max_entries,
+                persist=self.persist_alias or None,
+                hit_rate=round(self._counters['hits'] / lookups, 3) if lookups else None,
+            )
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sentence_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SentenceCache(
+                getattr(settings, 'AUDIO_SENTENCE_CACHE_SIZE', 10000),
+                getattr(settings, 'AUDIO_SENTENCE_CACHE_PERSIST', ''),
+            )
+    return _cache
+
+
+def cached_results(kind, texts, compute):
+    """
+    Result of each text from the cache, calling compute(texts) only for the
+    texts that aren't cached (each distinct text once)
+    """
+    keys = [sentence_key(kind, text) for text in texts]
+    cache = get_sentence_cache()
+    if not cache.max_entries:
+        return compute(list(texts))
+
+    found = cache.get_many(keys)
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    if missing:
+        computed = dict(zip(missing, compute(list(missing.values()))))
+        cache.set_many(computed)
+        found.update(computed)
+    return [found[key] for key in keys]
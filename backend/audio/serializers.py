@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import AudioMemory
+from .models import AudioMemory, TranscriptSegment
 
 class AudioMemorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,16 +8,23 @@ class AudioMemorySerializer(serializers.ModelSerializer):
             'id', 'user', 'audio_file', 'timestamp', 'transcription', 'score', 
             'sentiment_label', 'memory_references', 'routine_references',
             'time_indicators', 'location_indicators', 'severity_indicators',
-            'potential_concerns', 'processing_complete', 'processing_error'
+            'potential_concerns', 'processing_complete', 'processing_error',
+            'content_hash', 'transcription_tier', 'language', 'analyzer_version'
         ]
         read_only_fields = [
             'id', 'timestamp', 'transcription', 'score', 
             'sentiment_label', 'memory_references', 'routine_references',
             'time_indicators', 'location_indicators', 'severity_indicators',
             'potential_concerns', 'processing_complete', 'processing_error',
-            'user'
+            'user', 'content_hash', 'transcription_tier', 'analyzer_version'
         ]
 
+class TranscriptSegmentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TranscriptSegment
+        fields = ['index', 'start', 'end', 'text', 'confidence', 'score']
+        read_only_fields = fields
+
 class AudioMemoryJSONSerializer(serializers.ModelSerializer):
     class Meta:
         model = AudioMemory
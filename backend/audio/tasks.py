@@ -0,0 +1,136 @@
+"""
+Audio processing as a Celery chain (AUDIO_PROCESSING_BACKEND = 'celery').
+
+An upload goes through three tasks, each routed to its own queue so every
+stage gets its own workers and concurrency (see CELERY_TASK_ROUTES):
+
+    transcribe_audio_task -> analyze_transcription_task -> save_analysis_task
+    audio_transcribe         audio_analyze                 audio_persist
+
+Tasks are acknowledged only once they finish, so a job whose worker dies or
+restarts is delivered again. Every stage can be re-run for the same upload.
+Database and broker hiccups are retried with backoff. Any other error, or
+running out of retries or time, marks the upload as processed with the
+error, like the thread backend does.
+"""
+import time
+from celery import Task, chain, shared_task
+from django.conf import settings
+from django.db import OperationalError, InterfaceError
+
+# Transient errors worth retrying, the rest fail the upload straight away
+RETRY_ERRORS = (OperationalError, InterfaceError, ConnectionError, TimeoutError)
+
+
+def time_limits(stage):
+    """(soft, hard) time limits in seconds of a stage from AUDIO_CELERY_TIME_LIMITS"""
+    limits = getattr(settings, 'AUDIO_CELERY_TIME_LIMITS', {}).get(stage, {})
+    return limits.get('soft'), limits.get('hard')
+
+
+class AudioStageTask(Task):
+    """Base task of the chain: transient-error retries and the final failure handling"""
+    autoretry_for = RETRY_ERRORS
+    max_retries = getattr(settings, 'AUDIO_CELERY_MAX_RETRIES', 3)
+    retry_backoff = getattr(settings, 'AUDIO_CELERY_RETRY_BACKOFF', 10)
+    retry_backoff_max = 300
+    retry_jitter = True
+    acks_late = True
+    reject_on_worker_lost = True
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        # Out of retries or not retryable: the rest of the chain won't run,
+        # so finish the upload here with the error
+        from .models import AudioMemory
+        audio_memory_id = args[0]['audio_memory_id'] if isinstance(args[0], dict) else args[0]
+        print(f"❌ {self.name} failed for audio #{audio_memory_id}: {type(exc).__name__}: {str(exc)}")
+        try:
+            AudioMemory.objects.filter(id=audio_memory_id).update(
+                processing_error=f"{type(exc).__name__}: {str(exc)}",
+                processing_complete=True
+            )
+        except Exception as db_error:
+            print(f"❌ Could not update error status in database: {str(db_error)}")
+
+
+def stage_task(stage):
+    soft_time_limit, time_limit = time_limits(stage)
+    return shared_task(base=AudioStageTask, soft_time_limit=soft_time_limit, time_limit=time_limit)
+
+
+@stage_task('transcribe')
+def transcribe_audio_task(audio_memory_id):
+    """
+    Transcribe the upload and save the transcription and its segments.
+    Returns the payload of the next stage, with 'silent' set for recordings
+    without speech, which are completed here.
+    """
+    from .models import AudioMemory
+    from .pipeline import transcribe_upload
+
+    audio_memory = AudioMemory.objects.get(id=audio_memory_id)
+    print(f"🎤 Celery transcription of audio #{audio_memory_id}")
+    text = transcribe_upload(audio_memory)
+    if text is None:
+        return {'audio_memory_id': audio_memory_id, 'silent': True}
+    audio_memory.save(update_fields=['transcription', 'transcription_tier', 'processing_error'])
+    return {'audio_memory_id': audio_memory_id, 'silent': False}
+
+
+@stage_task('analyze')
+def analyze_transcription_task(payload):
+    """Run the text analysis on the saved transcription, adds the field values to the payload"""
+    from .models import AudioMemory
+    from .pipeline import analysis_fields
+
+    if payload['silent']:
+        return payload
+    audio_memory_id = payload['audio_memory_id']
+    text = AudioMemory.objects.values_list('transcription', flat=True).get(id=audio_memory_id)
+    start_time = time.time()
+    try:
+        fields = analysis_fields(text)
+    except RETRY_ERRORS:
+        raise
+    except Exception as e:
+        # Like run_text_analysis: a failed analysis still completes the upload
+        print(f"❌ Analysis failed for audio #{audio_memory_id}: {str(e)}")
+        return dict(payload, fields=None, error=f"Analysis failed: {str(e)}")
+    print(f"🔍 Analysis of audio #{audio_memory_id} completed in {time.time() - start_time:.2f} seconds")
+    return dict(payload, fields=fields, error=None)
+
+
+@stage_task('persist')
+def save_analysis_task(payload):
+    """Store the analysis results, score the segments and mark the upload as processed"""
+    from .models import AudioMemory
+    from .pipeline import ANALYSIS_FIELDS, score_segments
+
+    if payload['silent']:
+        return payload['audio_memory_id']
+    audio_memory = AudioMemory.objects.get(id=payload['audio_memory_id'])
+    update_fields = ['processing_complete']
+    if payload['fields'] is not None:
+        for field, value in payload['fields'].items():
+            setattr(audio_memory, field, value)
+        update_fields += ANALYSIS_FIELDS
+        score_segments(audio_memory)
+    else:
+        if audio_memory.processing_error:
+            audio_memory.processing_error += f"; {payload['error']}"
+        else:
+            audio_memory.processing_error = payload['error']
+        update_fields.append('processing_error')
+    audio_memory.processing_complete = True
+    audio_memory.save(update_fields=update_fields)
+    print(f"✅ AUDIO #{audio_memory.id} PROCESSED BY CELERY")
+    return audio_memory.id
+
+
+def audio_processing_chain(audio_memory_id):
+    """The chain of tasks processing one upload, not yet sent"""
+    return chain(
+        transcribe_audio_task.s(audio_memory_id),
+        analyze_transcription_task.s(),
+        save_analysis_task.s(),
+    )
@@ -1,3 +1,1048 @@
-from django.test import TestCase
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+import numpy as np
+from unittest import skipUnless
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
 
 # Create your tests here.
+
+# Imported only by the code paths that run the models
+HEAVY_MODULES = [
+    'transformers', 'torch', 'tokenizers', 'huggingface_hub', 'nltk', 'faster_whisper',
+    'ctranslate2', 'av', 'face_recognition', 'dlib', 'onnxruntime',
+]
+
+IMPORT_SCRIPT = """
+import sys
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import backend.asgi
+heavy = %r
+print('HEAVY_MODULES:' + ','.join(name for name in heavy if name in sys.modules))
+"""
+
+
+class ImportTimeTests(SimpleTestCase):
+    def run_importtime(self):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+        return subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', IMPORT_SCRIPT % HEAVY_MODULES],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, timeout=300
+        )
+
+    def test_url_loading_does_not_import_ml_stacks(self):
+        result = self.run_importtime()
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+
+        # -X importtime lines: "import time: self [us] | cumulative | imported package"
+        timings = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            _, cumulative, name = line[len('import time:'):].split('|')
+            timings.append((int(cumulative), name.rstrip()))
+
+        # Report the slowest top-level imports so regressions are easy to spot
+        top_level = sorted(
+            (t for t in timings if not t[1].startswith('  ')), reverse=True
+        )[:15]
+        print("\n📦 Slowest top-level imports after loading the URLs and ASGI app:")
+        for cumulative, name in top_level:
+            print(f"   {cumulative / 1000:8.1f} ms  {name.strip()}")
+        print(f"   {sum(c for c, _ in top_level) / 1000:8.1f} ms  total of the above")
+
+        marker = [line for line in result.stdout.splitlines() if line.startswith('HEAVY_MODULES:')][-1]
+        loaded = [name for name in marker[len('HEAVY_MODULES:'):].split(',') if name]
+        self.assertEqual(loaded, [], f"Heavy modules imported at startup: {', '.join(loaded)}")
+
+
+PARITY_TEXTS = [
+    "I had a wonderful afternoon with my grandchildren in the garden.",
+    "I can't remember where I put my keys and it makes me so frustrated.",
+    "The nurse came by at ten and we talked about the weather.",
+    "My wife passed away last spring and the house feels empty without her.",
+    "We went to the lake every summer when I was a boy, those were the best days.",
+    "I don't like the new medication, it makes me dizzy and tired.",
+    "Breakfast was fine.",
+    "Thank you so much for visiting, it really made my week!",
+]
+
+
+@skipUnless(
+    importlib.util.find_spec('onnxruntime') and importlib.util.find_spec('torch'),
+    "needs onnxruntime and torch"
+)
+class OnnxSentimentParityTests(SimpleTestCase):
+    """
+    The int8 ONNX model against the transformers pipeline. Needs the export
+    from `python manage.py export_distilbert_onnx`.
+    """
+    repeats = 5
+
+    def setUp(self):
+        from backend.model_artifacts import MissingArtifact, artifact_path
+        try:
+            if artifact_path('distilbert-sst2-onnx') is None:
+                self.skipTest("run `python manage.py export_distilbert_onnx` first")
+        except MissingArtifact:
+            self.skipTest("run `python manage.py export_distilbert_onnx` first")
+
+    def timed(self, function):
+        function()  # Warm up, loading the model isn't what we measure
+        start_time = time.perf_counter()
+        for _ in range(self.repeats):
+            results = function()
+        return results, (time.perf_counter() - start_time) / self.repeats
+
+    def test_onnx_matches_pipeline(self):
+        from audio.audio_processing import distilbert_window_sentiment, get_distilbert
+
+        analyzer, _ = get_distilbert()
+        expected, pipeline_seconds = self.timed(lambda: analyzer(PARITY_TEXTS, truncation=True))
+        with override_settings(AUDIO_SENTIMENT_BACKEND='onnx'):
+            actual, onnx_seconds = self.timed(lambda: distilbert_window_sentiment(PARITY_TEXTS, cache=False))
+
+        print(
+            f"\n⏱️ DistilBERT over {len(PARITY_TEXTS)} texts: pipeline {pipeline_seconds * 1000:.1f} ms, "
+            f"ONNX int8 {onnx_seconds * 1000:.1f} ms ({pipeline_seconds / onnx_seconds:.1f}x)"
+        )
+        for text, reference, result in zip(PARITY_TEXTS, expected, actual):
+            with self.subTest(text=text):
+                self.assertEqual(result['label'], reference['label'])
+                # int8 weights shift the probabilities a little, never the decision
+                self.assertAlmostEqual(result['score'], reference['score'], delta=0.05)
+
+
+class BoundedExecutorTests(SimpleTestCase):
+    def test_admission_stops_at_capacity_with_retry_after(self):
+        from .executor import BoundedExecutor, ProcessingQueueFull
+        executor = BoundedExecutor(workers=2, queue_size=3, initial_duration=30)
+        for _ in range(5):
+            executor.reserve()
+        with self.assertRaises(ProcessingQueueFull) as raised:
+            executor.reserve()
+        # 3 queued jobs plus the rejected one ahead, on 2 workers at 30s each
+        self.assertEqual(raised.exception.retry_after, 60)
+        self.assertEqual(executor.stats()['rejected'], 1)
+
+        executor.release()
+        executor.reserve()
+
+    def test_jobs_run_and_update_the_average_duration(self):
+        import threading
+        from .executor import BoundedExecutor
+        executor = BoundedExecutor(workers=1, queue_size=1, initial_duration=100)
+        done = threading.Event()
+        executor.reserve()
+        executor.submit(done.set, reserved=True)
+        self.assertTrue(done.wait(5))
+
+        deadline = time.time() + 5
+        while executor.stats()['completed'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        stats = executor.stats()
+        self.assertEqual((stats['pending'], stats['completed']), (0, 1))
+        self.assertLess(stats['average_duration'], 100)
+
+
+def make_user(uid='test-uid'):
+    from users.models import UserProfile
+    return UserProfile.objects.create(
+        firebase_uid=uid, email=f'{uid}@example.com', name='Test', age=70, gender='f'
+    )
+
+
+class TranscriptionJobRequeueTests(TestCase):
+    def setUp(self):
+        from .models import AudioMemory, TranscriptionJob
+        from .transcription_worker import claim_jobs
+        self.memory = AudioMemory.objects.create(user=make_user(), audio_file='a.wav')
+        TranscriptionJob.objects.create(audio_memory=self.memory)
+        self.job, = claim_jobs('host-1-worker-0')
+        # A half-run attempt left an error behind
+        AudioMemory.objects.filter(id=self.memory.id).update(processing_error='Transcription failed: killed')
+
+    def assert_requeued(self):
+        self.job.refresh_from_db()
+        self.memory.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.worker), ('queued', None))
+        self.assertIsNone(self.memory.processing_error)
+
+    def test_jobs_of_a_dead_worker_are_requeued(self):
+        from .transcription_worker import requeue_worker_jobs
+        self.assertEqual(requeue_worker_jobs('host-1-worker-1'), 0)
+        self.assertEqual(requeue_worker_jobs('host-1-worker-0'), 1)
+        self.assert_requeued()
+
+    def test_only_jobs_without_a_recent_heartbeat_are_stale(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import TranscriptionJob
+        from .transcription_worker import requeue_stale_jobs
+        self.assertEqual(requeue_stale_jobs(300), 0)
+        TranscriptionJob.objects.filter(id=self.job.id).update(heartbeat_at=timezone.now() - timedelta(seconds=600))
+        self.assertEqual(requeue_stale_jobs(300), 1)
+        self.assert_requeued()
+
+
+@override_settings(CPU_THREAD_BUDGET_TOTAL=8, CPU_THREAD_BUDGET={
+    'whisper': {'share': 0.5, 'max_jobs': 2},
+    'distilbert': {'share': 0.25, 'max_jobs': 4},
+})
+class ThreadBudgetTests(SimpleTestCase):
+    def test_each_job_gets_its_part_of_the_engine_share(self):
+        from backend.thread_budget import engine_max_jobs, engine_share_threads, engine_threads
+        self.assertEqual((engine_share_threads('whisper'), engine_threads('whisper')), (4, 2))
+        self.assertEqual((engine_max_jobs('distilbert'), engine_threads('distilbert')), (4, 1))
+        # Engines missing from the setting fall back to the defaults
+        self.assertEqual(engine_threads('face'), 1)
+
+    def test_the_transcription_pool_fits_the_whisper_share(self):
+        from unittest import mock
+        from . import audio_processing
+        for processes, expected in [(0, (4, 1)), (2, (2, 2))]:
+            with self.settings(AUDIO_TRANSCRIPTION_PROCESSES=processes), \
+                    mock.patch.object(audio_processing, '_transcription_pool', None), \
+                    mock.patch('concurrent.futures.ProcessPoolExecutor') as pool:
+                audio_processing.get_transcription_pool()
+            kwargs = pool.call_args.kwargs
+            self.assertEqual((kwargs['max_workers'], kwargs['initargs'][0]), expected)
+
+
+class ModelArtifactTests(SimpleTestCase):
+    def setUp(self):
+        import tempfile
+        from backend import model_artifacts
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        # Cleanups run last first: reload the real manifest once the settings are restored
+        self.addCleanup(model_artifacts.load_manifest, reload=True)
+        artifacts = override_settings(MODEL_ARTIFACTS_DIR=self.root, MODEL_ARTIFACTS_OFFLINE=True)
+        artifacts.enable()
+        self.addCleanup(artifacts.disable)
+
+    def write(self, relative, content):
+        path = os.path.join(self.root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def test_hashes_skip_hidden_directories_and_detect_changes(self):
+        import hashlib
+        from backend.model_artifacts import hash_files, verify_artifact
+        self.write('whisper-tiny/model.bin', b'weights')
+        self.write('whisper-tiny/.cache/model.bin.lock', b'')
+        files = hash_files(os.path.join(self.root, 'whisper-tiny'))
+        self.assertEqual(files, {'model.bin': hashlib.sha256(b'weights').hexdigest()})
+
+        entry = {'path': 'whisper-tiny', 'files': dict(files, **{'config.json': '0' * 64})}
+        self.assertEqual(verify_artifact(entry), ['config.json'])
+        self.write('whisper-tiny/model.bin', b'changed')
+        self.assertEqual(sorted(verify_artifact(entry)), ['config.json', 'model.bin'])
+
+    def test_only_fetched_artifacts_resolve_offline(self):
+        from backend.model_artifacts import MissingArtifact, artifact_path, load_manifest, save_manifest
+        self.write('whisper-tiny/model.bin', b'weights')
+        save_manifest({'artifacts': {'whisper-tiny': {'path': 'whisper-tiny', 'files': {}}}})
+        self.assertEqual(load_manifest(reload=True)['artifacts']['whisper-tiny']['path'], 'whisper-tiny')
+        self.assertEqual(artifact_path('whisper-tiny'), os.path.join(self.root, 'whisper-tiny'))
+        with self.assertRaises(MissingArtifact):
+            artifact_path('whisper-base')
+        with self.settings(MODEL_ARTIFACTS_OFFLINE=False):
+            self.assertIsNone(artifact_path('whisper-base'))
+
+    def test_whisper_never_downloads_offline(self):
+        from backend.model_artifacts import MissingArtifact
+        from .audio_processing import _load_whisper, load_whisper_model
+        with self.assertRaises(MissingArtifact):
+            load_whisper_model('base', impl='whisper')
+        # Not falling back to openai-whisper reports the missing artifact itself
+        with self.assertRaisesMessage(MissingArtifact, "whisper-base"):
+            _load_whisper('base', 1)
+
+
+class PreforkTests(SimpleTestCase):
+    @skipUnless(os.path.exists('/proc/self/smaps_rollup'), "needs /proc/<pid>/smaps_rollup")
+    def test_memory_usage_of_a_process(self):
+        from backend.prefork import memory_usage
+        usage = memory_usage(os.getpid())
+        self.assertEqual(set(usage), {'rss', 'pss', 'shared', 'private'})
+        self.assertGreater(usage['rss'], 0)
+        self.assertIsNone(memory_usage(2 ** 31 - 1))
+
+    def test_unknown_models_are_rejected_before_loading_anything(self):
+        from backend.prefork import preload_models
+        with self.assertRaisesMessage(ValueError, "Unknown model to preload: whisper"):
+            preload_models(['whisper'])
+
+
+@override_settings(MODEL_MEMORY_BUDGET_MB=250, MODEL_IDLE_TIMEOUT=60)
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        from unittest import mock
+        from backend.model_registry import ModelRegistry
+        # Every load grows the process by 100 MB
+        self.rss = 0
+        patcher = mock.patch('backend.model_registry.current_rss', lambda: self.rss)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.registry = ModelRegistry()
+
+    def loader(self, name):
+        def load():
+            self.rss += 100 * 1024 * 1024
+            return name
+        return load
+
+    def test_a_model_in_use_is_never_evicted(self):
+        with self.registry.use('a', self.loader('a')) as model:
+            self.assertEqual(model, 'a')
+            self.registry.get('b', self.loader('b'))
+            self.registry.get('c', self.loader('c'))
+            self.assertEqual(set(self.registry.metrics()['models']), {'a', 'c'})
+            self.assertFalse(self.registry.evict('a'))
+            self.registry._entries['a']['last_used'] = 0
+            self.registry.evict_idle()
+            self.assertIn('a', self.registry.metrics()['models'])
+        # Leaving the block counts as a use
+        self.assertLess(self.registry.metrics()['models']['a']['idle_seconds'], 1)
+        self.assertTrue(self.registry.evict('a'))
+
+    @override_settings(AUDIO_WHISPER_TIERS=[{'model': 'small'}, {'model': 'base'}, {'model': 'small'}])
+    def test_whisper_models_preloaded_by_a_worker_stay_loaded(self):
+        from unittest import mock
+        from .transcription_worker import preload_whisper_tiers
+        with mock.patch('audio.audio_processing.get_registry', return_value=self.registry), \
+                mock.patch('audio.audio_processing._load_whisper', side_effect=lambda size, threads: size):
+            preload_whisper_tiers()
+        for entry in self.registry._entries.values():
+            entry['last_used'] = 0
+        self.registry.evict_idle()
+        self.assertEqual(set(self.registry.metrics()['models']), {'whisper-small', 'whisper-base'})
+
+    def test_concurrent_gets_load_a_model_once_without_blocking_other_models(self):
+        import threading
+        loading = threading.Event()
+        release = threading.Event()
+        loads = []
+
+        def slow_load():
+            loads.append('slow')
+            loading.set()
+            release.wait(5)
+            return 'slow'
+
+        threads = [threading.Thread(target=self.registry.get, args=('slow', slow_load)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(loading.wait(5))
+        # Another model loads while 'slow' is still loading
+        self.assertEqual(self.registry.get('fast', self.loader('fast')), 'fast')
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(loads, ['slow'])
+        self.assertEqual(self.registry.metrics()['counters']['loads'], 2)
+
+
+class MicroBatchingTests(SimpleTestCase):
+    def test_batches_group_similar_lengths_within_both_limits(self):
+        from nlp_inference.batcher import length_buckets
+        lengths = [50, 3, 40, 4, 5, 45]
+        self.assertEqual(length_buckets(lengths, max_batch_size=2, max_batch_tokens=1000), [[1, 3], [4, 2], [5, 0]])
+        # Padded to 45 tokens a third item would cost 135 > 100
+        self.assertEqual(length_buckets(lengths, max_batch_size=8, max_batch_tokens=100), [[1, 3, 4], [2, 5], [0]])
+        self.assertEqual(length_buckets([], 8, 100), [])
+
+    def test_results_come_back_in_submission_order(self):
+        from nlp_inference.batcher import MicroBatcher, approx_tokens
+        self.assertEqual(approx_tokens('x' * 40), 12)
+        batcher = MicroBatcher('upper', lambda texts: [text.upper() for text in texts], max_batch_size=2)
+        texts = ['a much longer text', 'b', 'cc', 'ddd']
+        self.assertEqual(batcher.submit(texts, timeout=5), [text.upper() for text in texts])
+        self.assertEqual(batcher.stats()['items'], 4)
+
+    def test_server_addresses(self):
+        from nlp_inference.client import parse_address
+        self.assertEqual(parse_address('unix:/run/nlp.sock'), ('unix', '/run/nlp.sock'))
+        self.assertEqual(parse_address('10.0.0.2:9000'), ('tcp', ('10.0.0.2', 9000)))
+        self.assertEqual(parse_address('http://nlp'), ('tcp', ('nlp', 8765)))
+
+
+class WordTokenizer:
+    """Stands in for a fast tokenizer: one id per word, its index in the text"""
+    cls_token_id = 101
+    sep_token_id = 102
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        import re
+        words = list(re.finditer(r'\S+', text))
+        return {
+            'input_ids': list(range(len(words))),
+            'offset_mapping': [(word.start(), word.end()) for word in words],
+        }
+
+
+class SentimentWindowTests(SimpleTestCase):
+    text = "One two. Three four five. Six."
+
+    def test_windows_hold_whole_sentences_when_they_fit(self):
+        from .audio_processing import sentence_windows
+        self.assertEqual(
+            sentence_windows(self.text, WordTokenizer(), max_tokens=5),
+            [[101, 0, 1, 102], [101, 2, 3, 4, 102], [101, 5, 102]]
+        )
+        self.assertEqual(sentence_windows("", WordTokenizer()), [[101, 102]])
+
+    def test_a_sentence_longer_than_a_window_is_split(self):
+        from .audio_processing import sentence_windows
+        self.assertEqual(
+            sentence_windows(self.text, WordTokenizer(), max_tokens=4),
+            [[101, 0, 1, 102], [101, 2, 3, 102], [101, 4, 5, 102]]
+        )
+
+    def test_window_scores_are_weighted_by_length(self):
+        from .audio_processing import aggregate_window_scores
+        positive = aggregate_window_scores([3, 1], [0.9, 0.1])
+        self.assertEqual((positive['label'], positive['windows']), ('POSITIVE', 2))
+        self.assertAlmostEqual(positive['score'], 0.7)
+        negative = aggregate_window_scores([1, 3], [0.9, 0.1])
+        self.assertEqual(negative['label'], 'NEGATIVE')
+        self.assertAlmostEqual(negative['score'], 0.7)
+
+
+class FakeSentimentModel:
+    """Scores every window 0.8 POSITIVE and records the windows it was given"""
+    tokenizer = WordTokenizer()
+
+    def __init__(self):
+        self.scored = []
+
+    def positive_probabilities(self, batch):
+        self.scored.extend(batch)
+        return [0.8] * len(batch)
+
+
+class SentenceCacheTests(SimpleTestCase):
+    def test_least_recently_used_sentences_are_evicted(self):
+        from .sentence_cache import SentenceCache
+        cache = SentenceCache(2)
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.get_many(['a', 'c']), {'a': 1})
+        cache.set_many({'c': 3})
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+        stats = cache.stats()
+        self.assertEqual(
+            (stats['hits'], stats['misses'], stats['evictions'], stats['entries'], stats['hit_rate']),
+            (3, 2, 1, 2, 0.6)
+        )
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+        'sentences': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'sentences'},
+    })
+    def test_misses_are_looked_up_in_the_django_cache(self):
+        from django.core.cache import caches
+        from .sentence_cache import SentenceCache
+        self.addCleanup(caches['sentences'].clear)
+        SentenceCache(10, 'sentences').set_many({'a': 1})
+        # A new process starts with an empty LRU
+        cache = SentenceCache(10, 'sentences')
+        self.assertEqual(cache.get_many(['a', 'b']), {'a': 1})
+        self.assertEqual(cache.get_many(['a']), {'a': 1})
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['persistent_hits'], stats['misses']), (2, 1, 1))
+
+    def test_keys_change_with_the_model_files(self):
+        from unittest import mock
+        from .audio_processing import SENTIMENT_REVISION, sentiment_cache_kind
+        from .sentence_cache import sentence_key
+        with mock.patch('audio.audio_processing.artifact_fingerprint', return_value='aaa'):
+            old = sentence_key(sentiment_cache_kind('vader', 'nltk-vader_lexicon'), 'I feel fine.')
+        with mock.patch('audio.audio_processing.artifact_fingerprint', return_value='bbb'):
+            new = sentence_key(sentiment_cache_kind('vader', 'nltk-vader_lexicon'), ' I  feel fine.')
+        self.assertTrue(new.startswith(f"sentence:vader:{SENTIMENT_REVISION}:bbb:"))
+        self.assertEqual(old.replace(':aaa:', ':bbb:'), new)
+
+    def test_distilbert_caches_whole_texts_scored_in_packed_windows(self):
+        from unittest import mock
+        from .audio_processing import distilbert_window_sentiment
+        from .sentence_cache import SentenceCache
+        model = FakeSentimentModel()
+        texts = ["What a lovely day. The tea was cold.", "Fine."]
+        with mock.patch('audio.sentence_cache._cache', SentenceCache(100)), \
+                mock.patch('audio.audio_processing.get_sentiment_model', return_value=model):
+            first = distilbert_window_sentiment(texts)
+            second = distilbert_window_sentiment(texts[::-1])
+        # Both sentences share one window, and nothing is scored twice
+        self.assertEqual([len(window) for window in model.scored], [3, 10])
+        self.assertEqual(second, first[::-1])
+        self.assertEqual((first[0]['label'], first[0]['windows']), ('POSITIVE', 1))
+
+    def test_vader_scores_the_whole_text(self):
+        from unittest import mock
+        from .audio_processing import vader_text_scores
+        from .sentence_cache import SentenceCache
+        analyzer = mock.Mock()
+        analyzer.polarity_scores.side_effect = lambda text: {'compound': len(text)}
+        with mock.patch('audio.sentence_cache._cache', SentenceCache(100)), \
+                mock.patch('audio.audio_processing.get_vader_analyzer', return_value=analyzer):
+            self.assertEqual(vader_text_scores("Great. Awful!"), {'compound': 13})
+            self.assertEqual(vader_text_scores("Great.  Awful!"), {'compound': 13})
+        analyzer.polarity_scores.assert_called_once_with("Great. Awful!")
+
+
+class ReanalysisTests(TestCase):
+    def setUp(self):
+        import tempfile
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        checkpoint = override_settings(AUDIO_REANALYZE_CHECKPOINT=os.path.join(directory.name, 'checkpoint.json'))
+        checkpoint.enable()
+        self.addCleanup(checkpoint.disable)
+
+    def test_analyzer_version_follows_the_keyword_lists(self):
+        from unittest import mock
+        from . import audio_processing
+        version = audio_processing.analyzer_version()
+        self.assertRegex(version, rf'^{audio_processing.ANALYZER_REVISION}-[0-9a-f]{{12}}$')
+        self.addCleanup(audio_processing.analyzer_version.cache_clear)
+        audio_processing.analyzer_version.cache_clear()
+        indicators = audio_processing.MEMORY_INDICATORS + ['recollect']
+        with mock.patch.object(audio_processing, 'MEMORY_INDICATORS', indicators):
+            self.assertNotEqual(audio_processing.analyzer_version(), version)
+        audio_processing.analyzer_version.cache_clear()
+        self.assertEqual(audio_processing.analyzer_version(), version)
+
+    def test_checkpoints_only_resume_the_same_analyzer_version(self):
+        import json
+        from .reanalysis import checkpoint_path, clear_checkpoint, load_checkpoint, save_checkpoint
+        self.assertEqual(load_checkpoint(), 0)
+        save_checkpoint(42, {'analyzed': 42})
+        self.assertEqual(load_checkpoint(), 42)
+
+        with open(checkpoint_path()) as f:
+            checkpoint = json.load(f)
+        with open(checkpoint_path(), 'w') as f:
+            json.dump(dict(checkpoint, analyzer_version='0-older'), f)
+        self.assertEqual(load_checkpoint(), 0)
+
+        clear_checkpoint()
+        clear_checkpoint()
+        self.assertFalse(os.path.exists(checkpoint_path()))
+
+    def test_rows_changed_during_the_analysis_are_not_overwritten(self):
+        from .audio_processing import analyzer_version
+        from .models import AudioMemory
+        from .reanalysis import stale_batches, write_results
+        user = make_user('reanalyze')
+        rows = [
+            AudioMemory.objects.create(
+                user=user, audio_file=f'audio_files/1/{i}.wav', transcription=f'Text {i}', processing_complete=True,
+                analyzer_version=version
+            )
+            for i, version in enumerate(['0-older', None, analyzer_version(), '0-older'])
+        ]
+        batches = list(stale_batches(2))
+        self.assertEqual(batches, [
+            [(rows[0].id, 'Text 0'), (rows[1].id, 'Text 1')], [(rows[3].id, 'Text 3')]
+        ])
+
+        AudioMemory.objects.filter(id=rows[1].id).update(transcription='Retranscribed')
+        fields = {'sentiment_label': 'Neutral', 'analyzer_version': analyzer_version()}
+        results = [(rows[0].id, fields, None), (rows[1].id, fields, None)]
+        self.assertEqual(write_results(batches[0], results), 1)
+        self.assertEqual(
+            list(AudioMemory.objects.filter(analyzer_version=analyzer_version()).order_by('id')
+                 .values_list('id', flat=True)),
+            [rows[0].id, rows[2].id]
+        )
+
+
+class CeleryStageTests(TestCase):
+    @override_settings(AUDIO_CELERY_TIME_LIMITS={'analyze': {'soft': 120, 'hard': 150}})
+    def test_time_limits_per_stage(self):
+        from .tasks import time_limits
+        self.assertEqual(time_limits('analyze'), (120, 150))
+        self.assertEqual(time_limits('persist'), (None, None))
+
+    def test_a_failed_stage_completes_the_upload_with_the_error(self):
+        from .models import AudioMemory
+        from .tasks import analyze_transcription_task, transcribe_audio_task
+        audio_memory = AudioMemory.objects.create(user=make_user('celery'), audio_file='audio_files/1/a.wav')
+        transcribe_audio_task.on_failure(TimeoutError("broker"), 'task-1', (audio_memory.id,), {}, None)
+        audio_memory.refresh_from_db()
+        self.assertEqual((audio_memory.processing_complete, audio_memory.processing_error),
+                         (True, "TimeoutError: broker"))
+
+        # Later stages get the payload of the one before
+        payload = {'audio_memory_id': audio_memory.id, 'silent': False}
+        analyze_transcription_task.on_failure(ValueError("bad"), 'task-2', (payload,), {}, None)
+        audio_memory.refresh_from_db()
+        self.assertEqual(audio_memory.processing_error, "ValueError: bad")
+
+    def test_silent_uploads_skip_the_analysis(self):
+        from .tasks import analyze_transcription_task
+        payload = {'audio_memory_id': 1, 'silent': True}
+        self.assertEqual(analyze_transcription_task.run(payload), payload)
+
+
+class KeywordAnalysisTests(SimpleTestCase):
+    """The one-pass keyword matching gives the strings the per-keyword regex search gave"""
+    cases = [
+        (
+            "I remember the morning walk in the park with my sister before she passed away on 2019-03-14 at 10:30.",
+            {
+                'memory': "remember, passed away, I remember the morning walk in the park with my sister before "
+                          "she passed away on 2019-03-14 at 10:30.",
+                'routine': "walk",
+                'time': "morning, 10:30, 2019-03-14",
+                'location': "park",
+                'severity': None,
+                'concerns': "Negative feelings about memory",
+                'negative_concerns': "Negative feelings about memory",
+            },
+        ),
+        (
+            "Yesterday I felt so lonely and scared, I couldn't sleep and I forgot to eat lunch at home.",
+            {
+                'memory': "forgot, Yesterday I felt so lonely and scared, I couldn't sleep and I forgot to eat "
+                          "lunch at home.",
+                'routine': "lunch, sleep",
+                'time': "yesterday",
+                'location': "home",
+                'severity': "lonely, scared",
+                'concerns': "Feelings of loneliness or isolation, Potential mental health concerns, "
+                            "Memory-related concerns",
+                'negative_concerns': "Feelings of loneliness or isolation, Potential mental health concerns, "
+                                     "Memory-related concerns, Difficulties with eating or appetite, Sleep issues",
+            },
+        ),
+        (
+            "My memory problem is getting worse, I don't remember which doctor in New York I saw last week.",
+            {
+                'memory': "remember, memory, My memory problem is getting worse, I don't remember which doctor "
+                          "in New York I saw last week.",
+                'routine': None,
+                'time': "last week, week",
+                'location': "doctor, new york",
+                'severity': None,
+                'concerns': "Memory-related concerns",
+                'negative_concerns': "Memory-related concerns",
+            },
+        ),
+        (
+            "Sometimes I think about death and I want to kill myself, I'm in terrible pain every night.",
+            {
+                'memory': "death, Sometimes I think about death and I want to kill myself, I'm in terrible pain "
+                          "every night.",
+                'routine': None,
+                'time': "night",
+                'location': None,
+                'severity': "death, kill, pain, Sometimes I think about death and I want to kill myself, I'm in "
+                            "terrible pain every night.",
+                'concerns': "Potential suicidal ideation, Physical health concerns, Negative feelings about memory",
+                'negative_concerns': "Potential suicidal ideation, Physical health concerns, "
+                                     "Negative feelings about memory",
+            },
+        ),
+        (
+            "Remembering rooms, homework and sleepy afternoons: none of these are whole-word matches.",
+            {
+                'memory': None, 'routine': None, 'time': None, 'location': None, 'severity': None,
+                'concerns': None, 'negative_concerns': None,
+            },
+        ),
+    ]
+
+    def test_outputs_are_unchanged(self):
+        from .audio_processing import (
+            find_location_indicators, find_memory_references, find_routine_references, find_severity_indicators,
+            find_time_indicators, identify_potential_concerns, scan_lexicon
+        )
+        for text, expected in self.cases:
+            for hits in (None, scan_lexicon(text)):
+                with self.subTest(text=text, shared_scan=hits is not None):
+                    self.assertEqual({
+                        'memory': find_memory_references(text, hits),
+                        'routine': find_routine_references(text, hits),
+                        'time': find_time_indicators(text, hits),
+                        'location': find_location_indicators(text, hits),
+                        'severity': find_severity_indicators(text, hits),
+                        'concerns': identify_potential_concerns(text, 0.5, hits),
+                        'negative_concerns': identify_potential_concerns(text, -0.3, hits),
+                    }, expected)
+
+    def test_very_negative_sentiment_is_a_concern_on_its_own(self):
+        from .audio_processing import identify_potential_concerns
+        self.assertEqual(
+            identify_potential_concerns("Remembering rooms.", -0.8), "Highly negative emotional state"
+        )
+
+
+class SplitOnSilenceTests(SimpleTestCase):
+    def split(self, regions, **kwargs):
+        from unittest import mock
+        from .audio_processing import SAMPLE_RATE, split_on_silence
+        speech = [{'start': int(start * SAMPLE_RATE), 'end': int(end * SAMPLE_RATE)} for start, end in regions]
+        audio = np.zeros(int(regions[-1][1] * SAMPLE_RATE) if regions else SAMPLE_RATE, dtype=np.float32)
+        with mock.patch('faster_whisper.vad.get_speech_timestamps', return_value=speech):
+            chunks = split_on_silence(audio, **kwargs)
+        return [(start / SAMPLE_RATE, end / SAMPLE_RATE) for start, end in chunks]
+
+    def test_regions_are_grouped_up_to_the_target_and_cut_in_the_gaps(self):
+        regions = [(0, 50), (55, 100), (110, 150), (160, 200), (230, 260)]
+        self.assertEqual(
+            self.split(regions, target_seconds=120, max_seconds=300),
+            [(0, 100), (110, 200), (230, 260)]
+        )
+
+    def test_a_region_without_silence_is_cut_at_max_seconds(self):
+        self.assertEqual(
+            self.split([(0, 650)], target_seconds=120, max_seconds=300),
+            [(0, 300), (300, 600), (600, 650)]
+        )
+
+    def test_no_speech_gives_no_chunks(self):
+        self.assertEqual(self.split([]), [])
+
+
+class StreamBufferTests(SimpleTestCase):
+    def test_rolling_audio_only_keeps_the_window(self):
+        from .consumers import RollingAudio
+        audio = RollingAudio()
+        audio.append(np.arange(0, 10, dtype=np.float32))
+        audio.append(np.arange(10, 16, dtype=np.float32))
+        audio.drop_before(12)
+        self.assertEqual((audio.start, audio.total), (12, 16))
+        self.assertEqual(audio.since(14).tolist(), [14, 15])
+        audio.append(np.arange(16, 18, dtype=np.float32))
+        self.assertEqual(audio.since(0).tolist(), [12, 13, 14, 15, 16, 17])
+
+    def test_resampling_in_chunks_matches_resampling_at_once(self):
+        from .consumers import LinearResampler
+        samples = np.sin(np.arange(44100) / 20).astype(np.float32)
+        positions = np.arange(0, len(samples) - 1 + 1e-9, 44100 / 16000)
+        expected = np.interp(positions, np.arange(len(samples)), samples)
+
+        resampler = LinearResampler(44100)
+        chunks = [resampler(chunk) for chunk in np.array_split(samples, [1000, 1001, 7777, 30000])]
+        np.testing.assert_allclose(np.concatenate(chunks), expected, atol=1e-6)
+
+
+class StreamAdmissionTests(TransactionTestCase):
+    def connect(self, backend):
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+        from unittest import mock
+        from .consumers import AudioStreamConsumer
+        from .executor import BoundedExecutor
+        full = BoundedExecutor(workers=1, queue_size=0)
+        full.reserve()
+
+        async def attempt():
+            communicator = WebsocketCommunicator(
+                AudioStreamConsumer.as_asgi(), '/ws/audio-stream/?token=stream-a'
+            )
+            await communicator.connect()
+            message = await communicator.receive_json_from()
+            output = await communicator.receive_output() if message['type'] == 'error' else None
+            await communicator.disconnect()
+            return message, output
+
+        with self.settings(AUDIO_PROCESSING_BACKEND=backend), \
+                mock.patch('audio.executor.get_executor', return_value=full):
+            message, output = async_to_sync(attempt)()
+        return message, output, full
+
+    def test_a_full_executor_turns_streams_away_on_the_thread_backend(self):
+        make_user('stream-a')
+        message, output, executor = self.connect('thread')
+        self.assertEqual((message['type'], output['code']), ('error', 4029))
+        self.assertEqual(executor.stats()['pending'], 1)
+
+    def test_other_backends_dont_use_the_executor(self):
+        make_user('stream-a')
+        message, _, executor = self.connect('workers')
+        self.assertEqual(message['type'], 'connection_established')
+        self.assertEqual(executor.stats()['pending'], 1)
+
+
+class DuplicateUploadTests(TestCase):
+    def setUp(self):
+        from .models import AudioMemory
+        self.user = make_user('dedup-a')
+        self.source = AudioMemory.objects.create(
+            user=self.user, audio_file='audio_files/1/a.wav', content_hash='h' * 64, language='fr',
+            transcription='Bonjour', processing_complete=True
+        )
+
+    def test_only_the_same_users_uploads_in_the_same_language_match(self):
+        from .dedup import find_processed_duplicate
+        self.assertEqual(find_processed_duplicate(self.user, 'h' * 64, 'fr'), self.source)
+        self.assertIsNone(find_processed_duplicate(self.user, 'h' * 64, 'en'))
+        self.assertIsNone(find_processed_duplicate(make_user('dedup-b'), 'h' * 64, 'fr'))
+
+    def test_the_copy_keeps_the_language(self):
+        from .dedup import create_from_duplicate
+        copy = create_from_duplicate(self.user, self.source)
+        self.assertEqual((copy.language, copy.transcription), ('fr', 'Bonjour'))
+
+
+class UploadSessionTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from .models import AudioUploadSession
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        media = override_settings(MEDIA_ROOT=media_root.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = make_user('upload-a')
+        self.session = AudioUploadSession.objects.create(user=self.user, filename='a.wav', size=8)
+
+    def test_a_stale_session_cant_write_the_same_offset_twice(self):
+        import io
+        from .models import AudioUploadSession
+        from .uploads import UploadOffsetMismatch, session_part_path, write_chunk
+        stale = AudioUploadSession.objects.get(id=self.session.id)
+        self.assertEqual(write_chunk(self.session, io.BytesIO(b'abcd'), 0, 4), 4)
+        with self.assertRaises(UploadOffsetMismatch):
+            write_chunk(stale, io.BytesIO(b'wxyz'), 0, 4)
+        self.assertEqual(stale.received, 4)
+        self.assertEqual(write_chunk(stale, io.BytesIO(b'efgh'), 4, 4), 8)
+        with open(session_part_path(self.session), 'rb') as f:
+            self.assertEqual(f.read(), b'abcdefgh')
+
+    def test_a_short_chunk_counts_what_arrived_and_drops_leftovers(self):
+        import io
+        from .uploads import session_part_path, write_chunk
+        os.makedirs(os.path.dirname(session_part_path(self.session)), exist_ok=True)
+        with open(session_part_path(self.session), 'wb') as f:
+            f.write(b'leftover')
+        self.assertEqual(write_chunk(self.session, io.BytesIO(b'ab'), 0, 4), 2)
+        with open(session_part_path(self.session), 'rb') as f:
+            self.assertEqual(f.read(), b'ab')
+
+    @override_settings(AUDIO_PROCESSING_BACKEND='thread')
+    def test_a_failed_dispatch_gives_the_processing_slot_back(self):
+        import io
+        from unittest import mock
+        from django.urls import reverse
+        from .executor import BoundedExecutor
+        from .uploads import write_chunk
+        write_chunk(self.session, io.BytesIO(b'RIFFdata'), 0, 8)
+        executor = BoundedExecutor(workers=1, queue_size=0)
+        with mock.patch('users.authentication.auth.get_user'), \
+                mock.patch('audio.executor.get_executor', return_value=executor), \
+                mock.patch('audio.views.dispatch_audio_processing', side_effect=RuntimeError("broker down")):
+            response = self.client.post(
+                reverse('audio-upload-finalize', args=[self.session.id]), HTTP_AUTHORIZATION='upload-a'
+            )
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(executor.stats()['pending'], 0)
+
+    @override_settings(AUDIO_PROCESSING_BACKEND='thread')
+    def test_a_session_is_only_finalized_once(self):
+        import io
+        from unittest import mock
+        from django.urls import reverse
+        from .executor import BoundedExecutor
+        from .models import AudioMemory
+        from .uploads import write_chunk
+        write_chunk(self.session, io.BytesIO(b'RIFFdata'), 0, 8)
+        url = reverse('audio-upload-finalize', args=[self.session.id])
+        with mock.patch('users.authentication.auth.get_user'), \
+                mock.patch('audio.executor.get_executor', return_value=BoundedExecutor(workers=1, queue_size=1)), \
+                mock.patch('audio.views.dispatch_audio_processing') as dispatch:
+            first = self.client.post(url, HTTP_AUTHORIZATION='upload-a')
+            second = self.client.post(url, HTTP_AUTHORIZATION='upload-a')
+        self.assertEqual((first.status_code, second.status_code), (202, 409))
+        self.assertEqual(second.json()['id'], first.json()['id'])
+        self.assertEqual(AudioMemory.objects.filter(user=self.user).count(), 1)
+        dispatch.assert_called_once_with(first.json()['id'], reserved=True)
+
+    def test_a_language_longer_than_the_column_is_rejected(self):
+        from unittest import mock
+        from django.urls import reverse
+        with mock.patch('users.authentication.auth.get_user'):
+            response = self.client.post(
+                reverse('audio-upload-create'), {'filename': 'b.wav', 'size': 8, 'language': 'x' * 11},
+                content_type='application/json', HTTP_AUTHORIZATION='upload-a'
+            )
+        self.assertEqual(response.status_code, 400)
+
+
+class TranscriptionTierTests(SimpleTestCase):
+    TIERS = [{'model': 'small', 'beam_size': 5}, {'model': 'base', 'beam_size': 2}, {'model': 'tiny', 'beam_size': 1}]
+
+    @override_settings(AUDIO_WHISPER_TIERS=TIERS, AUDIO_TIER_QUEUE_THRESHOLDS=[4, 12], AUDIO_TIER_LONG_CLIP_SECONDS=1200)
+    def test_deeper_queues_and_long_clips_pick_faster_tiers(self):
+        from .audio_processing import select_transcription_tier
+        models = [
+            select_transcription_tier(duration, depth)['model']
+            for duration, depth in [(60, 0), (60, 3), (60, 4), (60, 12), (None, 40), (3600, 0), (3600, 1), (3600, 4)]
+        ]
+        self.assertEqual(models, ['small', 'small', 'base', 'tiny', 'tiny', 'small', 'base', 'tiny'])
+
+
+class QueueDepthTests(TestCase):
+    def setUp(self):
+        from .models import AudioMemory, TranscriptionJob
+        user = make_user('depth')
+        self.memories = [AudioMemory.objects.create(user=user, audio_file=f'{i}.wav') for i in range(4)]
+        TranscriptionJob.objects.create(audio_memory=self.memories[0], status=TranscriptionJob.STATUS_RUNNING)
+        TranscriptionJob.objects.create(audio_memory=self.memories[1])
+        TranscriptionJob.objects.create(audio_memory=self.memories[2], status=TranscriptionJob.STATUS_DONE)
+
+    @override_settings(AUDIO_PROCESSING_BACKEND='workers')
+    def test_workers_backend_counts_open_jobs_not_unfinished_rows(self):
+        from .dispatch import pending_job_count
+        self.assertEqual(pending_job_count(), 2)
+        self.assertEqual(pending_job_count(exclude_id=self.memories[0].id), 1)
+
+    @override_settings(AUDIO_PROCESSING_BACKEND='thread')
+    def test_thread_backend_counts_the_executors_jobs(self):
+        from unittest import mock
+        from .dispatch import pending_job_count
+        from .executor import BoundedExecutor
+        executor = BoundedExecutor(workers=1, queue_size=2)
+        executor.reserve()
+        executor.reserve()
+        with mock.patch('audio.executor.get_executor', return_value=executor):
+            self.assertEqual(pending_job_count(), 2)
+            self.assertEqual(pending_job_count(exclude_id=self.memories[0].id), 1)
+
+    @override_settings(AUDIO_PROCESSING_BACKEND='celery', AUDIO_QUEUE_DEPTH_WINDOW=3600)
+    def test_celery_backend_ignores_rows_orphaned_long_ago(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .dispatch import pending_job_count
+        from .models import AudioMemory
+        AudioMemory.objects.filter(id=self.memories[3].id).update(timestamp=timezone.now() - timedelta(days=2))
+        self.assertEqual(pending_job_count(exclude_id=self.memories[0].id), 2)
+
+
+class BatchedTranscriptionTests(SimpleTestCase):
+    def test_tokens_are_split_into_segments_at_timestamps(self):
+        from .audio_processing import split_timestamped_tokens
+        begin = 50000
+        # <|0.00|> 1 2 <|2.40|><|2.40|> 3 <|5.00|> 4 (unterminated)
+        tokens = [begin, 1, 2, begin + 120, begin + 120, 3, begin + 250, 4]
+        self.assertEqual(
+            [(round(start, 2), round(end, 2), text) for start, end, text in split_timestamped_tokens(tokens, begin, 9.0)],
+            [(0.0, 2.4, [1, 2]), (2.4, 5.0, [3]), (5.0, 9.0, [4])]
+        )
+        self.assertEqual(split_timestamped_tokens([1, 2], begin, 7.5), [(0.0, 7.5, [1, 2])])
+
+    def test_repetitive_or_unlikely_decodes_fall_back(self):
+        from .audio_processing import needs_fallback
+        self.assertFalse(needs_fallback("I went to the shop and bought some bread.", -0.3))
+        self.assertTrue(needs_fallback("thank you " * 40, -0.3))
+        self.assertTrue(needs_fallback("I went to the shop.", -1.5))
+
+
+def tone(seconds, amplitude=0.3):
+    from .audio_processing import SAMPLE_RATE
+    return (amplitude * np.sin(np.arange(int(seconds * SAMPLE_RATE)) * 2 * np.pi * 440 / SAMPLE_RATE)).astype(np.float32)
+
+
+def silence(seconds):
+    from .audio_processing import SAMPLE_RATE
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+class NormalizeAudioTests(SimpleTestCase):
+    def test_silence_at_both_ends_is_trimmed_with_padding(self):
+        from .audio_processing import SAMPLE_RATE, trim_silence
+        audio = np.concatenate([silence(2), tone(1), silence(3)])
+        trimmed, start = trim_silence(audio, pad_seconds=0.25)
+        self.assertAlmostEqual(start / SAMPLE_RATE, 1.75, places=1)
+        self.assertAlmostEqual(len(trimmed) / SAMPLE_RATE, 1.5, places=1)
+
+    def test_audio_without_sound_is_left_alone(self):
+        from .audio_processing import trim_silence
+        audio = silence(1)
+        trimmed, start = trim_silence(audio)
+        self.assertEqual((len(trimmed), start), (len(audio), 0))
+
+    def test_pcm_wav_round_trips_through_load_audio(self):
+        import tempfile
+        from .audio_processing import load_audio, pcm_wav_bytes
+        audio = tone(0.5)
+        with tempfile.NamedTemporaryFile(suffix='.wav') as f:
+            f.write(pcm_wav_bytes(audio))
+            f.flush()
+            np.testing.assert_allclose(load_audio(f.name), audio, atol=1e-4)
+
+
+class SegmentWriterTests(TestCase):
+    def test_segments_are_written_in_batches_shifted_by_the_offset(self):
+        import math
+        from .models import AudioMemory, TranscriptSegment
+        from .pipeline import SegmentWriter
+        memory = AudioMemory.objects.create(user=make_user('segments'), audio_file='s.wav')
+        TranscriptSegment.objects.create(audio_memory=memory, index=0, start=0, end=1, text='left over')
+
+        writer = SegmentWriter(memory, offset=1.5, batch_size=2)
+        writer([{'start': 0.0, 'end': 2.0, 'text': ' Hello ', 'avg_logprob': -0.5}])
+        self.assertEqual(TranscriptSegment.objects.filter(audio_memory=memory).count(), 0)
+        writer([{'start': 2.0, 'end': 3.0, 'text': 'there', 'avg_logprob': None}])
+        self.assertEqual(TranscriptSegment.objects.filter(audio_memory=memory).count(), 2)
+        writer([{'start': 3.0, 'end': 4.0, 'text': 'again', 'avg_logprob': 0.0}])
+        writer.flush()
+
+        rows = list(memory.segments.values_list('index', 'start', 'end', 'text', 'confidence'))
+        self.assertEqual(rows, [
+            (0, 1.5, 3.5, 'Hello', round(math.exp(-0.5), 4)),
+            (1, 3.5, 4.5, 'there', None),
+            (2, 4.5, 5.5, 'again', 1.0),
+        ])
+
+
+class SpeechGateTests(SimpleTestCase):
+    def test_only_enough_loud_audio_counts_as_speech(self):
+        from .audio_processing import has_speech
+        self.assertFalse(has_speech(silence(5)))
+        self.assertFalse(has_speech(tone(5, amplitude=0.002)))  # Steady room noise, about -57 dBFS
+        self.assertFalse(has_speech(np.concatenate([silence(2), tone(0.1)]), min_speech_seconds=0.3))
+        self.assertTrue(has_speech(np.concatenate([silence(2), tone(0.5)]), min_speech_seconds=0.3))
+        self.assertFalse(has_speech(np.zeros(10, dtype=np.float32)))
+
+
+class BenchmarkAgreementTests(SimpleTestCase):
+    def test_word_agreement_ignores_case_and_punctuation(self):
+        from .benchmark import word_agreement
+        self.assertEqual(word_agreement("Hello, World!", "hello world"), 1.0)
+        self.assertEqual(word_agreement("", ""), 1.0)
+        self.assertEqual(word_agreement("one two three four", "one two four"), round(6 / 7, 4))
+
+    def test_results_are_scored_against_the_reference_configuration(self):
+        from .benchmark import add_agreement
+        results = add_agreement([
+            {'files': [{'file': 'a.wav', 'text': 'one two'}, {'file': 'b.wav', 'text': 'three'}]},
+            {'files': [{'file': 'a.wav', 'text': 'one two'}, {'file': 'b.wav', 'text': 'four'}]},
+            {'error': 'model failed to load'},
+        ])
+        self.assertEqual([results[0]['agreement'], results[1]['agreement']], [1.0, 0.5])
+        self.assertNotIn('agreement', results[2])
+
+
+class WhisperLanguageTests(SimpleTestCase):
+    def test_stored_codes_map_to_whisper_codes(self):
+        from .audio_processing import whisper_language
+        self.assertEqual(whisper_language('en'), 'en')
+        self.assertEqual(whisper_language(' EN-us '), 'en')
+        self.assertEqual(whisper_language('pt_BR'), 'pt')
+        # Unknown or missing codes leave detection to whisper
+        self.assertIsNone(whisper_language('xx'))
+        self.assertIsNone(whisper_language(''))
+        self.assertIsNone(whisper_language(None))
@@ -0,0 +1,221 @@
+"""
+Resident transcription workers.
+
+Each worker is a long-lived process that loads Whisper once and then pulls
+TranscriptionJob rows off the database queue. Web processes only insert
+jobs (see dispatch.py) and never load the transcription models themselves.
+"""
+import os
+import signal
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+
+def claim_jobs(worker_name, limit=1):
+    """
+    Atomically claim up to limit of the oldest queued jobs, returns a list.
+    The conditional UPDATE makes the claim safe with several workers polling
+    the same table, including on SQLite which has no SELECT ... SKIP LOCKED.
+    """
+    from django.utils import timezone
+    from .models import TranscriptionJob
+
+    claimed_jobs = []
+    while len(claimed_jobs) < limit:
+        job = (
+            TranscriptionJob.objects
+            .filter(status=TranscriptionJob.STATUS_QUEUED)
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            break
+
+        claimed = TranscriptionJob.objects.filter(
+            id=job.id, status=TranscriptionJob.STATUS_QUEUED
+        ).update(
+            status=TranscriptionJob.STATUS_RUNNING,
+            worker=worker_name,
+            claimed_at=timezone.now(),
+            heartbeat_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            claimed_jobs.append(job)
+        # Otherwise another worker got there first, try the next one
+
+    return claimed_jobs
+
+
+def queued_job_count():
+    from .models import TranscriptionJob
+    return TranscriptionJob.objects.filter(status=TranscriptionJob.STATUS_QUEUED).count()
+
+
+def requeue_jobs(jobs):
+    """
+    Put running jobs back on the queue, clearing the error a half-run
+    attempt may have left so the retry isn't recorded as failed
+    """
+    from .models import AudioMemory, TranscriptionJob
+
+    jobs = jobs.filter(status=TranscriptionJob.STATUS_RUNNING)
+    audio_memory_ids = list(jobs.values_list('audio_memory_id', flat=True))
+    count = jobs.update(status=TranscriptionJob.STATUS_QUEUED, worker=None, claimed_at=None, heartbeat_at=None)
+    AudioMemory.objects.filter(id__in=audio_memory_ids).update(processing_error=None, processing_complete=False)
+    return count
+
+
+def requeue_worker_jobs(worker_name):
+    """Put back on the queue the jobs a dead or stopped worker was running"""
+    from .models import TranscriptionJob
+
+    count = requeue_jobs(TranscriptionJob.objects.filter(worker=worker_name))
+    if count:
+        print(f"♻️ Requeued {count} transcription jobs of {worker_name}")
+    return count
+
+
+def requeue_stale_jobs(stale_after):
+    """Put back on the queue jobs whose worker has shown no sign of life for stale_after seconds"""
+    from django.db.models import Q
+    from django.utils import timezone
+    from .models import TranscriptionJob
+
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    count = requeue_jobs(TranscriptionJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, claimed_at__lt=cutoff)
+    ))
+    if count:
+        print(f"♻️ Requeued {count} stale transcription jobs")
+    return count
+
+
+def start_heartbeat(worker_name, interval):
+    """Thread that keeps heartbeat_at of the worker's running jobs fresh, so they don't look stale"""
+    from django.db import close_old_connections
+    from django.utils import timezone
+    from .models import TranscriptionJob
+
+    def beat():
+        while True:
+            time.sleep(interval)
+            try:
+                close_old_connections()
+                TranscriptionJob.objects.filter(
+                    worker=worker_name, status=TranscriptionJob.STATUS_RUNNING
+                ).update(heartbeat_at=timezone.now())
+            except Exception as e:
+                print(f"⚠️ Heartbeat of {worker_name} failed: {str(e)}")
+
+    thread = threading.Thread(target=beat, name='job-heartbeat', daemon=True)
+    thread.start()
+    return thread
+
+
+def finish_jobs(jobs):
+    """Record the outcome of processed jobs from their AudioMemory rows"""
+    from django.utils import timezone
+    from .models import AudioMemory, TranscriptionJob
+
+    for job in jobs:
+        failed = AudioMemory.objects.filter(
+            id=job.audio_memory_id, processing_error__isnull=False
+        ).exists()
+        job.status = TranscriptionJob.STATUS_FAILED if failed else TranscriptionJob.STATUS_DONE
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at'])
+
+
+def fail_jobs(jobs, error):
+    from django.utils import timezone
+    from .models import TranscriptionJob
+
+    print(f"❌ Jobs {[job.id for job in jobs]} failed: {str(error)}")
+    print(f"❌ Traceback: {traceback.format_exc()}")
+    for job in jobs:
+        job.status = TranscriptionJob.STATUS_FAILED
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'finished_at'])
+
+
+def run_job(job):
+    """Run the processing pipeline for one claimed job and record the outcome"""
+    from .pipeline import process_audio_in_background
+
+    try:
+        process_audio_in_background(job.audio_memory_id)
+    except Exception as e:
+        fail_jobs([job], e)
+        return
+    finish_jobs([job])
+
+
+def run_job_batch(jobs):
+    """Process several claimed jobs with one batched transcription pass"""
+    from .pipeline import process_audio_batch
+
+    try:
+        process_audio_batch([job.audio_memory_id for job in jobs])
+    except Exception as e:
+        fail_jobs(jobs, e)
+        return
+    finish_jobs(jobs)
+
+
+def preload_whisper_tiers():
+    """
+    Load every tier's model once up front, every job in this process reuses
+    them. They are pinned so the idle reaper never makes a job load one again.
+    """
+    from django.conf import settings
+    from .audio_processing import DEFAULT_WHISPER_TIERS, get_whisper_model
+    tiers = getattr(settings, 'AUDIO_WHISPER_TIERS', DEFAULT_WHISPER_TIERS)
+    for model_size in dict.fromkeys(tier['model'] for tier in tiers):
+        get_whisper_model(model_size, pinned=True)
+
+
+def worker_main(worker_name, poll_interval=1.0):
+    """Entry point of a worker process"""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+    django.setup()
+
+    from django.conf import settings
+    from django.db import close_old_connections
+
+    # SIGTERM from the supervisor: finish the current job, then exit. Ctrl-C
+    # reaches the whole process group, the supervisor turns it into SIGTERM
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    print(f"👷 Transcription worker {worker_name} (pid {os.getpid()}) starting")
+    preload_whisper_tiers()
+    print(f"👷 Worker {worker_name} ready")
+
+    batch_min_queue = getattr(settings, 'AUDIO_BATCH_MIN_QUEUE', 3)
+    batch_max_jobs = getattr(settings, 'AUDIO_BATCH_MAX_JOBS', 8)
+    start_heartbeat(worker_name, getattr(settings, 'AUDIO_JOB_HEARTBEAT_INTERVAL', 30))
+
+    while not stopping.is_set():
+        close_old_connections()
+
+        # With a backlog, drain several jobs into one batched pass
+        limit = batch_max_jobs if queued_job_count() >= batch_min_queue else 1
+        jobs = claim_jobs(worker_name, limit=limit)
+        if not jobs:
+            stopping.wait(poll_interval)
+            continue
+
+        if len(jobs) == 1:
+            job = jobs[0]
+            print(f"👷 Worker {worker_name} picked up job {job.id} (audio #{job.audio_memory_id})")
+            run_job(job)
+        else:
+            print(f"👷 Worker {worker_name} picked up a batch of {len(jobs)} jobs")
+            run_job_batch(jobs)
+
+    print(f"👋 Worker {worker_name} stopped")
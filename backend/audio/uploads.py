@@ -0,0 +1,112 @@
+"""
+Resumable uploads: chunks are streamed straight into a part file under
+MEDIA_ROOT/upload_sessions/ and the finished file is moved into the regular
+audio storage when the session is finalized.
+"""
+import hashlib
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import AudioMemory, AudioUploadSession, user_audio_path
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class UploadOffsetMismatch(Exception):
+    """A chunk doesn't start where the part file ends"""
+
+
+def session_part_path(session):
+    return os.path.join(settings.MEDIA_ROOT, 'upload_sessions', f"{session.id}.part")
+
+
+def write_chunk(session, stream, offset, length):
+    """
+    Write length bytes read from stream to the session's part file at offset.
+    The chunk must start where the last one ended, so a retried chunk that
+    already arrived is rejected instead of written twice. The session row
+    stays locked while the chunk is written, so two requests for the same
+    offset can't both pass the check.
+    Returns the new number of bytes received.
+    """
+    if offset + length > session.size:
+        raise ValueError(f"Chunk ends at {offset + length}, past the upload size of {session.size}")
+
+    path = session_part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with transaction.atomic():
+        locked = AudioUploadSession.objects.select_for_update().get(id=session.id)
+        if offset != locked.received:
+            session.received = locked.received
+            raise UploadOffsetMismatch(f"Expected offset {locked.received}, got {offset}")
+
+        written = 0
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+            f.seek(offset)
+            while written < length:
+                block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                f.write(block)
+                written += len(block)
+            # Drop anything a broken earlier request left past what arrived now
+            f.truncate(offset + written)
+
+        # Only count what actually arrived, the client resumes from there
+        locked.received = offset + written
+        locked.save(update_fields=['received', 'updated_at'])
+
+    session.received = locked.received
+    return session.received
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def create_memory_from_session(session, content_hash):
+    """
+    Move the completed part file into audio storage and create the
+    AudioMemory for it (not yet processed).
+    """
+    audio_memory = AudioMemory(
+        user=session.user,
+        content_hash=content_hash,
+        language=session.language,
+        processing_complete=False,
+    )
+    storage = audio_memory.audio_file.storage
+    name = storage.get_available_name(user_audio_path(audio_memory, os.path.basename(session.filename)))
+    os.makedirs(os.path.dirname(storage.path(name)), exist_ok=True)
+    os.replace(session_part_path(session), storage.path(name))
+
+    audio_memory.audio_file.name = name
+    audio_memory.save()
+    return audio_memory
+
+
+def discard_session_file(session):
+    path = session_part_path(session)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def discard_stale_sessions():
+    """Delete open sessions (and their part files) nobody has touched for a while"""
+    ttl = getattr(settings, 'AUDIO_UPLOAD_SESSION_TTL', 24 * 3600)
+    stale = AudioUploadSession.objects.filter(
+        status=AudioUploadSession.STATUS_OPEN,
+        updated_at__lt=timezone.now() - timedelta(seconds=ttl)
+    )
+    for session in stale:
+        discard_session_file(session)
+    count, _ = stale.delete()
+    if count:
+        print(f"🧹 Discarded {count} stale upload sessions")
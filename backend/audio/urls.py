@@ -1,9 +1,18 @@
 from django.urls import path
-from .views import AudioMemoryListCreateView, AudioMemoryDetailView, AudioMemoryExportView, AudioMemoryJSONExportView
+from .views import (
+    AudioMemoryListCreateView, AudioMemoryDetailView, AudioMemorySegmentsView, AudioMemoryExportView,
+    AudioMemoryJSONExportView, AudioUploadSessionCreateView, AudioUploadSessionView, AudioUploadSessionFinalizeView,
+    ModelMetricsView
+)
 
 urlpatterns =[
     path('memories/', AudioMemoryListCreateView.as_view(), name='audio_memory_list_create'),
     path('memories/<int:pk>/', AudioMemoryDetailView.as_view(), name='audio-memory-detail'),
+    path('memories/<int:pk>/segments/', AudioMemorySegmentsView.as_view(), name='audio-memory-segments'),
+    path('uploads/', AudioUploadSessionCreateView.as_view(), name='audio-upload-create'),
+    path('uploads/<uuid:pk>/', AudioUploadSessionView.as_view(), name='audio-upload'),
+    path('uploads/<uuid:pk>/finalize/', AudioUploadSessionFinalizeView.as_view(), name='audio-upload-finalize'),
+    path('model-metrics/', ModelMetricsView.as_view(), name='model-metrics'),
     path('memories/export/', AudioMemoryExportView.as_view(), name='audio-memory-export'),
     path('export-json/', AudioMemoryJSONExportView.as_view(), name='audio-memory-export-json'),
 ]
\ No newline at end of file
@@ -1,158 +1,67 @@
 from django.shortcuts import get_object_or_404
-from .models import AudioMemory
-from users.models import UserProfile
-from .serializers import AudioMemorySerializer, AudioMemoryJSONSerializer
+from django.conf import settings
+from django.db import transaction
+from backend.model_registry import get_registry
+from .models import AudioMemory, AudioUploadSession
+from .sentence_cache import get_sentence_cache
+from .serializers import AudioMemorySerializer, AudioMemoryJSONSerializer, TranscriptSegmentSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from users.authentication import firebase_auth_required
-from .audio_processing import transcribe_audio, analyze_text_comprehensive
+from .dispatch import dispatch_audio_processing, reserve_processing_slot, release_processing_slot
+from .executor import ProcessingQueueFull, get_executor
+from .dedup import find_in_flight_duplicate, find_processed_duplicate, create_from_duplicate, file_is_shared
+from .upload_handlers import HashingUploadHandler
+from .uploads import (
+    UploadOffsetMismatch, write_chunk, file_sha256, session_part_path, create_memory_from_session,
+    discard_session_file, discard_stale_sessions
+)
 import os
 import logging
 import time
-import threading
 import datetime
-import traceback
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def process_audio_in_background(audio_memory_id):
-    """
-    Process audio file in background thread
-    """
-    from .models import AudioMemory  # Import here to avoid circular imports
+
+def duplicate_upload_response(user, content_hash, language=None):
+    """Response for an upload whose content we already have, or None"""
+    # A client retry of an upload we're still working on
+    in_flight = find_in_flight_duplicate(user, content_hash)
+    if in_flight:
+        print(f"♻️ Identical upload #{in_flight.id} is already processing")
+        return Response({
+            "id": in_flight.id,
+            "message": "Identical audio file is already being processed",
+            "status": "processing",
+            "deduplicated": True
+        }, status=status.HTTP_202_ACCEPTED)
     
-    try:
-        # Get the audio memory object
-        audio_memory = AudioMemory.objects.get(id=audio_memory_id)
-        
-        print("\n" + "="*50)
-        print(f"🎵 STARTING BACKGROUND PROCESSING FOR AUDIO #{audio_memory_id} 🎵")
-        print("="*50)
-        
-        # File path info
-        audio_path = audio_memory.audio_file.path
-        print(f"📁 Audio file path: {audio_path}")
-        
-        # Verify file exists and is readable
-        if not os.path.exists(audio_path):
-            raise FileNotFoundError(f"Audio file does not exist at {audio_path}")
-            
-        if not os.access(audio_path, os.R_OK):
-            raise PermissionError(f"Cannot read audio file at {audio_path}")
-            
-        # Check file size
-        file_size = os.path.getsize(audio_path)
-        print(f"📊 File size: {file_size / 1024 / 1024:.2f} MB")
-        
-        if file_size == 0:
-            raise ValueError("Audio file is empty (0 bytes)")
-            
-        # Transcription begins
-        print("\n" + "-"*40)
-        print("🎤 STARTING TRANSCRIPTION PROCESS...")
-        print("-"*40)
-        start_time = time.time()
-        
-        try:
-            text = transcribe_audio(audio_path)
-            
-            if not text or text.strip() == "":
-                print("⚠️ Warning: Transcription returned empty text")
-                text = "[No speech detected]"
-                
-            transcription_time = time.time() - start_time
-            print(f"⏱️ Transcription completed in {transcription_time:.2f} seconds")
-            print(f"📝 Transcription result:\n{text}")
-            
-            # Store the transcription
-            audio_memory.transcription = text
-            print("💾 Transcription saved to model")
-            
-        except Exception as e:
-            error_msg = f"Transcription failed: {str(e)}"
-            print(f"❌ {error_msg}")
-            print(f"❌ Traceback: {traceback.format_exc()}")
-            
-            # Save error but continue with analysis if we can
-            audio_memory.processing_error = error_msg
-            audio_memory.save()
-            
-            # If we can't continue, re-raise
-            if not text:
-                raise
-        
-        # Comprehensive analysis begins
-        print("\n" + "-"*40)
-        print("🔍 STARTING COMPREHENSIVE TEXT ANALYSIS...")
-        print("-"*40)
-        start_time = time.time()
-        
-        try:
-            # Get comprehensive analysis
-            analysis_results = analyze_text_comprehensive(text)
-            
-            analysis_time = time.time() - start_time
-            print(f"⏱️ Analysis completed in {analysis_time:.2f} seconds")
-            
-            # Store all analysis results
-            audio_memory.score = round(analysis_results['sentiment_score'], 4)
-            audio_memory.sentiment_label = analysis_results['sentiment_label']
-            audio_memory.memory_references = analysis_results['memory_references']
-            audio_memory.routine_references = analysis_results['routine_references']
-            audio_memory.time_indicators = analysis_results['time_indicators']
-            audio_memory.location_indicators = analysis_results['location_indicators']
-            audio_memory.severity_indicators = analysis_results['severity_indicators']
-            audio_memory.potential_concerns = analysis_results['potential_concerns']
-            
-            # Print analysis results
-            print(f"📊 Sentiment score: {audio_memory.score}")
-            print(f"🏷️ Sentiment label: {audio_memory.sentiment_label}")
-            print(f"🧠 Memory references: {audio_memory.memory_references}")
-            print(f"⏰ Routine references: {audio_memory.routine_references}")
-            print(f"📅 Time indicators: {audio_memory.time_indicators}")
-            print(f"📍 Location indicators: {audio_memory.location_indicators}")
-            print(f"⚠️ Severity indicators: {audio_memory.severity_indicators}")
-            print(f"🚨 Potential concerns: {audio_memory.potential_concerns}")
-            
-        except Exception as e:
-            error_msg = f"Analysis failed: {str(e)}"
-            print(f"❌ {error_msg}")
-            print(f"❌ Traceback: {traceback.format_exc()}")
-            
-            # If there's already an error, append to it
-            if audio_memory.processing_error:
-                audio_memory.processing_error += f"; {error_msg}"
-            else:
-                audio_memory.processing_error = error_msg
-        
-        # Update processing status - mark as complete even if we had partial errors
-        audio_memory.processing_complete = True
-        
-        # Save changes
-        print("💾 Saving final data to database...")
-        audio_memory.save()
-        
-        print("\n" + "="*50)
-        print(f"✅ AUDIO #{audio_memory_id} PROCESSED SUCCESSFULLY ✅")
-        print("="*50 + "\n")
-        
-    except Exception as e:
-        print(f"❌ ERROR PROCESSING AUDIO #{audio_memory_id}: {str(e)}")
-        print(f"❌ Error type: {type(e).__name__}")
-        print(f"❌ Traceback: {traceback.format_exc()}")
-        
-        # Try to update the status in the database
-        try:
-            audio_memory = AudioMemory.objects.get(id=audio_memory_id)
-            audio_memory.processing_error = f"{type(e).__name__}: {str(e)}"
-            audio_memory.processing_complete = True  # Mark as complete even with error
-            audio_memory.save()
-            print("💾 Error status saved to database")
-        except Exception as db_error:
-            print(f"❌ Could not update error status in database: {str(db_error)}")
+    # Same content was processed before - reuse its results
+    processed = find_processed_duplicate(user, content_hash, language)
+    if processed:
+        audio_memory = create_from_duplicate(user, processed)
+        print(f"♻️ Reused results of audio #{processed.id} for #{audio_memory.id}")
+        return Response({
+            "id": audio_memory.id,
+            "message": "Identical audio file was already processed, results reused",
+            "status": "completed",
+            "deduplicated": True
+        }, status=status.HTTP_201_CREATED)
+    
+    return None
+
+
+def queue_full_response(error):
+    """429 for an upload turned away because processing is at capacity"""
+    print(f"🚦 Processing queue is full, retry after {error.retry_after}s")
+    return Response({
+        "error": "Too many uploads are waiting to be processed, try again later",
+        "retry_after": error.retry_after
+    }, status=status.HTTP_429_TOO_MANY_REQUESTS, headers={"Retry-After": str(error.retry_after)})
 
 
 class AudioMemoryListCreateView(APIView):
@@ -173,6 +82,11 @@ class AudioMemoryListCreateView(APIView):
         user = request.user
         print(f"👤 Processing for user: {user}")
         
+        # Hash the upload while it's being received, must happen before
+        # anything touches request.FILES
+        hasher = HashingUploadHandler(request._request)
+        request._request.upload_handlers.insert(0, hasher)
+        
         if 'audio_file' not in request.FILES:
             print("❌ ERROR: No audio_file in request")
             return Response({"error": "No audio file provided"}, status=status.HTTP_400_BAD_REQUEST)
@@ -192,24 +106,40 @@ class AudioMemoryListCreateView(APIView):
         if content_type not in valid_types:
             print(f"⚠️ Warning: Unexpected content type: {content_type}")
         
+        content_hash = hasher.hashes.get('audio_file')
+        print(f"🔑 Content hash: {content_hash}")
+        
+        duplicate = duplicate_upload_response(user, content_hash, request.data.get('language') or None)
+        if duplicate:
+            return duplicate
+        
         print("🔍 Validating request data...")
         serializer = AudioMemorySerializer(data=request.data)
         if serializer.is_valid():
             print("✅ Serializer is valid")
-            print("💾 Saving audio file to database...")
             
+            # Turn the upload away before saving it if it can't be processed
+            try:
+                reserve_processing_slot()
+            except ProcessingQueueFull as e:
+                return queue_full_response(e)
+            
+            print("💾 Saving audio file to database...")
             try:
                 # Set initial processing status
-                audio_memory = serializer.save(user=user, processing_complete=False)
-                
-                # Start background processing
+                audio_memory = serializer.save(user=user, content_hash=content_hash, processing_complete=False)
+            except Exception as e:
+                release_processing_slot()
+                print(f"❌ Error initiating processing: {str(e)}")
+                return Response({
+                    "error": "Failed to process audio file",
+                    "details": str(e)
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            
+            try:
+                # Hand the job to the configured processing backend
                 print(f"🚀 Starting background processing for audio #{audio_memory.id}")
-                processing_thread = threading.Thread(
-                    target=process_audio_in_background,
-                    args=(audio_memory.id,)
-                )
-                processing_thread.daemon = True
-                processing_thread.start()
+                dispatch_audio_processing(audio_memory.id, reserved=True)
                 
                 # Return immediately with the created object
                 print(f"✅ Audio file accepted, processing in background")
@@ -220,6 +150,7 @@ class AudioMemoryListCreateView(APIView):
                 }, status=status.HTTP_202_ACCEPTED)
                 
             except Exception as e:
+                release_processing_slot()
                 print(f"❌ Error initiating processing: {str(e)}")
                 return Response({
                     "error": "Failed to process audio file",
@@ -251,19 +182,215 @@ class AudioMemoryDetailView(APIView):
         user = request.user
         audio_memory = get_object_or_404(AudioMemory, id=pk, user=user)
         
-        # Delete the file from storage
-        if audio_memory.audio_file:
-            if os.path.isfile(audio_memory.audio_file.path):
-                try:
-                    os.remove(audio_memory.audio_file.path)
-                except Exception as e:
-                    print(f"⚠️ Warning: Could not delete file: {str(e)}")
+        # Delete the file from storage, unless a deduplicated upload still uses it
+        if audio_memory.audio_file and not file_is_shared(audio_memory):
+            for stored in (audio_memory.audio_file, audio_memory.normalized_file):
+                if stored and os.path.isfile(stored.path):
+                    try:
+                        os.remove(stored.path)
+                    except Exception as e:
+                        print(f"⚠️ Warning: Could not delete file: {str(e)}")
         
         # Delete the record
         audio_memory.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class AudioMemorySegmentsView(APIView):
+    @firebase_auth_required
+    def get(self, request, pk, *args, **kwargs):
+        user = request.user
+        audio_memory = get_object_or_404(AudioMemory, id=pk, user=user)
+        serializer = TranscriptSegmentSerializer(audio_memory.segments.all(), many=True)
+        return Response(serializer.data)
+
+
+def upload_session_data(session):
+    return {
+        "upload_id": str(session.id),
+        "filename": session.filename,
+        "size": session.size,
+        "offset": session.received,
+        "status": session.status,
+        "audio_memory_id": session.audio_memory_id,
+    }
+
+
+class AudioUploadSessionCreateView(APIView):
+    """Start a resumable upload: POST {"filename", "size", "content_type"?, "language"?}"""
+    parser_classes = (JSONParser, FormParser)
+
+    @firebase_auth_required
+    def post(self, request, *args, **kwargs):
+        discard_stale_sessions()
+        
+        filename = request.data.get('filename')
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            size = 0
+        if not filename or size <= 0:
+            return Response({"error": "filename and a positive size are required"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        max_size = getattr(settings, 'AUDIO_UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+        if size > max_size:
+            return Response({"error": f"Upload is larger than {max_size} bytes"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        language = request.data.get('language') or None
+        max_language_length = AudioUploadSession._meta.get_field('language').max_length
+        if language is not None and (not isinstance(language, str) or len(language) > max_language_length):
+            return Response({"error": f"language must be a code of at most {max_language_length} characters"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        session = AudioUploadSession.objects.create(
+            user=request.user,
+            filename=os.path.basename(filename),
+            content_type=request.data.get('content_type'),
+            language=language,
+            size=size
+        )
+        print(f"📤 Upload session {session.id} started for {session.filename} ({size / 1024 / 1024:.2f} MB)")
+        
+        data = upload_session_data(session)
+        data["chunk_size"] = getattr(settings, 'AUDIO_UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class AudioUploadSessionView(APIView):
+    """
+    GET returns the offset to resume from. PUT appends the raw request body
+    at the offset given in the Upload-Offset header. DELETE cancels.
+    """
+
+    @firebase_auth_required
+    def get(self, request, pk, *args, **kwargs):
+        session = get_object_or_404(AudioUploadSession, id=pk, user=request.user)
+        return Response(upload_session_data(session))
+
+    @firebase_auth_required
+    def put(self, request, pk, *args, **kwargs):
+        session = get_object_or_404(AudioUploadSession, id=pk, user=request.user)
+        if session.status != AudioUploadSession.STATUS_OPEN:
+            return Response({"error": "Upload is already finalized"}, status=status.HTTP_409_CONFLICT)
+        
+        try:
+            offset = int(request.headers.get('Upload-Offset'))
+            length = int(request.headers.get('Content-Length') or 0)
+        except (TypeError, ValueError):
+            return Response({"error": "Upload-Offset and Content-Length headers are required"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            # Read the body straight from the WSGI/ASGI stream, never into memory at once
+            received = write_chunk(session, request._request, offset, length)
+        except UploadOffsetMismatch as e:
+            print(f"⚠️ Upload {session.id}: {str(e)}")
+            data = upload_session_data(session)
+            data["error"] = str(e)
+            return Response(data, status=status.HTTP_409_CONFLICT)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        print(f"📤 Upload {session.id}: {received}/{session.size} bytes")
+        return Response(upload_session_data(session))
+
+    @firebase_auth_required
+    def delete(self, request, pk, *args, **kwargs):
+        session = get_object_or_404(AudioUploadSession, id=pk, user=request.user)
+        if session.status == AudioUploadSession.STATUS_OPEN:
+            discard_session_file(session)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AudioUploadSessionFinalizeView(APIView):
+    """Turn a fully received upload into an AudioMemory and start processing it"""
+
+    @firebase_auth_required
+    def post(self, request, pk, *args, **kwargs):
+        user = request.user
+        # Locked until the session is consumed, so concurrent finalize
+        # requests can't both turn the same part file into a memory
+        with transaction.atomic():
+            session = get_object_or_404(AudioUploadSession.objects.select_for_update(), id=pk, user=user)
+            
+            if session.status == AudioUploadSession.STATUS_COMPLETE:
+                return Response({
+                    "id": session.audio_memory_id,
+                    "error": "Upload was already finalized"
+                }, status=status.HTTP_409_CONFLICT)
+            
+            if session.received != session.size:
+                data = upload_session_data(session)
+                data["error"] = f"Upload is incomplete: {session.received} of {session.size} bytes received"
+                return Response(data, status=status.HTTP_409_CONFLICT)
+            
+            content_hash = file_sha256(session_part_path(session))
+            print(f"🔑 Content hash: {content_hash}")
+            
+            duplicate = duplicate_upload_response(user, content_hash, session.language)
+            if duplicate:
+                discard_session_file(session)
+                session.status = AudioUploadSession.STATUS_COMPLETE
+                session.audio_memory_id = duplicate.data["id"]
+                session.save(update_fields=['status', 'audio_memory', 'updated_at'])
+                return duplicate
+            
+            # The session stays open, so a turned away finalize can be retried
+            try:
+                reserve_processing_slot()
+            except ProcessingQueueFull as e:
+                return queue_full_response(e)
+            
+            try:
+                with transaction.atomic():
+                    audio_memory = create_memory_from_session(session, content_hash)
+                    session.status = AudioUploadSession.STATUS_COMPLETE
+                    session.audio_memory = audio_memory
+                    session.save(update_fields=['status', 'audio_memory', 'updated_at'])
+            except Exception as e:
+                release_processing_slot()
+                print(f"❌ Error finalizing upload {session.id}: {str(e)}")
+                return Response({
+                    "error": "Failed to process audio file",
+                    "details": str(e)
+                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        try:
+            print(f"🚀 Starting background processing for audio #{audio_memory.id}")
+            dispatch_audio_processing(audio_memory.id, reserved=True)
+            
+            return Response({
+                "id": audio_memory.id,
+                "message": "Audio file accepted and processing has started",
+                "status": "processing"
+            }, status=status.HTTP_202_ACCEPTED)
+        
+        except Exception as e:
+            release_processing_slot()
+            print(f"❌ Error finalizing upload {session.id}: {str(e)}")
+            return Response({
+                "error": "Failed to process audio file",
+                "details": str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ModelMetricsView(APIView):
+    """
+    Loaded models, their sizes and the load/evict counters of this worker
+    process, the hit/miss counters of its sentence cache and the state of
+    its processing executor
+    """
+
+    @firebase_auth_required
+    def get(self, request, *args, **kwargs):
+        return Response(dict(
+            get_registry().metrics(),
+            sentence_cache=get_sentence_cache().stats(),
+            processing_executor=get_executor().stats()
+        ))
+
+
 class AudioMemoryExportView(APIView):
     @firebase_auth_required
     def get(self, request, *args, **kwargs):
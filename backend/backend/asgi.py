@@ -9,6 +9,7 @@ from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 
 from memory import routing
+from audio import routing as audio_routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
@@ -22,7 +23,7 @@ application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": FirebaseAuthMiddleware(
         URLRouter(
-            routing.websocket_urlpatterns
+            routing.websocket_urlpatterns + audio_routing.websocket_urlpatterns
         )
     ),
 })
@@ -0,0 +1,209 @@
+"""
+Local model artifacts.
+
+`python manage.py fetch_models` downloads every model and lexicon the app
+uses into MODEL_ARTIFACTS_DIR and writes manifest.json there, pinning the
+exact revision and the SHA-256 of every file. At runtime the loaders ask
+artifact_path() for the local copy; with MODEL_ARTIFACTS_OFFLINE they never
+fall back to the network.
+"""
+import hashlib
+import json
+import os
+from django.conf import settings
+
+WHISPER_FILES = ["config.json", "preprocessor_config.json", "model.bin", "tokenizer.json", "vocabulary.*"]
+
+DEFAULT_ARTIFACTS = {
+    'distilbert-sst2': {
+        'source': 'huggingface',
+        'repo': 'distilbert/distilbert-base-uncased-finetuned-sst-2-english',
+        'allow_patterns': [
+            "config.json", "model.safetensors", "tokenizer_config.json", "tokenizer.json",
+            "vocab.txt", "special_tokens_map.json",
+        ],
+    },
+    'bert-ner-conll03': {
+        'source': 'huggingface',
+        'repo': 'dbmdz/bert-large-cased-finetuned-conll03-english',
+        'allow_patterns': [
+            "config.json", "model.safetensors", "pytorch_model.bin", "tokenizer_config.json",
+            "vocab.txt", "special_tokens_map.json",
+        ],
+    },
+    'whisper-small': {'source': 'huggingface', 'repo': 'Systran/faster-whisper-small', 'allow_patterns': WHISPER_FILES},
+    'whisper-base': {'source': 'huggingface', 'repo': 'Systran/faster-whisper-base', 'allow_patterns': WHISPER_FILES},
+    'whisper-tiny': {'source': 'huggingface', 'repo': 'Systran/faster-whisper-tiny', 'allow_patterns': WHISPER_FILES},
+    'nltk-vader_lexicon': {'source': 'nltk', 'package': 'vader_lexicon'},
+}
+
+MANIFEST_NAME = 'manifest.json'
+
+_manifest = None
+
+
+class MissingArtifact(FileNotFoundError):
+    """A model is needed that hasn't been fetched, while running offline"""
+
+
+def artifacts_dir():
+    return str(getattr(settings, 'MODEL_ARTIFACTS_DIR', settings.BASE_DIR / 'model_artifacts'))
+
+
+def artifacts_offline():
+    return getattr(settings, 'MODEL_ARTIFACTS_OFFLINE', False)
+
+
+def artifact_specs():
+    return getattr(settings, 'MODEL_ARTIFACTS', DEFAULT_ARTIFACTS)
+
+
+def load_manifest(reload=False):
+    global _manifest
+    if _manifest is None or reload:
+        path = os.path.join(artifacts_dir(), MANIFEST_NAME)
+        try:
+            with open(path) as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            _manifest = {'artifacts': {}}
+    return _manifest
+
+
+def save_manifest(manifest):
+    global _manifest
+    os.makedirs(artifacts_dir(), exist_ok=True)
+    with open(os.path.join(artifacts_dir(), MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    _manifest = manifest
+
+
+def artifact_path(name):
+    """
+    Local directory of a fetched artifact, or None to load it the usual way
+    (from the hub). Raises MissingArtifact instead when running offline.
+    """
+    entry = load_manifest()['artifacts'].get(name)
+    if entry:
+        path = os.path.join(artifacts_dir(), entry['path'])
+        if os.path.isdir(path):
+            return path
+    if artifacts_offline():
+        raise MissingArtifact(
+            f"Model artifact '{name}' is not in {artifacts_dir()}, run `python manage.py fetch_models`"
+        )
+    return None
+
+
+def artifact_fingerprint(name):
+    """
+    Short digest of a fetched artifact's file hashes, which changes with its
+    revision or export, or None if it hasn't been fetched
+    """
+    entry = load_manifest()['artifacts'].get(name)
+    if not entry:
+        return None
+    return hashlib.sha1(json.dumps(entry['files'], sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def hash_files(root, prefix=''):
+    """SHA-256 of every file under root (relative paths starting with prefix)"""
+    hashes = {}
+    for directory, dirnames, filenames in os.walk(root):
+        # huggingface_hub keeps download metadata in .cache
+        dirnames[:] = [d for d in dirnames if not d.startswith('.')]
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            relative = os.path.relpath(path, root)
+            if relative.startswith(prefix):
+                hashes[relative] = file_sha256(path)
+    return hashes
+
+
+def fetch_artifact(name, spec, revision=None):
+    """Download one artifact into the artifact directory, returns its manifest entry"""
+    if spec['source'] == 'huggingface':
+        from huggingface_hub import HfApi, snapshot_download
+
+        # Resolve a branch or tag to the commit it points at, so the manifest pins it
+        revision = HfApi().model_info(spec['repo'], revision=revision or 'main').sha
+        local_dir = os.path.join(artifacts_dir(), name)
+        snapshot_download(
+            spec['repo'], revision=revision, local_dir=local_dir,
+            allow_patterns=spec.get('allow_patterns')
+        )
+        return {
+            'source': 'huggingface',
+            'repo': spec['repo'],
+            'revision': revision,
+            'path': name,
+            'files': hash_files(local_dir),
+        }
+
+    if spec['source'] == 'nltk':
+        import nltk
+
+        local_dir = os.path.join(artifacts_dir(), 'nltk_data')
+        if not nltk.download(spec['package'], download_dir=local_dir, quiet=True, raise_on_error=True):
+            raise RuntimeError(f"nltk could not download {spec['package']}")
+        return {
+            'source': 'nltk',
+            'package': spec['package'],
+            'revision': None,
+            'path': 'nltk_data',
+            # The nltk_data directory is shared, only hash this package's files
+            'files': {
+                relative: sha for relative, sha in hash_files(local_dir).items()
+                if os.path.basename(relative).startswith(spec['package'])
+            },
+        }
+
+    raise ValueError(f"Unknown artifact source: {spec['source']}")
+
+
+def verify_artifact(entry):
+    """Files of a manifest entry that are missing or don't match their pinned hash"""
+    root = os.path.join(artifacts_dir(), entry['path'])
+    mismatched = []
+    for relative, sha in entry['files'].items():
+        path = os.path.join(root, relative)
+        if not os.path.isfile(path) or file_sha256(path) != sha:
+            mismatched.append(relative)
+    return mismatched
+
+
+def measure_cold_start(name):
+    """
+    Seconds to import and load one artifact from local files, run in a fresh
+    process by fetch_models so nothing is cached yet.
+    """
+    import time
+    start_time = time.time()
+    path = artifact_path(name)
+
+    if name.startswith('whisper-'):
+        from faster_whisper import WhisperModel
+        WhisperModel(path, device="cpu", compute_type="int8", local_files_only=True)
+    elif name == 'distilbert-sst2':
+        from transformers import pipeline
+        pipeline("sentiment-analysis", model=path, tokenizer=path)
+    elif name == 'bert-ner-conll03':
+        from transformers import pipeline
+        pipeline("ner", model=path, tokenizer=path, aggregation_strategy="simple")
+    elif name.startswith('nltk-'):
+        import nltk
+        from nltk.sentiment import SentimentIntensityAnalyzer
+        nltk.data.path.insert(0, path)
+        SentimentIntensityAnalyzer()
+    else:
+        raise ValueError(f"Don't know how to load {name}")
+
+    return round(time.time() - start_time, 3)
@@ -0,0 +1,228 @@
+"""
+One registry for every heavy model loaded in this process.
+
+Models are loaded on first use through get(), which records their size (RSS
+growth while loading) and last use. When the loaded models together exceed
+MODEL_MEMORY_BUDGET_MB the least recently used ones are evicted, and models
+idle for longer than MODEL_IDLE_TIMEOUT seconds are evicted by a background
+reaper. An evicted model is simply loaded again by the next get(). Pinned
+models, and models held with use(), are never evicted.
+"""
+import ctypes
+import gc
+import os
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+
+def current_rss():
+    """Resident memory of this process in bytes, 0 where /proc isn't available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return 0
+
+
+def release_memory():
+    """Collect garbage and hand freed heap pages back to the OS (glibc only)"""
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}  # name -> {'model', 'size', 'loaded_at', 'last_used', 'pinned', 'in_use'}
+        self._load_locks = {}  # name -> lock held while that model loads
+        self._reaper_pid = None
+        self._counters = {
+            'hits': 0,
+            'loads': 0,
+            'load_seconds': 0.0,
+            'evictions_budget': 0,
+            'evictions_idle': 0,
+        }
+        self._events = []  # Most recent load/evict events, newest last
+
+    def get(self, name, loader, pinned=False):
+        """
+        Return the named model, loading it with loader() if it isn't loaded.
+        The model may be evicted as soon as this returns, callers that run it
+        for a while hold it with use() instead.
+        """
+        return self._acquire(name, loader, pinned, hold=False)
+
+    @contextmanager
+    def use(self, name, loader, pinned=False):
+        """Like get(), but the model can't be evicted until the block exits"""
+        model = self._acquire(name, loader, pinned, hold=True)
+        try:
+            yield model
+        finally:
+            with self._lock:
+                entry = self._entries[name]
+                entry['in_use'] -= 1
+                entry['last_used'] = time.time()
+
+    def _hit(self, name, pinned, hold):
+        entry = self._entries.get(name)
+        if entry is not None:
+            entry['last_used'] = time.time()
+            entry['pinned'] = entry['pinned'] or pinned
+            entry['in_use'] += 1 if hold else 0
+            self._counters['hits'] += 1
+        return entry
+
+    def _acquire(self, name, loader, pinned, hold):
+        with self._lock:
+            entry = self._hit(name, pinned, hold)
+            if entry is not None:
+                return entry['model']
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Only loads of the same model wait for each other, the others and
+        # every loaded model stay available meanwhile
+        with load_lock:
+            with self._lock:
+                entry = self._hit(name, pinned, hold)
+                if entry is not None:
+                    return entry['model']
+
+            rss_before = current_rss()
+            start_time = time.time()
+            model = loader()
+            load_seconds = time.time() - start_time
+            size = max(0, current_rss() - rss_before)
+
+            with self._lock:
+                now = time.time()
+                self._entries[name] = {
+                    'model': model, 'size': size, 'loaded_at': now, 'last_used': now, 'pinned': pinned,
+                    'in_use': 1 if hold else 0,
+                }
+                self._counters['loads'] += 1
+                self._counters['load_seconds'] += load_seconds
+                self._record('load', name, size, load_seconds)
+                self._start_reaper()
+        print(f"📦 Model registry loaded {name} ({size / 1024 / 1024:.0f} MB, {load_seconds:.2f}s)")
+
+        self._enforce_budget(keep=name)
+        return model
+
+    def pin(self, name):
+        with self._lock:
+            if name in self._entries:
+                self._entries[name]['pinned'] = True
+
+    def evict(self, name, reason='manual'):
+        """Unload the named model, unless it isn't loaded or is in use"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry['in_use']:
+                return False
+            del self._entries[name]
+            if reason in ('budget', 'idle'):
+                self._counters[f'evictions_{reason}'] += 1
+            self._record('evict', name, entry['size'], reason=reason)
+            print(f"🗑️ Model registry evicted {name} ({reason}, {entry['size'] / 1024 / 1024:.0f} MB)")
+            del entry
+        release_memory()
+        return True
+
+    def evict_idle(self):
+        timeout = getattr(settings, 'MODEL_IDLE_TIMEOUT', 900)
+        if not timeout:
+            return
+        cutoff = time.time() - timeout
+        with self._lock:
+            idle = [
+                name for name, entry in self._entries.items()
+                if not entry['pinned'] and not entry['in_use'] and entry['last_used'] < cutoff
+            ]
+        for name in idle:
+            self.evict(name, reason='idle')
+
+    def _enforce_budget(self, keep=None):
+        budget = getattr(settings, 'MODEL_MEMORY_BUDGET_MB', 0) * 1024 * 1024
+        if not budget:
+            return
+        while True:
+            with self._lock:
+                if self._loaded_bytes() <= budget:
+                    return
+                candidates = [
+                    (entry['last_used'], name) for name, entry in self._entries.items()
+                    if not entry['pinned'] and not entry['in_use'] and name != keep
+                ]
+                if not candidates:
+                    print("⚠️ Model registry is over its memory budget but nothing can be evicted")
+                    return
+            self.evict(min(candidates)[1], reason='budget')
+
+    def _loaded_bytes(self):
+        return sum(entry['size'] for entry in self._entries.values())
+
+    def _start_reaper(self):
+        # Threads don't survive a fork, so a forked worker starts its own
+        if self._reaper_pid == os.getpid():
+            return
+        self._reaper_pid = os.getpid()
+        interval = getattr(settings, 'MODEL_REAPER_INTERVAL', 60)
+
+        def reap():
+            while True:
+                time.sleep(interval)
+                self.evict_idle()
+
+        threading.Thread(target=reap, name='model-reaper', daemon=True).start()
+
+    def _record(self, event, name, size, seconds=None, reason=None):
+        self._events.append({
+            'time': round(time.time(), 3),
+            'event': event,
+            'model': name,
+            'size_mb': round(size / 1024 / 1024, 1),
+            'seconds': round(seconds, 3) if seconds is not None else None,
+            'reason': reason,
+        })
+        del self._events[:-100]
+
+    def metrics(self):
+        with self._lock:
+            now = time.time()
+            return {
+                'pid': os.getpid(),
+                'budget_mb': getattr(settings, 'MODEL_MEMORY_BUDGET_MB', 0),
+                'loaded_mb': round(self._loaded_bytes() / 1024 / 1024, 1),
+                'rss_mb': round(current_rss() / 1024 / 1024, 1),
+                'counters': dict(self._counters, load_seconds=round(self._counters['load_seconds'], 3)),
+                'models': {
+                    name: {
+                        'size_mb': round(entry['size'] / 1024 / 1024, 1),
+                        'pinned': entry['pinned'],
+                        'in_use': entry['in_use'],
+                        'idle_seconds': round(now - entry['last_used'], 1),
+                        'loaded_seconds_ago': round(now - entry['loaded_at'], 1),
+                    }
+                    for name, entry in self._entries.items()
+                },
+                'events': list(self._events),
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,78 @@
+"""
+Helpers for the preload-then-fork server (see the serve_preforked command).
+
+Models are loaded once in the parent process, then the workers are forked so
+the model weights are shared copy-on-write instead of loaded once per worker.
+"""
+import gc
+from .model_registry import get_registry
+
+
+# Each preloader returns the name its model is registered under
+
+def preload_distilbert():
+    from audio.audio_processing import get_sentiment_model, sentiment_model_name
+    get_sentiment_model()
+    return sentiment_model_name()
+
+
+def preload_vader():
+    from audio.audio_processing import get_vader_analyzer
+    get_vader_analyzer()
+    return 'vader'
+
+
+def preload_face():
+    from memory.FT import FaceRecognitionSystem
+    FaceRecognitionSystem._ensure_model_loaded()
+    return 'face'
+
+
+# Whisper is not in here on purpose: CTranslate2 starts its worker threads
+# while loading the model and those threads don't survive a fork. Run the
+# transcription workers (AUDIO_PROCESSING_BACKEND = 'workers') instead.
+PRELOADERS = {
+    'distilbert': preload_distilbert,
+    'vader': preload_vader,
+    'face': preload_face,
+}
+
+
+def preload_models(names):
+    """Load the named models in this process and freeze the heap for forking"""
+    for name in names:
+        if name not in PRELOADERS:
+            raise ValueError(f"Unknown model to preload: {name} (choose from {', '.join(PRELOADERS)})")
+        print(f"📦 Preloading {name}...")
+        registered_name = PRELOADERS[name]()
+        # Evicting a shared model would only give a worker a private copy later
+        get_registry().pin(registered_name)
+
+    # Move everything allocated so far out of the collector's reach, otherwise
+    # the first collection in a worker writes to (and so copies) every page
+    gc.collect()
+    gc.freeze()
+
+
+def memory_usage(pid):
+    """
+    Memory of a process in MB from /proc/<pid>/smaps_rollup: rss, pss,
+    shared (pages also mapped by other processes) and private (pages only
+    this process holds). Returns None if the process is gone.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+    except (FileNotFoundError, ProcessLookupError):
+        return None
+
+    return {
+        'rss': round(fields.get('Rss', 0) / 1024, 1),
+        'pss': round(fields.get('Pss', 0) / 1024, 1),
+        'shared': round((fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0)) / 1024, 1),
+        'private': round((fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024, 1),
+    }
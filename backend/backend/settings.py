@@ -171,3 +171,183 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
+
+# Audio transcription
+# Recordings at least this long (seconds) are split at silences and
+# transcribed in parallel chunks on a process pool
+AUDIO_CHUNKED_TRANSCRIPTION = True
+AUDIO_CHUNKED_MIN_DURATION = 300
+AUDIO_CHUNK_TARGET_SECONDS = 120
+# Size of the chunk transcription pool, 0 sizes it from Whisper's share of
+# the CPU thread budget (one single-threaded process per thread)
+AUDIO_TRANSCRIPTION_PROCESSES = int(os.environ.get('AUDIO_TRANSCRIPTION_PROCESSES', 0))
+
+# Where uploads are processed: 'thread' runs the pipeline on a bounded
+# executor inside the web process, 'workers' queues a TranscriptionJob for the resident workers
+# started with `python manage.py run_transcription_workers`, 'celery' sends
+# the audio task chain to the Celery queues below
+AUDIO_PROCESSING_BACKEND = os.environ.get('AUDIO_PROCESSING_BACKEND', 'thread')
+AUDIO_TRANSCRIPTION_WORKERS = int(os.environ.get('AUDIO_TRANSCRIPTION_WORKERS', 2))
+AUDIO_WORKER_POLL_INTERVAL = 1.0
+# Workers refresh the heartbeat of their running jobs every HEARTBEAT_INTERVAL
+# seconds, jobs without one for STALE_TIMEOUT seconds are requeued by the
+# sweep the supervisor runs every SWEEP_INTERVAL seconds. Stopping workers get
+# SHUTDOWN_TIMEOUT seconds to finish their job before it is requeued
+AUDIO_JOB_HEARTBEAT_INTERVAL = 30
+AUDIO_JOB_STALE_TIMEOUT = 300
+AUDIO_JOB_SWEEP_INTERVAL = 60
+AUDIO_WORKER_SHUTDOWN_TIMEOUT = 30
+
+# Live transcription (ws/audio-stream/): decode the rolling buffer every
+# STEP seconds, confirm segments once the buffer is COMMIT seconds long and
+# never let the unconfirmed buffer grow past MAX_WINDOW seconds
+AUDIO_STREAM_STEP_SECONDS = 1.0
+AUDIO_STREAM_COMMIT_SECONDS = 8
+AUDIO_STREAM_MAX_WINDOW_SECONDS = 25
+
+# Transcription tiers, best quality first. Each queue threshold the current
+# queue depth reaches moves a job one tier down; clips longer than
+# AUDIO_TIER_LONG_CLIP_SECONDS move one more tier down while others wait
+AUDIO_WHISPER_TIERS = [
+    {'model': 'small', 'beam_size': 5},
+    {'model': 'base', 'beam_size': 2},
+    {'model': 'tiny', 'beam_size': 1},
+]
+AUDIO_TIER_QUEUE_THRESHOLDS = [4, 12]
+AUDIO_TIER_LONG_CLIP_SECONDS = 1200
+# With the 'celery' backend the queue depth is the number of unfinished
+# uploads from the last AUDIO_QUEUE_DEPTH_WINDOW seconds
+AUDIO_QUEUE_DEPTH_WINDOW = 7200
+
+# Leading/trailing audio quieter than this (dBFS) is trimmed when an upload
+# is normalized to 16 kHz mono PCM
+AUDIO_TRIM_THRESHOLD_DB = -45.0
+
+# Once this many jobs are queued, a worker claims up to AUDIO_BATCH_MAX_JOBS
+# at a time and transcribes them in one batched pass of AUDIO_BATCH_SIZE
+# 30-second windows
+AUDIO_BATCH_MIN_QUEUE = 3
+AUDIO_BATCH_MAX_JOBS = 8
+AUDIO_BATCH_SIZE = 8
+
+# Transcript segments are written to the database in bulk, this many at a
+# time, while the transcription is still running
+AUDIO_SEGMENT_WRITE_BATCH = 50
+
+# Uploads with less than AUDIO_SPEECH_MIN_SECONDS of audio louder than
+# AUDIO_SPEECH_GATE_DB (dBFS) are completed as "[No speech detected]"
+# without loading Whisper
+AUDIO_SPEECH_GATE_DB = -40.0
+AUDIO_SPEECH_MIN_SECONDS = 0.3
+
+# Resumable uploads (api/audio/uploads/): suggested chunk size, the largest
+# upload accepted and how long (seconds) an abandoned session is kept
+AUDIO_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+AUDIO_UPLOAD_MAX_SIZE = 500 * 1024 * 1024
+AUDIO_UPLOAD_SESSION_TTL = 24 * 3600
+
+# CPU thread budget (see backend/thread_budget.py). Each engine gets a share
+# of CPU_THREAD_BUDGET_TOTAL threads, split between the at most max_jobs
+# jobs of that engine allowed to run at once in this process
+CPU_THREAD_BUDGET_TOTAL = int(os.environ.get('CPU_THREAD_BUDGET_TOTAL', 0)) or os.cpu_count() or 1
+CPU_THREAD_BUDGET = {
+    'whisper': {'share': 0.5, 'max_jobs': 2},
+    'distilbert': {'share': 0.25, 'max_jobs': 2},
+    'face': {'share': 0.25, 'max_jobs': 2},
+}
+
+# Preload-then-fork server (`python manage.py serve_preforked`): models
+# loaded once in the parent before the daphne workers are forked, and how
+# often (seconds) each process's private/shared memory is reported
+PREFORK_WORKERS = int(os.environ.get('PREFORK_WORKERS', 2))
+PREFORK_PRELOAD_MODELS = ['distilbert', 'vader', 'face']
+PREFORK_MEMORY_REPORT_INTERVAL = 60
+
+# Models and lexicons fetched by `python manage.py fetch_models`, loaded from
+# here instead of the Hugging Face hub / nltk downloads. With
+# MODEL_ARTIFACTS_OFFLINE nothing is ever downloaded at runtime
+MODEL_ARTIFACTS_DIR = os.environ.get('MODEL_ARTIFACTS_DIR', os.path.join(BASE_DIR, 'model_artifacts'))
+MODEL_ARTIFACTS_OFFLINE = os.environ.get('MODEL_ARTIFACTS_OFFLINE', 'False') == 'True'
+if MODEL_ARTIFACTS_OFFLINE:
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+# Model registry (backend/model_registry.py): least recently used models are
+# evicted when the loaded ones exceed MODEL_MEMORY_BUDGET_MB (0 = no limit)
+# and any model unused for MODEL_IDLE_TIMEOUT seconds is evicted, checked
+# every MODEL_REAPER_INTERVAL seconds. Evicted models reload on next use
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+MODEL_IDLE_TIMEOUT = 900
+MODEL_REAPER_INTERVAL = 60
+
+# Local NLP inference server (`python manage.py run_inference_server`). It
+# loads the sentiment and NER models once and batches concurrent requests:
+# up to NLP_INFERENCE_MAX_BATCH texts of similar length (and at most
+# NLP_INFERENCE_MAX_BATCH_TOKENS padded tokens), collected for at most
+# NLP_INFERENCE_MAX_WAIT_MS. With NLP_INFERENCE_URL set (host:port or
+# unix:/path/to.sock) the backend sends DistilBERT requests there instead of
+# loading the model itself
+NLP_INFERENCE_URL = os.environ.get('NLP_INFERENCE_URL', '')
+NLP_INFERENCE_BIND = os.environ.get('NLP_INFERENCE_BIND', '127.0.0.1:8765')
+NLP_INFERENCE_TASKS = ['sentiment', 'ner']
+NLP_INFERENCE_MAX_BATCH = 32
+NLP_INFERENCE_MAX_BATCH_TOKENS = 8192
+NLP_INFERENCE_MAX_WAIT_MS = 10
+NLP_INFERENCE_TIMEOUT = 30
+
+# DistilBERT scores long transcripts in sentence-aligned windows of up to 512
+# tokens, this many windows per forward pass
+AUDIO_SENTIMENT_BATCH_SIZE = 16
+
+# Runtime for the DistilBERT sentiment model: 'torch' (transformers, fp32) or
+# 'onnx' (int8 onnxruntime, exported by `python manage.py export_distilbert_onnx`)
+AUDIO_SENTIMENT_BACKEND = os.environ.get('AUDIO_SENTIMENT_BACKEND', 'torch')
+
+# Sentence-level cache of VADER/DistilBERT results (audio/sentence_cache.py):
+# at most AUDIO_SENTENCE_CACHE_SIZE sentences per process (0 = off), also
+# kept in the Django cache named by AUDIO_SENTENCE_CACHE_PERSIST if set
+AUDIO_SENTENCE_CACHE_SIZE = 10000
+AUDIO_SENTENCE_CACHE_PERSIST = os.environ.get('AUDIO_SENTENCE_CACHE_PERSIST', '')
+
+# `python manage.py reanalyze_audio`: rows per batch, worker processes and
+# the most rows per second it re-analyzes, so it can run beside live
+# traffic. An interrupted run resumes from AUDIO_REANALYZE_CHECKPOINT
+AUDIO_REANALYZE_BATCH_SIZE = 200
+AUDIO_REANALYZE_WORKERS = 2
+AUDIO_REANALYZE_RATE = 50
+AUDIO_REANALYZE_CHECKPOINT = os.path.join(BASE_DIR, 'reanalyze_checkpoint.json')
+
+# Celery audio chain (AUDIO_PROCESSING_BACKEND = 'celery'). Each stage has its
+# own queue, so each gets its own workers and concurrency, e.g.
+#   celery -A backend worker -Q audio_transcribe --concurrency 2 -n transcribe@%h
+#   celery -A backend worker -Q audio_analyze,audio_persist --concurrency 4 -n analyze@%h
+# Transcription workers can run on as many machines as share the broker,
+# the database and MEDIA_ROOT
+CELERY_TASK_ROUTES = {
+    'audio.tasks.transcribe_audio_task': {'queue': 'audio_transcribe'},
+    'audio.tasks.analyze_transcription_task': {'queue': 'audio_analyze'},
+    'audio.tasks.save_analysis_task': {'queue': 'audio_persist'},
+}
+# Long tasks: a worker takes one job at a time, and the broker must not hand
+# an unacknowledged job to another worker before its hard time limit
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+CELERY_BROKER_TRANSPORT_OPTIONS = {'visibility_timeout': 7200}
+# Soft/hard time limits (seconds) of each stage
+AUDIO_CELERY_TIME_LIMITS = {
+    'transcribe': {'soft': 1800, 'hard': 1900},
+    'analyze': {'soft': 120, 'hard': 150},
+    'persist': {'soft': 60, 'hard': 90},
+}
+# Retries of database/broker errors, with exponential backoff from this many seconds
+AUDIO_CELERY_MAX_RETRIES = 3
+AUDIO_CELERY_RETRY_BACKOFF = 10
+
+# Bounded executor of the 'thread' backend: uploads run on at most
+# AUDIO_EXECUTOR_WORKERS threads per web process with up to
+# AUDIO_EXECUTOR_QUEUE_SIZE more waiting; past that uploads get a 429 with a
+# Retry-After from the queue depth and the average processing time (which
+# starts at AUDIO_EXECUTOR_INITIAL_DURATION seconds)
+AUDIO_EXECUTOR_WORKERS = int(os.environ.get('AUDIO_EXECUTOR_WORKERS', 2))
+AUDIO_EXECUTOR_QUEUE_SIZE = int(os.environ.get('AUDIO_EXECUTOR_QUEUE_SIZE', 20))
+AUDIO_EXECUTOR_INITIAL_DURATION = 60
+AUDIO_EXECUTOR_MAX_RETRY_AFTER = 600
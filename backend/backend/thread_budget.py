@@ -0,0 +1,73 @@
+"""
+Process-wide CPU thread budget for the CPU-heavy engines.
+
+faster-whisper (CTranslate2), DistilBERT (torch) and face_recognition (dlib)
+all default to using every core. When they run at the same time in one
+process they oversubscribe the CPU, so each engine gets a share of the
+budget (CPU_THREAD_BUDGET) that is split between the jobs it may run at
+once, and a semaphore keeps it from running more jobs than that.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+
+DEFAULT_ENGINE_BUDGETS = {
+    'whisper': {'share': 0.5, 'max_jobs': 2},
+    'distilbert': {'share': 0.25, 'max_jobs': 2},
+    'face': {'share': 0.25, 'max_jobs': 2},
+}
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+_torch_configured = False
+
+
+def total_threads():
+    """Threads this process may use in total, defaults to one per core"""
+    return getattr(settings, 'CPU_THREAD_BUDGET_TOTAL', None) or os.cpu_count() or 1
+
+
+def engine_budget(engine):
+    budgets = getattr(settings, 'CPU_THREAD_BUDGET', DEFAULT_ENGINE_BUDGETS)
+    return budgets.get(engine, DEFAULT_ENGINE_BUDGETS[engine])
+
+
+def engine_max_jobs(engine):
+    return max(1, int(engine_budget(engine)['max_jobs']))
+
+
+def engine_share_threads(engine):
+    """Threads all of engine's jobs may use together"""
+    return max(1, int(total_threads() * engine_budget(engine)['share']))
+
+
+def engine_threads(engine):
+    """Threads one job of engine may use so its concurrent jobs fit its share"""
+    return max(1, engine_share_threads(engine) // engine_max_jobs(engine))
+
+
+@contextmanager
+def engine_slot(engine):
+    """Hold one of engine's job slots, waiting if all of them are in use"""
+    with _semaphores_lock:
+        semaphore = _semaphores.get(engine)
+        if semaphore is None:
+            semaphore = _semaphores[engine] = threading.BoundedSemaphore(engine_max_jobs(engine))
+    with semaphore:
+        yield
+
+
+def configure_torch_threads():
+    """Limit torch's intra-op pool to the DistilBERT share (once per process)"""
+    global _torch_configured
+    if _torch_configured:
+        return
+    _torch_configured = True
+    try:
+        import torch
+    except ImportError:
+        return
+    threads = engine_threads('distilbert')
+    torch.set_num_threads(threads)
+    print(f"🧵 torch limited to {threads} threads")
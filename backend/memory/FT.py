@@ -1,4 +1,3 @@
-import face_recognition
 import numpy as np
 import pickle
 import os
@@ -7,48 +6,46 @@ from django.conf import settings
 from django.core.cache import cache
 from .models import Memory
 from threading import Lock
+from backend.model_registry import get_registry
+from backend.thread_budget import engine_slot
 
 # Mutex for face recognition model loading
 face_recognition_lock = Lock()
 
+def _load_face_models():
+    import face_recognition
+    return face_recognition
+
 class FaceRecognitionSystem:
     """
     A class for managing face recognition operations.
     Provides methods to register faces, identify faces, and manage the face database.
     Uses lazy loading to improve performance.
     """
-    # Track when the face_recognition module was last used
-    _last_used = 0
-    # Time in seconds after which to unload the model
-    _idle_timeout = 300  # 5 minutes
-    # Flag to indicate if model is loaded
-    _model_loaded = False
-    
     @classmethod
     def _ensure_model_loaded(cls):
-        """Ensure the face recognition model is loaded"""
+        """
+        Ensure the face recognition models are loaded. They are registered in
+        the model registry so their size and use show up in its metrics, but
+        pinned: dlib loads them when face_recognition is imported and they
+        can't be unloaded again.
+        """
         with face_recognition_lock:
-            # Update the last used timestamp
-            cls._last_used = time.time()
-            cls._model_loaded = True
-            
-            # Schedule a check to unload the model if it becomes idle
-            # This would normally be done with a background task manager or celery
-            # But for simplicity, we'll just update the flag
-            return True
+            return get_registry().get('face', _load_face_models, pinned=True)
     
     @classmethod
     def extract_face_encoding(cls, image_path):
         """Extract face encoding from an image file with lazy loading."""
         try:
             # Ensure the model is loaded
-            cls._ensure_model_loaded()
+            face_recognition = cls._ensure_model_loaded()
             
             # Load the image
             img = face_recognition.load_image_file(image_path)
             
             # Extract face encodings (use the first face found)
-            encodings = face_recognition.face_encodings(img)
+            with engine_slot('face'):
+                encodings = face_recognition.face_encodings(img)
             
             if not encodings:
                 return None
@@ -121,7 +118,7 @@ class FaceRecognitionSystem:
                 return cached_results
             
             # Ensure the model is loaded
-            cls._ensure_model_loaded()
+            face_recognition = cls._ensure_model_loaded()
             
             # Get all memory objects for this user
             memories = Memory.objects.filter(user=user, face_encoding__isnull=False)
@@ -131,7 +128,8 @@ class FaceRecognitionSystem:
                 
             # Load the uploaded image
             unknown_img = face_recognition.load_image_file(image_file)
-            unknown_encodings = face_recognition.face_encodings(unknown_img)
+            with engine_slot('face'):
+                unknown_encodings = face_recognition.face_encodings(unknown_img)
             
             if not unknown_encodings:
                 return []
@@ -7,9 +7,9 @@ from django.core.files.storage import default_storage
 from django.conf import settings
 import os
 from .FT import FaceRecognitionSystem
+from backend.thread_budget import engine_slot
 from users.authentication import firebase_auth_required
 from django.core.files.base import ContentFile
-import face_recognition
 from PIL import Image
 from io import BytesIO
 import numpy as np
@@ -124,9 +124,13 @@ class IdentifyFaces(APIView):
             return Response({"message": "No image uploaded"}, status=400)
 
         try:
+            # face_recognition (and dlib's models) load on first use
+            face_recognition = FaceRecognitionSystem._ensure_model_loaded()
+            
             # Read the uploaded image from memory (no need to save to disk)
             unknown_img = face_recognition.load_image_file(image)
-            unknown_encodings = face_recognition.face_encodings(unknown_img)
+            with engine_slot('face'):
+                unknown_encodings = face_recognition.face_encodings(unknown_img)
 
             if not unknown_encodings:
                 return Response({"message": "No face detected"}, status=200)
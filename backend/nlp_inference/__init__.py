@@ -0,0 +1,9 @@
+"""
+Local NLP inference service.
+
+`python manage.py run_inference_server` loads the sentiment (DistilBERT) and
+NER models once and serves them over localhost HTTP or a Unix socket,
+batching concurrent requests (batcher.py). client.py only needs the standard
+library, so the backend and the standalone analysis scripts in
+sentiment_analysis_project can both use it.
+"""
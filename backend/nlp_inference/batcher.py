@@ -0,0 +1,135 @@
+"""
+Dynamic micro-batching.
+
+Texts submitted from many request threads are collected for at most max_wait
+seconds, sorted by length and run through the model in batches of similar
+length, so each padded batch wastes as little compute on padding as possible.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+def approx_tokens(text):
+    # Roughly 4 characters per wordpiece in English, plus [CLS] and [SEP]
+    return len(text) // 4 + 2
+
+
+def length_buckets(lengths, max_batch_size, max_batch_tokens):
+    """
+    Group item indexes into batches of similar length: sorted by length, each
+    batch holds at most max_batch_size items and max_batch_tokens once padded
+    to its longest item
+    """
+    batches = []
+    batch = []
+    longest = 0
+    for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+        padded = max(longest, lengths[index]) * (len(batch) + 1)
+        if batch and (len(batch) >= max_batch_size or padded > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+            longest = 0
+        batch.append(index)
+        longest = max(longest, lengths[index])
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class MicroBatcher:
+    def __init__(self, name, run_batch, max_batch_size=32, max_batch_tokens=8192, max_wait=0.01,
+                 length=approx_tokens):
+        """run_batch(texts) must return one result per text, in order"""
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_wait = max_wait
+        self.length = length
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'items': 0,
+            'errors': 0,
+            'tokens': 0,
+            'padded_tokens': 0,
+            'queue_seconds': 0.0,
+            'run_seconds': 0.0,
+        }
+        threading.Thread(target=self._loop, name=f'batcher-{name}', daemon=True).start()
+
+    def submit(self, texts, timeout=None):
+        """Queue texts and wait for their results"""
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future, time.monotonic()))
+            futures.append(future)
+        return [future.result(timeout=timeout) for future in futures]
+
+    def _collect(self):
+        pending = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        # Take a few batches' worth when there is that much waiting, so
+        # texts of similar length can be grouped together
+        while len(pending) < self.max_batch_size * 4:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                pending.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return pending
+
+    def _loop(self):
+        while True:
+            pending = self._collect()
+            lengths = [self.length(text) for text, _, _ in pending]
+            for batch in length_buckets(lengths, self.max_batch_size, self.max_batch_tokens):
+                self._run([pending[i] for i in batch], [lengths[i] for i in batch])
+
+    def _run(self, batch, lengths):
+        start_time = time.monotonic()
+        try:
+            results = self.run_batch([text for text, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} texts")
+        except Exception as e:
+            print(f"❌ {self.name} batch of {len(batch)} failed: {str(e)}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            with self._lock:
+                self._stats['errors'] += 1
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['items'] += len(batch)
+            self._stats['tokens'] += sum(lengths)
+            self._stats['padded_tokens'] += max(lengths) * len(lengths)
+            self._stats['queue_seconds'] += sum(start_time - queued_at for _, _, queued_at in batch)
+            self._stats['run_seconds'] += time.monotonic() - start_time
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats['batches'] or 1
+        items = stats['items'] or 1
+        return {
+            'batches': stats['batches'],
+            'items': stats['items'],
+            'errors': stats['errors'],
+            'queued': self._queue.qsize(),
+            'mean_batch_size': round(stats['items'] / batches, 2),
+            # Share of the padded batch that was real tokens (estimated)
+            'padding_efficiency': round(stats['tokens'] / (stats['padded_tokens'] or 1), 3),
+            'mean_queue_ms': round(stats['queue_seconds'] / items * 1000, 2),
+            'mean_batch_ms': round(stats['run_seconds'] / batches * 1000, 2),
+        }
@@ -0,0 +1,112 @@
+"""
+Client for the local NLP inference server.
+
+Only uses the standard library so scripts outside Django can import it. The
+address is either host:port (or http://host:port) or unix:/path/to.sock.
+"""
+import http.client
+import json
+import socket
+import threading
+from urllib.parse import urlsplit
+
+
+class InferenceUnavailable(ConnectionError):
+    """The inference server can't be reached or couldn't run the request"""
+
+
+def parse_address(address):
+    """('unix', path) or ('tcp', (host, port)) for an inference server address"""
+    if address.startswith('unix:'):
+        return 'unix', address[len('unix:'):]
+    parts = urlsplit(address if '://' in address else f'http://{address}')
+    return 'tcp', (parts.hostname or '127.0.0.1', parts.port or 8765)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class InferenceClient:
+    def __init__(self, address, timeout=30):
+        self.address = address
+        self.timeout = timeout
+        # One kept-alive connection per thread
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            kind, target = parse_address(self.address)
+            if kind == 'unix':
+                connection = UnixHTTPConnection(target, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(*target, timeout=self.timeout)
+            self._local.connection = connection
+        return connection
+
+    def _close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+
+        for attempt in range(2):
+            reused = getattr(self._local, 'connection', None) is not None
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (OSError, http.client.HTTPException) as e:
+                self._close()
+                # The server may have closed a kept-alive connection, that is
+                # worth one retry on a new one; anything else is not
+                stale = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if attempt or not (reused and stale):
+                    raise InferenceUnavailable(f"Inference server at {self.address} unreachable: {str(e)}") from e
+
+        try:
+            result = json.loads(data)
+        except ValueError:
+            result = {'error': data[:200].decode(errors='replace')}
+        if response.status != 200:
+            raise InferenceUnavailable(f"Inference server error {response.status}: {result.get('error')}")
+        return result
+
+    def sentiment(self, texts):
+        """[{'label': 'POSITIVE' | 'NEGATIVE', 'score': float, 'windows': int}] for each text"""
+        return self.request('POST', '/sentiment', {'texts': list(texts)})['results']
+
+    def ner(self, texts):
+        """Entity groups ({'entity_group', 'score', 'word', 'start', 'end'}) found in each text"""
+        return self.request('POST', '/ner', {'texts': list(texts)})['results']
+
+    def health(self):
+        return self.request('GET', '/health')
+
+    def pipeline(self, task):
+        """
+        A callable returning what the transformers pipeline for task returns
+        ("sentiment" or "ner"), to drop into scripts that used one directly
+        """
+        def run(inputs, **kwargs):
+            if isinstance(inputs, str):
+                results = self.request('POST', f'/{task}', {'texts': [inputs]})['results']
+                # A single text gets a list of predictions for sentiment and
+                # the text's entity list for NER, like the pipelines do
+                return results if task == 'sentiment' else results[0]
+            return self.request('POST', f'/{task}', {'texts': list(inputs)})['results']
+        return run
@@ -0,0 +1,148 @@
+"""
+HTTP server for the NLP inference service.
+
+    POST /sentiment  {"texts": [...]}  ->  {"results": [{"label", "score", "windows"}, ...]}
+    POST /ner        {"texts": [...]}  ->  {"results": [[{"entity_group", "score", "word", "start", "end"}], ...]}
+    GET  /health                       ->  loaded tasks and batching statistics
+
+Every task has one MicroBatcher, so requests arriving from different clients
+at the same time share a padded batch.
+"""
+import json
+import os
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .batcher import MicroBatcher
+from .client import parse_address
+
+
+def load_sentiment():
+    from audio.audio_processing import distilbert_window_sentiment, get_sentiment_model, sentiment_model_name
+    from backend.model_registry import get_registry
+    get_sentiment_model()
+    # Keep it loaded for as long as the server runs
+    get_registry().pin(sentiment_model_name())
+
+    def run(texts):
+        # Long texts become several windows, all scored in the same pass
+        return distilbert_window_sentiment(texts)
+    return run
+
+
+def load_ner():
+    from audio.audio_processing import get_ner
+    from backend.model_registry import get_registry
+    ner = get_ner()
+    get_registry().pin('ner')
+
+    def run(texts):
+        results = ner(texts, batch_size=len(texts))
+        return [
+            [
+                {
+                    'entity_group': entity['entity_group'],
+                    'score': float(entity['score']),
+                    'word': entity['word'],
+                    'start': entity['start'],
+                    'end': entity['end'],
+                }
+                for entity in entities
+            ]
+            for entities in results
+        ]
+    return run
+
+
+TASKS = {
+    'sentiment': load_sentiment,
+    'ner': load_ner,
+}
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'NLPInference/1.0'
+    # Keep connections alive between requests of the same client
+    protocol_version = 'HTTP/1.1'
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != '/health':
+            self.send_json(404, {'error': f"Unknown path {self.path}"})
+            return
+        self.send_json(200, {
+            'pid': os.getpid(),
+            'tasks': {name: batcher.stats() for name, batcher in self.server.batchers.items()},
+        })
+
+    def do_POST(self):
+        # Always read the body, a kept-alive connection would be out of step otherwise
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        batcher = self.server.batchers.get(self.path.strip('/'))
+        if batcher is None:
+            self.send_json(404, {'error': f"Unknown task {self.path.strip('/')}"})
+            return
+
+        try:
+            texts = json.loads(body)['texts']
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {'error': "Expected a JSON body like {\"texts\": [\"...\"]}"})
+            return
+
+        try:
+            results = batcher.submit(texts, timeout=self.server.request_timeout)
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+        self.send_json(200, {'results': results})
+
+    def log_message(self, format, *args):
+        # One line per request is too much at batching rates, /health has the numbers
+        pass
+
+
+class TCPInferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many clients connect at once, that is the point of batching them
+    request_queue_size = 128
+
+
+class UnixInferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def create_server(address, tasks, max_batch_size=32, max_batch_tokens=8192, max_wait=0.01, request_timeout=30):
+    """Load the tasks' models and bind the server, call serve_forever() on the result"""
+    unknown = [task for task in tasks if task not in TASKS]
+    if unknown:
+        raise ValueError(f"Unknown tasks: {', '.join(unknown)} (choose from {', '.join(TASKS)})")
+
+    batchers = {}
+    for task in tasks:
+        print(f"📦 Loading {task} model...")
+        batchers[task] = MicroBatcher(
+            task, TASKS[task](), max_batch_size=max_batch_size, max_batch_tokens=max_batch_tokens,
+            max_wait=max_wait
+        )
+
+    kind, target = parse_address(address)
+    if kind == 'unix':
+        # A socket file left behind by a previous run would make bind fail
+        if os.path.exists(target):
+            os.unlink(target)
+        server = UnixInferenceServer(target, InferenceRequestHandler)
+    else:
+        server = TCPInferenceServer(target, InferenceRequestHandler)
+    server.batchers = batchers
+    server.request_timeout = request_timeout
+    return server
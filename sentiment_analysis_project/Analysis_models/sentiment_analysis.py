@@ -4,6 +4,8 @@ from dateparser.search import search_dates  # <-- add this
 from datetime import datetime
 from nltk.sentiment import SentimentIntensityAnalyzer
 from transformers import pipeline, logging
+import os
+import sys
 
 
 # Suppress unimportant warnings from transformers
@@ -15,28 +17,40 @@ nltk.download('vader_lexicon')
 # Initialize VADER
 vader_analyzer = SentimentIntensityAnalyzer()
 
-# Initialize DistilBERT
-print("⚙️ Loading DistilBERT sentiment model...")
-try:
-    distilbert_analyzer = pipeline(
-        "sentiment-analysis",
-        model="distilbert/distilbert-base-uncased-finetuned-sst-2-english"
-    )
-except Exception as e:
-    print(f"❌ Failed to load DistilBERT model: {e}")
-    exit(1)
-
-# Initialize NER pipeline for location extraction
-print("⚙️ Loading NER model for location detection...")
-try:
-    ner_pipeline = pipeline(
-        "ner",
-        model="dbmdz/bert-large-cased-finetuned-conll03-english",
-        aggregation_strategy="simple"
-    )
-except Exception as e:
-    print(f"❌ Failed to load NER model: {e}")
-    exit(1)
+# With NLP_INFERENCE_URL set, use the shared inference server
+# (`python manage.py run_inference_server` in backend/) instead of loading
+# DistilBERT and the NER model in this script
+NLP_INFERENCE_URL = os.environ.get("NLP_INFERENCE_URL")
+if NLP_INFERENCE_URL:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "backend"))
+    from nlp_inference.client import InferenceClient
+    inference_client = InferenceClient(NLP_INFERENCE_URL)
+    print(f"⚙️ Using the NLP inference server at {NLP_INFERENCE_URL}")
+    distilbert_analyzer = inference_client.pipeline("sentiment")
+    ner_pipeline = inference_client.pipeline("ner")
+else:
+    # Initialize DistilBERT
+    print("⚙️ Loading DistilBERT sentiment model...")
+    try:
+        distilbert_analyzer = pipeline(
+            "sentiment-analysis",
+            model="distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+        )
+    except Exception as e:
+        print(f"❌ Failed to load DistilBERT model: {e}")
+        exit(1)
+
+    # Initialize NER pipeline for location extraction
+    print("⚙️ Loading NER model for location detection...")
+    try:
+        ner_pipeline = pipeline(
+            "ner",
+            model="dbmdz/bert-large-cased-finetuned-conll03-english",
+            aggregation_strategy="simple"
+        )
+    except Exception as e:
+        print(f"❌ Failed to load NER model: {e}")
+        exit(1)
 
 important_keywords = [
     "urgent", "critical", "important", "must", "need", "required", "wish", "dream", "plan",
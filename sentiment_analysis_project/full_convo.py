@@ -3,6 +3,8 @@ import nltk
 from nltk.tokenize import sent_tokenize
 from nltk.sentiment import SentimentIntensityAnalyzer
 from transformers import pipeline, logging
+import os
+import sys
 
 # Suppress unimportant warnings from transformers
 logging.set_verbosity_error()
@@ -14,16 +16,27 @@ nltk.download('vader_lexicon')
 # Initialize VADER sentiment analyzer
 vader_analyzer = SentimentIntensityAnalyzer()
 
-# Initialize HuggingFace DistilBERT sentiment pipeline
-print("⚙️ Loading DistilBERT sentiment model...")
-try:
-    distilbert_analyzer = pipeline(
-        "sentiment-analysis",
-        model="distilbert/distilbert-base-uncased-finetuned-sst-2-english"
-    )
-except Exception as e:
-    print(f"❌ Failed to load DistilBERT model: {e}")
-    exit(1)
+# With NLP_INFERENCE_URL set, use the shared inference server
+# (`python manage.py run_inference_server` in backend/) instead of loading
+# DistilBERT in this script
+NLP_INFERENCE_URL = os.environ.get("NLP_INFERENCE_URL")
+if NLP_INFERENCE_URL:
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+    from nlp_inference.client import InferenceClient
+    inference_client = InferenceClient(NLP_INFERENCE_URL)
+    print(f"⚙️ Using the NLP inference server at {NLP_INFERENCE_URL}")
+    distilbert_analyzer = inference_client.pipeline("sentiment")
+else:
+    # Initialize HuggingFace DistilBERT sentiment pipeline
+    print("⚙️ Loading DistilBERT sentiment model...")
+    try:
+        distilbert_analyzer = pipeline(
+            "sentiment-analysis",
+            model="distilbert/distilbert-base-uncased-finetuned-sst-2-english"
+        )
+    except Exception as e:
+        print(f"❌ Failed to load DistilBERT model: {e}")
+        exit(1)
 
 # Function to clean and split the conversation
 def split_into_phrases(conversation):